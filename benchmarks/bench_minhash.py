@@ -0,0 +1,70 @@
+"""
+Benchmark of the near-duplicate index against full scoring.
+
+Usage:
+    python -m benchmarks.bench_minhash [train_dir] [test_dir]
+
+The index is built from the tokenized training corpus and queried with the test
+corpus. Both are compared with the cost of scoring the same token lists with
+the Naive Bayes model. Extraction and tokenization are done once up front and
+are not part of any measured stage.
+"""
+import sys
+import time
+
+from filter import MyFilter
+from dataio.trainingcorpus import TrainingCorpus
+from dataio.corpus import Corpus
+from text.extractor import EmailBodyExtractor
+from text.tokenizer import EmailTokenizer
+from text.minhash import NearDuplicateIndex
+
+
+def tokenize_corpus(corpus):
+    """
+    Extract and tokenize all emails of a corpus.
+    :param corpus: Corpus instance.
+    :return: List of `(filename, tokens)` tuples.
+    """
+    extractor = EmailBodyExtractor()
+    tokenizer = EmailTokenizer()
+    return [(filename, tokenizer.tokenize(extractor.extract(email))) for filename, email in corpus.emails()]
+
+
+def run(train_dir="data/1", test_dir="data/2"):
+    """
+    Run the benchmark and print the per-email cost of each stage.
+    :param train_dir: Corpus used to train the model and to build the index.
+    :param test_dir: Corpus used to query the index and to score.
+    """
+    training_corpus = TrainingCorpus(train_dir)
+    train_docs = tokenize_corpus(training_corpus)
+    test_docs = tokenize_corpus(Corpus(test_dir))
+
+    spam_filter = MyFilter()
+    spam_filter.train(train_dir)
+
+    index = NearDuplicateIndex(max_size=len(train_docs))
+    start = time.perf_counter()
+    for filename, tokens in train_docs:
+        index.add(tokens, training_corpus.get_class(filename), filename)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hits = sum(1 for _, tokens in test_docs if index.query(tokens) is not None)
+    query_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _, tokens in test_docs:
+        spam_filter._classify_tokens(tokens)
+    scoring_time = time.perf_counter() - start
+
+    n_train, n_test = len(train_docs), len(test_docs)
+    print(f"index build: {build_time:.4f} s total, {1e6 * build_time / n_train:.1f} us/email ({n_train} emails)")
+    print(f"index query: {query_time:.4f} s total, {1e6 * query_time / n_test:.1f} us/email ({n_test} emails)")
+    print(f"full scoring: {scoring_time:.4f} s total, {1e6 * scoring_time / n_test:.1f} us/email")
+    print(f"near-duplicate hits: {hits}/{n_test} ({100 * hits / n_test:.1f} %)")
+
+
+if __name__ == "__main__":
+    run(*sys.argv[1:3])
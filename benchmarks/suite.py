@@ -0,0 +1,300 @@
+"""
+Per-stage benchmark suite with regression checks.
+
+Usage:
+    python -m benchmarks.suite [corpus ...] [--scale N] [--synthetic N] [--repeat N]
+                               [--output results.json] [--baseline baseline.json]
+                               [--thresholds benchmarks/thresholds.json]
+
+Every corpus is measured stage by stage: file read, MIME extraction, tokenization
+as in training, tokenization into vocabulary ids and scoring as in `MyFilter.test`,
+training and model save/load. Each stage reports throughput and latency
+percentiles. With `--scale N`, a corpus N times the size of the first corpus
+(built by replicating its emails) is measured too, and with `--synthetic N`,
+a generated corpus of N emails (see `dataio.synthetic`).
+
+When `--baseline` is given, the mean latency of every stage is compared with the
+baseline and the process exits with status 1 if any stage got slower by more than
+its threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from filter import MyFilter
+from dataio.corpus import Corpus
+from text.extractor import EmailBodyExtractor
+from text.tokenizer import EmailTokenizer
+from config.paths import jpath, TRUTH_FILENAME
+from utils import read_classification_from_file, write_classification_to_file
+from dataio.synthetic import SyntheticCorpusGenerator
+
+DEFAULT_CORPORA = ("data/1", "data/2")
+DEFAULT_THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), "thresholds.json")
+STAGES = ("read", "extract", "tokenize", "tokenize_ids", "score", "train", "model_save", "model_load")
+
+
+def summarize(latencies, n_items=None):
+    """
+    Summarize latency samples of one stage.
+    :param latencies: List of latencies in seconds, one per measured operation.
+    :param n_items: Number of emails processed by all operations, defaults to the
+        number of samples.
+    :return: Dictionary with count, total time, throughput and latency percentiles
+        (percentiles in microseconds), all zero for no samples.
+    """
+    n_items = len(latencies) if n_items is None else n_items
+    total = sum(latencies)
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return 1e6 * ordered[index]
+
+    return {
+        "count": len(latencies),
+        "items": n_items,
+        "total_s": total,
+        "throughput_per_s": n_items / total if total > 0 else (float("inf") if n_items else 0.0),
+        "mean_us": 1e6 * statistics.fmean(latencies) if latencies else 0.0,
+        "p50_us": percentile(50),
+        "p90_us": percentile(90),
+        "p99_us": percentile(99),
+    }
+
+
+def bench_corpus(corpus_dir, repeat=1):
+    """
+    Measure every stage on one corpus.
+    :param corpus_dir: Directory with emails and a `!truth.txt` file.
+    :param repeat: Number of passes over the corpus for the per-email stages.
+    :return: Dictionary with corpus size and per-stage summaries.
+    """
+    corpus = Corpus(corpus_dir)
+    extractor = EmailBodyExtractor()
+    tokenizer = EmailTokenizer()
+    clock = time.perf_counter
+
+    spam_filter = MyFilter()
+    spam_filter.train(corpus_dir)
+    model = spam_filter.model
+    _, id_tokenizer, weight_list = spam_filter._vocabulary_binding(model)
+
+    samples = {stage: [] for stage in ("read", "extract", "tokenize", "tokenize_ids", "score")}
+    n_emails = 0
+    n_bytes = 0
+
+    for _ in range(repeat):
+        emails = corpus.emails()
+        while True:
+            start = clock()
+            item = next(emails, None)
+            end = clock()
+            if item is None:
+                break
+            samples["read"].append(end - start)
+            _, email = item
+
+            start = clock()
+            body = extractor.extract(email)
+            end = clock()
+            samples["extract"].append(end - start)
+
+            start = clock()
+            tokenizer.tokenize(body)
+            samples["tokenize"].append(clock() - start)
+
+            start = clock()
+            ids = list(id_tokenizer.iter_ids(body))
+            end = clock()
+            samples["tokenize_ids"].append(end - start)
+
+            spam_filter._classify_score(spam_filter._score_ids(ids, weight_list, model), model)
+            samples["score"].append(clock() - end)
+
+            n_emails += 1
+            n_bytes += len(email) if isinstance(email, bytes) else len(email.encode("utf-8"))
+
+    results = {stage: summarize(latencies) for stage, latencies in samples.items()}
+    results["read"]["mb_per_s"] = n_bytes / 1e6 / results["read"]["total_s"]
+
+    train_latencies = []
+    for _ in range(repeat):
+        start = clock()
+        MyFilter().train(corpus_dir)
+        train_latencies.append(clock() - start)
+    results["train"] = summarize(train_latencies, n_emails)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = jpath(tmp_dir, "model.pkl")
+        save_latencies, load_latencies = [], []
+        for _ in range(max(repeat, 5)):
+            start = clock()
+            spam_filter.save_model(model_path)
+            save_latencies.append(clock() - start)
+
+            start = clock()
+            MyFilter().load_model(model_path)
+            load_latencies.append(clock() - start)
+        results["model_save"] = summarize(save_latencies)
+        results["model_load"] = summarize(load_latencies)
+        results["model_save"]["model_bytes"] = os.path.getsize(model_path)
+
+    return {
+        "n_emails": n_emails // repeat,
+        "n_bytes": n_bytes // repeat,
+        "stages": results,
+    }
+
+
+def build_scaled_corpus(src_dir, dst_dir, scale):
+    """
+    Build a synthetic corpus by replicating every email of a corpus `scale` times.
+    :param src_dir: Source corpus directory with a `!truth.txt` file.
+    :param dst_dir: Destination directory, created if needed.
+    :param scale: Number of copies of each email.
+    """
+    os.makedirs(dst_dir, exist_ok=True)
+    truth = read_classification_from_file(jpath(src_dir, TRUTH_FILENAME))
+    scaled_truth = dict()
+
+    for filename, label in truth.items():
+        for copy in range(scale):
+            copy_name = f"{copy:04d}.{filename}"
+            shutil.copyfile(jpath(src_dir, filename), jpath(dst_dir, copy_name))
+            scaled_truth[copy_name] = label
+
+    write_classification_to_file(jpath(dst_dir, TRUTH_FILENAME), scaled_truth)
+
+
+def load_thresholds(path):
+    """
+    Load regression thresholds.
+    :param path: JSON file with a `default` relative threshold and optional
+        per-stage overrides under `stages`.
+    :return: Dictionary with keys `default` and `stages`.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return {"default": config.get("default", 0.2), "stages": config.get("stages", dict())}
+
+
+def compare_results(current, baseline, thresholds):
+    """
+    Compare benchmark results with a baseline.
+    :param current: Results produced by `run`.
+    :param baseline: Results of an earlier run.
+    :param thresholds: Dictionary as returned by `load_thresholds`.
+    :return: List of regressions as `(corpus, stage, ratio, threshold)` tuples, where
+        ratio is the current mean latency divided by the baseline mean latency.
+    """
+    regressions = []
+    for corpus_name, corpus_results in current["corpora"].items():
+        baseline_corpus = baseline["corpora"].get(corpus_name)
+        if baseline_corpus is None:
+            continue
+
+        for stage, summary in corpus_results["stages"].items():
+            baseline_summary = baseline_corpus["stages"].get(stage)
+            if baseline_summary is None or baseline_summary["mean_us"] <= 0:
+                continue
+
+            threshold = thresholds["stages"].get(stage, thresholds["default"])
+            ratio = summary["mean_us"] / baseline_summary["mean_us"]
+            if ratio > 1 + threshold:
+                regressions.append((corpus_name, stage, ratio, threshold))
+
+    return regressions
+
+
+def run(corpora=DEFAULT_CORPORA, scale=0, repeat=1, synthetic=0):
+    """
+    Run the benchmark suite.
+    :param corpora: Corpus directories to measure.
+    :param scale: If positive, also measure a corpus `scale` times larger than the
+        first corpus.
+    :param repeat: Number of passes over each corpus.
+    :param synthetic: If positive, also measure a generated corpus of this many emails.
+    :return: Dictionary with run metadata and per-corpus results.
+    """
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "timestamp": time.time(),
+            "repeat": repeat,
+        },
+        "corpora": dict(),
+    }
+
+    for corpus_dir in corpora:
+        results["corpora"][corpus_dir] = bench_corpus(corpus_dir, repeat)
+
+    if scale > 0:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            build_scaled_corpus(corpora[0], tmp_dir, scale)
+            results["corpora"][f"{corpora[0]}x{scale}"] = bench_corpus(tmp_dir, repeat)
+
+    if synthetic > 0:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            SyntheticCorpusGenerator(seed=0).write_corpus(tmp_dir, synthetic)
+            results["corpora"][f"synthetic{synthetic}"] = bench_corpus(tmp_dir, repeat)
+
+    return results
+
+
+def print_results(results):
+    """
+    Print a human-readable table of the results.
+    :param results: Results produced by `run`.
+    """
+    for corpus_name, corpus_results in results["corpora"].items():
+        print(f"{corpus_name}: {corpus_results['n_emails']} emails, {corpus_results['n_bytes']} bytes")
+        for stage in STAGES:
+            s = corpus_results["stages"][stage]
+            print(f"  {stage:<12} {s['throughput_per_s']:>12.1f} items/s"
+                  f"  mean {s['mean_us']:>10.1f} us  p50 {s['p50_us']:>10.1f} us"
+                  f"  p90 {s['p90_us']:>10.1f} us  p99 {s['p99_us']:>10.1f} us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-stage benchmark suite of the spam filter.")
+    parser.add_argument("corpora", nargs="*", default=list(DEFAULT_CORPORA))
+    parser.add_argument("--scale", type=int, default=0, help="size multiplier of the synthetic corpus")
+    parser.add_argument("--synthetic", type=int, default=0, help="number of emails of the generated corpus")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over each corpus")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS_PATH, help="JSON file with regression thresholds")
+    args = parser.parse_args(argv)
+
+    results = run(args.corpora, args.scale, args.repeat, args.synthetic)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, load_thresholds(args.thresholds))
+        for corpus_name, stage, ratio, threshold in regressions:
+            print(f"REGRESSION {corpus_name} {stage}: {ratio:.2f}x baseline (threshold +{100 * threshold:.0f} %)")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
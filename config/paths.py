@@ -3,6 +3,9 @@ import os
 # ? Standard filenames for truth and prediction
 TRUTH_FILENAME = '!truth.txt'
 PREDICTION_FILENAME = '!prediction.txt'
+SCORES_FILENAME = '!scores.txt'
+MANIFEST_FILENAME = '!manifest.json'
+SHADOW_FILENAME = '!shadow.txt'
 
 
 def jpath(directory, filename):
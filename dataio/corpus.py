@@ -1,36 +1,158 @@
+import mmap
 import os
+from contextlib import nullcontext
+from email.parser import BytesHeaderParser
 
 from config.paths import jpath
 
 
+class EmailHandle:
+    """
+    Lazy handle of one email file. Nothing is read until contents are requested, and
+    the handle keeps no file open between calls, so any number of handles can be held.
+
+    :ivar MMAP_THRESHOLD: Size in bytes from which `headers` maps the file instead of
+        reading it, so the body of a large email is never copied.
+    :ivar filename: The name of the email file.
+    :ivar path: Path to the email file.
+    """
+    MMAP_THRESHOLD = 1 << 16
+
+    def __init__(self, src, filename, stats=None, size=None):
+        """
+        :param src: Path to the folder containing the email file.
+        :param filename: The name of the email file.
+        :param stats: Optional `RunStats` recording read time and bytes read.
+        :param size: Size of the file in bytes if known, e.g. from a manifest.
+        """
+        self.filename = filename
+        self.path = jpath(src, filename)
+        self.stats = stats
+        self._size = size
+
+    @property
+    def size(self):
+        """Size of the email file in bytes, without reading it."""
+        if self._size is None:
+            self._size = os.stat(self.path).st_size
+        return self._size
+
+    def _reading(self):
+        """
+        :return: Context manager measuring a read when instrumentation is enabled.
+        """
+        return nullcontext() if self.stats is None else self.stats.stage("read")
+
+    def _record(self, nbytes):
+        if self.stats is not None:
+            self.stats.record_bytes(nbytes)
+
+    def read(self, n=-1):
+        """
+        :param n: Number of bytes to read from the start of the file, all if negative.
+        :return: The raw bytes.
+        """
+        with self._reading(), open(self.path, 'rb') as f:
+            data = f.read(n)
+        self._record(len(data))
+        return data
+
+    def read_all(self):
+        """
+        :return: The full content of the email, as yielded by `Corpus.emails`: text if
+            the file is valid UTF-8, otherwise the raw bytes, e.g. of 8-bit mail in a
+            national charset, which the extractor decodes with the declared charset.
+        """
+        with self._reading():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    body = f.read()
+            except UnicodeDecodeError:
+                with open(self.path, 'rb') as f:
+                    body = f.read()
+            if self.stats is not None:
+                self._record(os.stat(self.path).st_size)
+        return body
+
+    def headers(self):
+        """
+        Parse the header block of the email, up to the first empty line. The body is
+        neither read nor parsed.
+
+        :return: `email.message.Message` with the headers and an empty payload.
+        """
+        with self._reading(), open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size >= self.MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    head = mapped[:_header_end(mapped)]
+            else:
+                data = f.read()
+                head = data[:_header_end(data)]
+        self._record(len(head))
+        return BytesHeaderParser().parsebytes(head)
+
+
+def _header_end(data):
+    """
+    :param data: Raw email as str, bytes or mmap, with LF or CRLF line endings.
+    :return: Position after the line ending the header block, the length of the data
+        if it has no body.
+    """
+    end = len(data)
+    for separator in ('\n\n', '\r\n\r\n') if isinstance(data, str) else (b'\n\n', b'\r\n\r\n'):
+        i = data.find(separator)
+        if 0 <= i < end:
+            end = i + len(separator) // 2
+    return end
+
+
 class Corpus:
     """
     Represents a collection of email files in a directory.
     """
 
-    def __init__(self, src):
+    def __init__(self, src, stats=None, manifest=None):
         """
         Initialize the Corpus with a source directory.
         :param src: Path to the folder containing email files.
+        :param stats: Optional `RunStats` recording read time and bytes read.
+        :param manifest: Optional `CorpusManifest` of the directory. Emails are then read
+         in its disk order, and the directory is not listed.
         """
         if not os.path.isdir(src):
             raise ValueError(f"Invalid directory path: {src}")
 
         self.src = src
+        self.stats = stats
+        self.manifest = manifest
 
-    def emails(self):
+    def handles(self, select=None):
         """
-        Generator that yields all emails in the corpus.
-        :return: A tuple `(filename, body)`, where `filename` is the name of the email file
-         and `body` is its full text content.
+        Generator that yields a lazy handle of every email in the corpus. No email is
+        read until a method of its handle asks for contents.
+        :param select: Optional predicate on filenames. Emails it rejects are skipped.
+        :return: An `EmailHandle` for each email.
         """
-        filenames = os.listdir(self.src)
+        manifest = self.manifest
+        filenames = os.listdir(self.src) if manifest is None else manifest.filenames()
 
         for filename in filenames:
             if filename.startswith('!'):
                 continue
+            if select is not None and not select(filename):
+                continue
+
+            size = None if manifest is None else manifest[filename].size
+            yield EmailHandle(self.src, filename, self.stats, size)
 
-            abspath = jpath(self.src, filename)
-            with open(abspath, 'r', encoding='utf-8') as f:
-                body = f.read()
-                yield filename, body
+    def emails(self, select=None):
+        """
+        Generator that yields all emails in the corpus.
+        :param select: Optional predicate on filenames. Emails it rejects are skipped
+         without being read.
+        :return: A tuple `(filename, body)`, where `filename` is the name of the email file
+         and `body` is its full content, see `EmailHandle.read_all`.
+        """
+        for handle in self.handles(select):
+            yield handle.filename, handle.read_all()
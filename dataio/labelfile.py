@@ -0,0 +1,356 @@
+"""
+Compact binary format for classification files (truth and predictions).
+
+Usage:
+    python -m dataio.labelfile to-binary TEXT_PATH BINARY_PATH [--scores SCORES_PATH] [--model-id ID]
+    python -m dataio.labelfile to-text BINARY_PATH TEXT_PATH [--scores SCORES_PATH]
+
+The file holds a fixed-size header, a small JSON table of the distinct labels and
+model ids, and then columns of the records sorted by filename: the offsets of the
+filenames, the label indices, optionally the model id indices and the float scores,
+and finally the newline-separated filenames. Columns are read and written in bulk
+with `array`, and the sorted offsets allow a binary search of one filename over a
+memory map, without loading the whole file.
+"""
+import argparse
+import json
+import math
+import mmap
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from itertools import accumulate, repeat
+
+from utils import read_classification_from_file, write_classification_to_file, \
+    read_scores_from_file, write_scores_to_file
+
+MAGIC = b"CLSB"
+VERSION = 1
+
+# Flags of the header
+HAS_SCORES = 1
+HAS_MODEL_IDS = 2
+
+# magic, version, flags, number of records, size of the tables, size of the names
+_HEADER = struct.Struct("<4sHHIII")
+_OFFSET = struct.Struct("<I")
+_NO_MODEL = 0xFFFF
+
+LabelRecord = namedtuple("LabelRecord", ["filename", "label", "score", "model_id"])
+
+
+def _to_bytes(typecode, values):
+    """
+    :return: Little-endian bytes of an array of the values.
+    """
+    column = array(typecode, values)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_bytes(typecode, buffer):
+    """
+    :return: Array of the values stored by `_to_bytes`.
+    """
+    column = array(typecode)
+    column.frombytes(buffer)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column
+
+
+def _table_index(values):
+    """
+    :param values: Iterable of hashable values.
+    :return: A tuple `(table, index)` of the sorted distinct values and a dictionary
+        mapping each value to its position.
+    """
+    table = sorted(set(values))
+    return table, {value: i for i, value in enumerate(table)}
+
+
+class _Layout:
+    """
+    Positions of the columns of a label file, parsed from its header.
+    """
+
+    def __init__(self, buffer):
+        """
+        :param buffer: Bytes-like object with the contents of a label file.
+        :raises ValueError: If the buffer is not a label file of a known version.
+        """
+        if len(buffer) < _HEADER.size:
+            raise ValueError("Not a binary label file")
+        magic, version, self.flags, self.count, tables_size, names_size = _HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a binary label file")
+
+        tables = json.loads(bytes(buffer[_HEADER.size:_HEADER.size + tables_size]).decode("utf-8"))
+        self.labels = tables["labels"]
+        self.models = tables["models"]
+
+        count = self.count
+        self.offsets = _HEADER.size + tables_size
+        self.label_indices = self.offsets + 4 * (count + 1)
+        self.model_indices = self.label_indices + count
+        self.scores = self.model_indices + (2 * count if self.flags & HAS_MODEL_IDS else 0)
+        self.names = self.scores + (8 * count if self.flags & HAS_SCORES else 0)
+        self.end = self.names + names_size
+
+    def record(self, buffer, position, filename):
+        """
+        Decode the record at a position, except for its filename.
+        :return: LabelRecord instance.
+        """
+        label = self.labels[buffer[self.label_indices + position]]
+        model_id = score = None
+        if self.flags & HAS_MODEL_IDS:
+            index, = struct.unpack_from("<H", buffer, self.model_indices + 2 * position)
+            model_id = None if index == _NO_MODEL else self.models[index]
+        if self.flags & HAS_SCORES:
+            score, = struct.unpack_from("<d", buffer, self.scores + 8 * position)
+            score = None if math.isnan(score) else score
+        return LabelRecord(filename, label, score, model_id)
+
+
+def write_labels(filepath, classifications, scores=None, model_ids=None):
+    """
+    Write classifications to a binary label file.
+    :param filepath: Path to the output file.
+    :param classifications: Dictionary with filenames and classification labels.
+    :param scores: Optional dictionary with filenames and float scores. Emails without
+        a score are stored with no score.
+    :param model_ids: Optional model id, either one string for all emails or a
+        dictionary with filenames and model ids.
+    :raises ValueError: If there are more distinct labels or model ids than the format
+        allows, or a filename contains a newline.
+    """
+    labels, label_index = _table_index(classifications.values())
+    if model_ids is None:
+        models, model_index = [], {}
+    else:
+        models, model_index = _table_index([model_ids] if isinstance(model_ids, str) else model_ids.values())
+    if len(labels) > 0xFF or len(models) >= _NO_MODEL:
+        raise ValueError("Too many distinct labels or model ids")
+
+    # Code point order of strings is the byte order of their UTF-8 encoding
+    filenames = sorted(classifications)
+    text = "\n".join(filenames)
+    blob = text.encode("utf-8")
+    if text.count("\n") != max(len(filenames) - 1, 0):
+        raise ValueError("Filenames must not contain newlines")
+    lengths = map(len, filenames) if len(blob) == len(text) \
+        else (len(filename.encode("utf-8")) for filename in filenames)
+
+    columns = [
+        _to_bytes("I", accumulate((length + 1 for length in lengths), initial=0)),
+        bytes(map(label_index.__getitem__, map(classifications.__getitem__, filenames))),
+    ]
+    flags = 0
+    if model_ids is not None:
+        flags |= HAS_MODEL_IDS
+        if isinstance(model_ids, str):
+            columns.append(_to_bytes("H", [0]) * len(filenames))
+        else:
+            model_index[None] = _NO_MODEL
+            columns.append(_to_bytes("H", map(model_index.__getitem__, map(model_ids.get, filenames))))
+    if scores is not None:
+        flags |= HAS_SCORES
+        columns.append(_to_bytes("d", map(scores.get, filenames, repeat(math.nan))))
+
+    tables = json.dumps({"labels": labels, "models": models}).encode("utf-8")
+    with open(filepath, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, flags, len(filenames), len(tables), len(blob)))
+        f.write(tables)
+        for column in columns:
+            f.write(column)
+        f.write(blob)
+
+
+def _read(filepath):
+    """
+    :return: A tuple `(buffer, layout, filenames)` with the whole contents of a label file.
+    """
+    with open(filepath, "rb") as f:
+        buffer = f.read()
+    layout = _Layout(buffer)
+    filenames = buffer[layout.names:layout.end].decode("utf-8").split("\n") if layout.count else []
+    return buffer, layout, filenames
+
+
+def iter_records(filepath):
+    """
+    Generator of all records of a binary label file, in filename order.
+    :param filepath: Path to the label file.
+    :return: LabelRecord for each email.
+    """
+    buffer, layout, filenames = _read(filepath)
+    for position, filename in enumerate(filenames):
+        yield layout.record(buffer, position, filename)
+
+
+def read_labels(filepath):
+    """
+    Read classifications from a binary label file as a dictionary.
+    :param filepath: Path to the label file.
+    :return: Dictionary with filenames and classification labels.
+    """
+    buffer, layout, filenames = _read(filepath)
+    label_indices = buffer[layout.label_indices:layout.label_indices + layout.count]
+    return dict(zip(filenames, map(layout.labels.__getitem__, label_indices)))
+
+
+def read_scores(filepath):
+    """
+    Read the scores of a binary label file as a dictionary.
+    :param filepath: Path to the label file.
+    :return: Dictionary with filenames and float scores, emails without a score are left out.
+    """
+    buffer, layout, filenames = _read(filepath)
+    if not layout.flags & HAS_SCORES:
+        return dict()
+    scores = _from_bytes("d", buffer[layout.scores:layout.names])
+    return {filename: score for filename, score in zip(filenames, scores) if not math.isnan(score)}
+
+
+def is_label_file(filepath):
+    """
+    :param filepath: Path to a classification file.
+    :return: True if the file is a binary label file, False if it is a text file.
+    """
+    with open(filepath, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_classification(filepath):
+    """
+    Read classifications from a file in either the text or the binary format.
+    :param filepath: Path to the classification file.
+    :return: Dictionary with filenames and classification labels.
+    """
+    if is_label_file(filepath):
+        return read_labels(filepath)
+    return read_classification_from_file(filepath)
+
+
+class LabelFile:
+    """
+    Memory-mapped binary label file for looking up single emails.
+
+    Only the header is parsed when the file is opened; `lookup` binary-searches the
+    sorted filenames and reads O(log n) of them.
+    """
+
+    def __init__(self, filepath):
+        """
+        :param filepath: Path to the label file.
+        :raises ValueError: If the file is not a binary label file.
+        """
+        self._file = open(filepath, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._layout = _Layout(self._map)
+        except ValueError:
+            # Empty files cannot be mapped
+            self.close()
+            raise ValueError("Not a binary label file")
+
+    def __len__(self):
+        return self._layout.count
+
+    def __contains__(self, filename):
+        return self.lookup(filename) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+        self._file.close()
+
+    def _name(self, position):
+        """
+        :param position: Position of the record in the sorted order.
+        :return: The encoded filename of the record.
+        """
+        layout = self._layout
+        start, = _OFFSET.unpack_from(self._map, layout.offsets + 4 * position)
+        end, = _OFFSET.unpack_from(self._map, layout.offsets + 4 * (position + 1))
+        return self._map[layout.names + start:layout.names + end - 1]
+
+    def lookup(self, filename):
+        """
+        Find the record of one email.
+        :param filename: The name of the email file.
+        :return: LabelRecord, or None if the file has no record for the email.
+        """
+        target = filename.encode("utf-8")
+        low, high = 0, self._layout.count
+
+        while low < high:
+            middle = (low + high) // 2
+            name = self._name(middle)
+            if name < target:
+                low = middle + 1
+            elif name > target:
+                high = middle
+            else:
+                return self._layout.record(self._map, middle, filename)
+        return None
+
+
+def text_to_binary(text_path, binary_path, scores_path=None, model_id=None):
+    """
+    Convert a text classification file, and optionally a text scores file, to a binary label file.
+    :param text_path: Path to the text classification file.
+    :param binary_path: Path to the output label file.
+    :param scores_path: Optional path to a text scores file.
+    :param model_id: Optional model id of all emails.
+    """
+    scores = read_scores_from_file(scores_path) if scores_path is not None else None
+    write_labels(binary_path, read_classification_from_file(text_path), scores, model_id)
+
+
+def binary_to_text(binary_path, text_path, scores_path=None):
+    """
+    Convert a binary label file to a text classification file, and optionally a text scores file.
+    :param binary_path: Path to the label file.
+    :param text_path: Path to the output text classification file.
+    :param scores_path: Optional path to the output text scores file.
+    """
+    records = list(iter_records(binary_path))
+    write_classification_to_file(text_path, {r.filename: r.label for r in records})
+    if scores_path is not None:
+        write_scores_to_file(scores_path, {r.filename: r.score for r in records if r.score is not None})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert classification files between text and binary formats.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    to_binary = commands.add_parser("to-binary")
+    to_binary.add_argument("text_path")
+    to_binary.add_argument("binary_path")
+    to_binary.add_argument("--scores", default=None)
+    to_binary.add_argument("--model-id", default=None)
+
+    to_text = commands.add_parser("to-text")
+    to_text.add_argument("binary_path")
+    to_text.add_argument("text_path")
+    to_text.add_argument("--scores", default=None)
+
+    args = parser.parse_args(argv)
+    if args.command == "to-binary":
+        text_to_binary(args.text_path, args.binary_path, args.scores, args.model_id)
+    else:
+        binary_to_text(args.binary_path, args.text_path, args.scores)
+
+
+if __name__ == "__main__":
+    main()
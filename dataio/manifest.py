@@ -0,0 +1,290 @@
+"""
+Corpus manifest for huge directories and incremental re-processing.
+
+Usage:
+    python -m dataio.manifest CORPUS_DIR [--shards N]
+
+The manifest `!manifest.json` lists every email file of a corpus directory with
+its size, modification time, inode and content digest. It is built with
+`os.scandir` and updated incrementally: only files whose size, modification time
+or inode changed are read and hashed again. Emails are iterated in inode order,
+which approximates their order on disk, results of processing can be cached by
+content digest, and the corpus can be split into shards of balanced byte size.
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import os
+from collections import namedtuple
+
+from config.paths import jpath, MANIFEST_FILENAME
+from dataio.corpus import EmailHandle
+
+VERSION = 1
+
+ManifestEntry = namedtuple("ManifestEntry", ["filename", "size", "mtime_ns", "inode", "digest"])
+
+
+def file_digest(filepath):
+    """
+    :param filepath: Path to a file.
+    :return: Hex digest of the contents of the file.
+    """
+    with open(filepath, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+class CorpusManifest:
+    """
+    Listing of the email files of a corpus directory with their metadata and digests.
+
+    :ivar src: Path to the corpus directory.
+    """
+
+    def __init__(self, src, entries=()):
+        """
+        :param src: Path to the corpus directory.
+        :param entries: Iterable of ManifestEntry.
+        """
+        self.src = src
+        self._entries = {entry.filename: entry for entry in entries}
+
+    @property
+    def path(self):
+        """Path to the manifest file."""
+        return jpath(self.src, MANIFEST_FILENAME)
+
+    @classmethod
+    def load(cls, src):
+        """
+        Read the manifest of a corpus directory without listing the directory.
+        :param src: Path to the corpus directory.
+        :return: CorpusManifest, empty if the directory has no valid manifest.
+        """
+        try:
+            with open(jpath(src, MANIFEST_FILENAME), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(src)
+        if not isinstance(data, dict) or data.get("version") != VERSION:
+            return cls(src)
+        return cls(src, (ManifestEntry(*entry) for entry in data["entries"]))
+
+    @classmethod
+    def build(cls, src):
+        """
+        Load, update and save the manifest of a corpus directory.
+        :param src: Path to the corpus directory.
+        :return: The up-to-date CorpusManifest.
+        """
+        manifest = cls.load(src)
+        if any(manifest.update().values()):
+            manifest.save()
+        return manifest
+
+    def save(self):
+        """
+        Write the manifest file. The file is replaced atomically.
+        """
+        data = {"version": VERSION, "entries": [list(entry) for entry in self.entries()]}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def update(self):
+        """
+        Scan the directory and bring the manifest up to date. Files whose size,
+        modification time and inode are unchanged keep their digest without being read.
+        :return: Dictionary with the lists of `added`, `changed` and `removed` filenames,
+            and of `touched` files with new metadata but the same contents.
+        """
+        old_entries = self._entries
+        entries = dict()
+        added, changed, touched = [], [], []
+
+        with os.scandir(self.src) as scan:
+            for dir_entry in scan:
+                filename = dir_entry.name
+                if filename.startswith("!") or not dir_entry.is_file():
+                    continue
+
+                st = dir_entry.stat()
+                old = old_entries.get(filename)
+                if old is not None and (old.size, old.mtime_ns, old.inode) == (st.st_size, st.st_mtime_ns, st.st_ino):
+                    entries[filename] = old
+                    continue
+
+                digest = file_digest(dir_entry.path)
+                entries[filename] = ManifestEntry(filename, st.st_size, st.st_mtime_ns, st.st_ino, digest)
+                if old is None:
+                    added.append(filename)
+                elif old.digest != digest:
+                    changed.append(filename)
+                else:
+                    touched.append(filename)
+
+        removed = [filename for filename in old_entries if filename not in entries]
+        self._entries = entries
+        return {"added": added, "changed": changed, "removed": removed, "touched": touched}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, filename):
+        return filename in self._entries
+
+    def __getitem__(self, filename):
+        return self._entries[filename]
+
+    def entries(self):
+        """
+        :return: List of ManifestEntry in inode order, an approximation of disk order.
+        """
+        return sorted(self._entries.values(), key=lambda entry: entry.inode)
+
+    def filenames(self):
+        """
+        :return: List of filenames in inode order.
+        """
+        return [entry.filename for entry in self.entries()]
+
+    @property
+    def total_bytes(self):
+        """Total size of the listed files in bytes."""
+        return sum(entry.size for entry in self._entries.values())
+
+    def shards(self, count):
+        """
+        Split the files into shards of balanced total size. Files are assigned from the
+        largest to the shard with the fewest bytes so far.
+        :param count: Number of shards.
+        :return: List of `count` lists of filenames, each in inode order.
+        :raises ValueError: If the number of shards is not positive.
+        """
+        if count < 1:
+            raise ValueError(f"Invalid number of shards: {count}")
+
+        heap = [(0, i) for i in range(count)]
+        shards = [[] for _ in range(count)]
+        for entry in sorted(self._entries.values(), key=lambda entry: (-entry.size, entry.filename)):
+            size, i = heapq.heappop(heap)
+            shards[i].append(entry)
+            heapq.heappush(heap, (size + entry.size, i))
+
+        return [[entry.filename for entry in sorted(shard, key=lambda entry: entry.inode)] for shard in shards]
+
+
+class ResultCache:
+    """
+    Results of processing emails keyed by their content digest, stored in the corpus
+    directory as JSON in `!cache-<name>.json`. Renamed or copied files reuse the results
+    of identical contents. The file is data only, so a file dropped into the directory
+    cannot run code, and a file that fails to load is treated as an empty cache.
+    """
+
+    def __init__(self, src, name):
+        """
+        :param src: Path to the corpus directory.
+        :param name: Name of the cached results, e.g. `tokens`. Change it when the
+            processing changes.
+        """
+        self.path = jpath(src, f"!cache-{name}.json")
+        self._results = dict()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == VERSION and isinstance(data.get("results"), dict):
+            self._results = data["results"]
+
+    def __contains__(self, digest):
+        return digest in self._results
+
+    def get(self, digest):
+        """
+        :param digest: Content digest of an email.
+        :return: The cached result.
+        :raises KeyError: If there is no result for the digest.
+        """
+        return self._results[digest]
+
+    def put(self, digest, result):
+        """
+        :param digest: Content digest of an email.
+        :param result: JSON-serializable result of processing the email. Tuples are
+            read back from the file as lists.
+        """
+        self._results[digest] = result
+
+    def save(self, manifest):
+        """
+        Write the cache, keeping only results of files still in the manifest. The file
+        is replaced atomically.
+        :param manifest: CorpusManifest of the corpus.
+        """
+        live = {entry.digest for entry in manifest.entries()}
+        results = {digest: result for digest, result in self._results.items() if digest in live}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION, "results": results}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+
+def process_corpus(src, name, process, filenames=None):
+    """
+    Apply a function to the emails of a corpus, reusing the cached results of files
+    whose contents did not change. Only changed and new files are read.
+    :param src: Path to the corpus directory.
+    :param name: Name of the cached results, see `ResultCache`.
+    :param process: Function of the raw email contents, returning a JSON-serializable
+        result.
+    :param filenames: Optional iterable of filenames to process, e.g. one of
+        `CorpusManifest.shards`; all files in inode order by default.
+    :return: List of `(filename, result)` tuples.
+    """
+    manifest = CorpusManifest.build(src)
+    cache = ResultCache(src, name)
+    results = []
+    misses = 0
+
+    for filename in manifest.filenames() if filenames is None else filenames:
+        digest = manifest[filename].digest
+        if digest in cache:
+            result = cache.get(digest)
+        else:
+            result = process(EmailHandle(src, filename).read_all())
+            cache.put(digest, result)
+            misses += 1
+        results.append((filename, result))
+
+    if misses:
+        cache.save(manifest)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or update the manifest of a corpus directory.")
+    parser.add_argument("corpus_dir")
+    parser.add_argument("--shards", type=int, default=None, help="also print the byte size of N balanced shards")
+    args = parser.parse_args(argv)
+
+    manifest = CorpusManifest.load(args.corpus_dir)
+    changes = manifest.update()
+    if any(changes.values()):
+        manifest.save()
+
+    summary = {
+        "files": len(manifest),
+        "bytes": manifest.total_bytes,
+        "changes": {key: len(filenames) for key, filenames in changes.items()},
+    }
+    if args.shards is not None:
+        summary["shard_bytes"] = [sum(manifest[f].size for f in shard) for shard in manifest.shards(args.shards)]
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
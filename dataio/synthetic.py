@@ -0,0 +1,316 @@
+"""
+Generator of synthetic email corpora for load and scale testing.
+
+Usage:
+    python -m dataio.synthetic OUTPUT_DIR [--count N] [--seed S] [--spam-ratio R]
+                               [--pathological-rate R] [--huge-size BYTES]
+
+The generated directory has the same layout as data/1 and data/2: one file per
+email and a `!truth.txt` with the labels. Generation is streamed, so corpora of
+millions of emails are written without holding them in memory, and it is fully
+determined by the seed.
+"""
+import argparse
+import base64
+import os
+import quopri
+import random
+from datetime import datetime
+
+from config.paths import jpath, TRUTH_FILENAME
+from config.labels import HAM_TAG, SPAM_TAG
+
+LCCHARS = 'abcdefghijklmnopqrstuvwxyz'
+FNAMECHARS = LCCHARS + '0123456789'
+# Dates from 2002-05-30 to 2010-08-16 will be used
+DATETIME_ORDINAL_RANGE = (731000, 734000)
+
+HAM_WORDS = (
+    "meeting", "project", "report", "attached", "schedule", "tomorrow", "thanks", "review",
+    "patch", "release", "build", "kernel", "list", "discussion", "question", "answer",
+    "version", "bug", "fixed", "server", "config", "lunch", "weekend", "family", "draft",
+    "comments", "agenda", "notes", "deadline", "team", "python", "mailing", "archive",
+)
+SPAM_WORDS = (
+    "free", "offer", "click", "money", "cash", "credit", "winner", "prize", "viagra",
+    "cheap", "discount", "limited", "guarantee", "investment", "mortgage", "rates",
+    "unsubscribe", "casino", "bonus", "urgent", "million", "pharmacy", "loan", "deal",
+    "order", "now", "risk", "income", "opportunity", "exclusive", "save", "act",
+)
+COMMON_WORDS = (
+    "the", "and", "you", "for", "this", "that", "with", "have", "will", "your", "from",
+    "are", "our", "all", "please", "email", "time", "new", "more", "information", "here",
+)
+NATIONAL_TEXT = {
+    "iso-8859-2": "Příliš žluťoučký kůň úpěl ďábelské ódy",
+    "windows-1250": "Dobrý den, posíláme nabídku zdarma",
+    "koi8-r": "Бесплатное предложение только сегодня",
+    "iso-8859-1": "Offre spéciale très intéressante à découvrir",
+    "utf-8": "Zvláštní nabídka – jen dnes € 100",
+}
+
+# The kinds of generated emails with their relative weights per class
+HAM_KINDS = (("plain", 6), ("multipart_alternative", 2), ("quoted_printable", 1),
+             ("base64", 1), ("attachment", 2), ("utf8_8bit", 1), ("national_8bit", 1))
+SPAM_KINDS = (("plain", 2), ("html", 5), ("multipart_alternative", 3), ("quoted_printable", 2),
+              ("base64", 2), ("attachment", 1), ("national_8bit", 1))
+
+
+class SyntheticCorpusGenerator:
+    """
+    Produces realistic, reproducible fake emails with known labels.
+
+    Emails mix plain text, HTML, multipart/alternative and multipart/mixed messages,
+    quoted-printable and base64 transfer encodings, national charsets and base64
+    attachments. A fraction of emails is pathological (empty body, huge body, very
+    long lines, many MIME parts). Text in national charsets is either transfer-encoded
+    or sent as 8-bit text; emails of the latter kind are not valid UTF-8, so they are
+    generated as bytes, and all other emails as strings.
+
+    :ivar spam_ratio: Probability that an email is spam.
+    :ivar pathological_rate: Probability that an email is pathological.
+    :ivar huge_size: Approximate size in bytes of huge pathological emails.
+    """
+
+    def __init__(self, seed=0, spam_ratio=0.5, pathological_rate=0.01, huge_size=2 * 1024 * 1024):
+        """
+        :param seed: Seed of the random generator, equal seeds give equal corpora.
+        :param spam_ratio: Probability that an email is spam.
+        :param pathological_rate: Probability that an email is pathological.
+        :param huge_size: Approximate size in bytes of huge pathological emails.
+        """
+        self._rng = random.Random(seed)
+        self.spam_ratio = spam_ratio
+        self.pathological_rate = pathological_rate
+        self.huge_size = huge_size
+
+    def random_string(self, length=8, chars=FNAMECHARS):
+        return ''.join(self._rng.choice(chars) for _ in range(length))
+
+    def random_email_address(self):
+        return self.random_string(5, LCCHARS) + '@' + self.random_string(7, LCCHARS) + '.' + \
+            self.random_string(3, LCCHARS)
+
+    def random_date(self):
+        d = datetime.fromordinal(self._rng.randint(*DATETIME_ORDINAL_RANGE))
+        return d.strftime('%a, %d %b %Y %H:%M:%S +0200')
+
+    def random_filename(self, index):
+        """
+        Create a filename in the style of the bundled corpora (number and hash).
+        """
+        return f"{index:05d}.{self._rng.getrandbits(128):032x}"
+
+    def _words(self, is_spam, n_words):
+        """
+        Create a text of class-specific and common words.
+        """
+        rng = self._rng
+        specific = SPAM_WORDS if is_spam else HAM_WORDS
+        words = [rng.choice(specific) if rng.random() < 0.4 else rng.choice(COMMON_WORDS)
+                 for _ in range(n_words)]
+        if is_spam and rng.random() < 0.5:
+            words.append(f"http://{self.random_string(8, LCCHARS)}.com/{self.random_string(12)}")
+        if rng.random() < 0.3:
+            words.append(f"${rng.randint(1, 10000)}")
+
+        lines = [' '.join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        return '\n'.join(lines)
+
+    def _html(self, text):
+        """
+        Wrap a text into an HTML document with entities, styles and scripts.
+        """
+        paragraphs = ''.join(f"<p>{line} &amp; more&nbsp;&#8364;</p>\n" for line in text.split('\n'))
+        return (
+            "<html><head><style>p {color: red}</style>"
+            "<script>var tracking = '" + self.random_string(16) + "';</script></head>\n"
+            f"<body><table><tr><td>{paragraphs}</td></tr></table>"
+            f"<a href=\"http://{self.random_string(8, LCCHARS)}.com\">Click here</a></body></html>"
+        )
+
+    def _headers(self, is_spam, content_type, extra=()):
+        """
+        Create the header block of an email.
+        """
+        rng = self._rng
+        subject = self._words(is_spam, rng.randint(2, 8)).replace('\n', ' ')
+        headers = [
+            f"Return-Path: <{self.random_email_address()}>",
+            f"Received: from {self.random_string(8, LCCHARS)}.net ([{rng.randint(1, 255)}.{rng.randint(0, 255)}."
+            f"{rng.randint(0, 255)}.{rng.randint(0, 255)}]) by mail.example.com; {self.random_date()}",
+            f"From: {self.random_email_address()}",
+            f"To: {self.random_email_address()}",
+            f"Date: {self.random_date()}",
+            f"Subject: {subject}",
+            f"Message-Id: <{self.random_string(20)}@{self.random_string(7, LCCHARS)}.com>",
+            "MIME-Version: 1.0",
+            f"Content-Type: {content_type}",
+        ]
+        if rng.random() < 0.3:
+            headers.append(f"Reply-To: {self.random_email_address()}")
+        headers.extend(extra)
+        return '\n'.join(headers)
+
+    def _boundary(self):
+        return "----=_Part_" + self.random_string(24)
+
+    def _body(self, kind, is_spam):
+        """
+        Create a complete email of the given kind.
+        :return: Email contents as a string, or as bytes for 8-bit text in a national
+            charset.
+        """
+        rng = self._rng
+        text = self._words(is_spam, rng.randint(20, 400))
+
+        if kind == "plain":
+            return self._headers(is_spam, 'text/plain; charset="us-ascii"') + "\n\n" + text + "\n"
+
+        if kind == "html":
+            return self._headers(is_spam, 'text/html; charset="us-ascii"') + "\n\n" + self._html(text) + "\n"
+
+        if kind == "utf8_8bit":
+            headers = self._headers(is_spam, 'text/plain; charset="utf-8"', ("Content-Transfer-Encoding: 8bit",))
+            return headers + "\n\n" + NATIONAL_TEXT["utf-8"] + "\n" + text + "\n"
+
+        if kind == "national_8bit":
+            charset = rng.choice(sorted(c for c in NATIONAL_TEXT if c != "utf-8"))
+            headers = self._headers(is_spam, f'text/plain; charset="{charset}"', ("Content-Transfer-Encoding: 8bit",))
+            return (headers + "\n\n" + NATIONAL_TEXT[charset] + "\n" + text + "\n").encode(charset)
+
+        if kind == "quoted_printable":
+            charset = rng.choice(sorted(NATIONAL_TEXT))
+            payload = (NATIONAL_TEXT[charset] + "\n" + text).encode(charset)
+            encoded = quopri.encodestring(payload).decode('ascii')
+            headers = self._headers(is_spam, f'text/plain; charset="{charset}"',
+                                    ("Content-Transfer-Encoding: quoted-printable",))
+            return headers + "\n\n" + encoded + "\n"
+
+        if kind == "base64":
+            charset = rng.choice(sorted(NATIONAL_TEXT))
+            payload = (NATIONAL_TEXT[charset] + "\n" + text).encode(charset)
+            headers = self._headers(is_spam, f'text/plain; charset="{charset}"',
+                                    ("Content-Transfer-Encoding: base64",))
+            return headers + "\n\n" + base64.encodebytes(payload).decode('ascii')
+
+        if kind == "multipart_alternative":
+            boundary = self._boundary()
+            headers = self._headers(is_spam, f'multipart/alternative; boundary="{boundary}"')
+            return (
+                f"{headers}\n\nThis is a multi-part message in MIME format.\n\n"
+                f"--{boundary}\nContent-Type: text/plain; charset=\"us-ascii\"\n\n{text}\n\n"
+                f"--{boundary}\nContent-Type: text/html; charset=\"us-ascii\"\n\n{self._html(text)}\n\n"
+                f"--{boundary}--\n"
+            )
+
+        if kind == "attachment":
+            boundary = self._boundary()
+            headers = self._headers(is_spam, f'multipart/mixed; boundary="{boundary}"')
+            attachment = base64.encodebytes(rng.randbytes(rng.randint(1024, 64 * 1024))).decode('ascii')
+            name = self.random_string(8, LCCHARS) + rng.choice((".pdf", ".zip", ".doc", ".jpg"))
+            return (
+                f"{headers}\n\n"
+                f"--{boundary}\nContent-Type: text/plain; charset=\"us-ascii\"\n\n{text}\n\n"
+                f"--{boundary}\nContent-Type: application/octet-stream; name=\"{name}\"\n"
+                f"Content-Transfer-Encoding: base64\nContent-Disposition: attachment; filename=\"{name}\"\n\n"
+                f"{attachment}\n--{boundary}--\n"
+            )
+
+        raise ValueError(f"Unknown email kind: {kind}")
+
+    def _pathological(self, is_spam):
+        """
+        Create a pathological email: empty, huge, with extremely long lines or many parts.
+        """
+        rng = self._rng
+        kind = rng.choice(("empty", "huge", "long_line", "many_parts"))
+
+        if kind == "empty":
+            return self._headers(is_spam, 'text/plain; charset="us-ascii"') + "\n\n"
+
+        if kind == "huge":
+            chunk = self._words(is_spam, 400) + "\n"
+            repeats = max(1, self.huge_size // len(chunk))
+            return self._headers(is_spam, 'text/plain; charset="us-ascii"') + "\n\n" + chunk * repeats
+
+        if kind == "long_line":
+            line = ' '.join(rng.choice(SPAM_WORDS if is_spam else HAM_WORDS) for _ in range(20000))
+            return self._headers(is_spam, 'text/html; charset="us-ascii"') + "\n\n<p>" + line + "</p>\n"
+
+        boundary = self._boundary()
+        parts = ''.join(
+            f"--{boundary}\nContent-Type: text/plain; charset=\"us-ascii\"\n\n{self._words(is_spam, 10)}\n\n"
+            for _ in range(500)
+        )
+        return self._headers(is_spam, f'multipart/mixed; boundary="{boundary}"') + "\n\n" + parts + \
+            f"--{boundary}--\n"
+
+    def generate_email(self):
+        """
+        Create one random email.
+        :return: A tuple `(contents, label)`.
+        """
+        rng = self._rng
+        is_spam = rng.random() < self.spam_ratio
+        label = SPAM_TAG if is_spam else HAM_TAG
+
+        if rng.random() < self.pathological_rate:
+            return self._pathological(is_spam), label
+
+        kinds = SPAM_KINDS if is_spam else HAM_KINDS
+        kind = rng.choices([k for k, _ in kinds], weights=[w for _, w in kinds])[0]
+        return self._body(kind, is_spam), label
+
+    def emails(self, count):
+        """
+        Generator of random emails.
+        :param count: Number of emails.
+        :return: A tuple `(filename, contents, label)` for each email.
+        """
+        for index in range(count):
+            contents, label = self.generate_email()
+            yield self.random_filename(index), contents, label
+
+    def write_corpus(self, dirname, count):
+        """
+        Write a corpus of random emails and its `!truth.txt` file to a directory.
+        :param dirname: Output directory, created if needed.
+        :param count: Number of emails.
+        :return: Number of characters of the written emails, counting the emails
+            generated as bytes in bytes.
+        """
+        os.makedirs(dirname, exist_ok=True)
+        n_bytes = 0
+
+        with open(jpath(dirname, TRUTH_FILENAME), 'w', encoding='utf-8') as truth:
+            for filename, contents, label in self.emails(count):
+                if isinstance(contents, bytes):
+                    with open(jpath(dirname, filename), 'wb') as f:
+                        n_bytes += f.write(contents)
+                    truth.write(filename + ' ' + label + '\n')
+                    continue
+                with open(jpath(dirname, filename), 'w', encoding='utf-8') as f:
+                    n_bytes += f.write(contents)
+                truth.write(filename + ' ' + label + '\n')
+
+        return n_bytes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic email corpus.")
+    parser.add_argument("output_dir")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spam-ratio", type=float, default=0.5)
+    parser.add_argument("--pathological-rate", type=float, default=0.01)
+    parser.add_argument("--huge-size", type=int, default=2 * 1024 * 1024)
+    args = parser.parse_args(argv)
+
+    generator = SyntheticCorpusGenerator(args.seed, args.spam_ratio, args.pathological_rate, args.huge_size)
+    n_bytes = generator.write_corpus(args.output_dir, args.count)
+    print(f"Wrote {args.count} emails ({n_bytes} characters) to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
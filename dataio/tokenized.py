@@ -0,0 +1,130 @@
+import os
+
+from dataio.corpus import Corpus
+from dataio.manifest import process_corpus
+from config.paths import jpath, TRUTH_FILENAME
+from config.labels import SPAM_TAG, HAM_TAG
+from text.extractor import EmailBodyExtractor
+from text.tokenizer import EmailTokenizer
+from utils import read_classification_from_file
+
+
+# Name of the token cache, change it when the extraction or tokenization changes
+TOKENS_CACHE_NAME = "tokens-v1"
+
+
+class TokenizedCorpus:
+    """
+    An in-memory corpus of already extracted and tokenized emails.
+
+    It lets several consumers (filters, evaluation folds, sweeps) share one pass of
+    reading, MIME extraction and tokenization. The interface mirrors `TrainingCorpus`,
+    but yields token lists instead of raw email bodies. Instances are picklable, so
+    they can be handed to worker processes.
+
+    :ivar filenames: List of email filenames in corpus order.
+    :ivar tokens: List of token lists, parallel to `filenames`.
+    """
+
+    def __init__(self, filenames, tokens, classification=None):
+        """
+        :param filenames: List of email filenames.
+        :param tokens: List of token lists, parallel to `filenames`.
+        :param classification: Optional dictionary of filenames and their true labels.
+        """
+        self.filenames = filenames
+        self.tokens = tokens
+        self._classification_dict = classification if classification is not None else dict()
+
+    @classmethod
+    def from_directory(cls, src, stats=None, cache=False):
+        """
+        Read, extract and tokenize all emails of a corpus directory. The truth file is
+        loaded if the directory has one.
+
+        :param src: Path to the folder containing email files.
+        :param stats: Optional `RunStats` recording read time and bytes read.
+        :param cache: If True, the tokens are cached in the directory by the content
+            digests of its manifest, and only new or changed emails are tokenized. The
+            `stats` are not recorded then.
+        :return: TokenizedCorpus instance.
+        """
+        extractor = EmailBodyExtractor()
+        tokenizer = EmailTokenizer()
+        filenames = []
+        tokens = []
+
+        if cache:
+            processed = process_corpus(src, TOKENS_CACHE_NAME,
+                                       lambda email: tokenizer.tokenize(extractor.extract(email)))
+        else:
+            processed = ((filename, tokenizer.tokenize(extractor.extract(email)))
+                         for filename, email in Corpus(src, stats).emails())
+
+        for filename, email_tokens in processed:
+            filenames.append(filename)
+            tokens.append(email_tokens)
+
+        truth_path = jpath(src, TRUTH_FILENAME)
+        classification = read_classification_from_file(truth_path) if os.path.isfile(truth_path) else None
+        return cls(filenames, tokens, classification)
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def items(self):
+        """
+        Generator that yields all tokenized emails.
+        :return: A tuple `(filename, tokens)` for each email.
+        """
+        return zip(self.filenames, self.tokens)
+
+    def subset(self, indices):
+        """
+        Create a corpus from selected emails, sharing the token lists.
+        :param indices: Iterable of email positions.
+        :return: TokenizedCorpus instance.
+        """
+        indices = list(indices)
+        return TokenizedCorpus([self.filenames[i] for i in indices], [self.tokens[i] for i in indices],
+                               self._classification_dict)
+
+    def get_class(self, filename):
+        """
+        Get the true classification of an email by its filename.
+        :param filename: The name of the email file.
+        :return: The classification label or None if unknown.
+        """
+        return self._classification_dict.get(filename)
+
+    def is_ham(self, filename):
+        return self.get_class(filename) == HAM_TAG
+
+    def is_spam(self, filename):
+        return self.get_class(filename) == SPAM_TAG
+
+    def truth(self):
+        """
+        Return the true labels of the emails of this corpus.
+        :return: Dictionary with filenames and classification labels.
+        """
+        return {filename: self._classification_dict[filename]
+                for filename in self.filenames if filename in self._classification_dict}
+
+    def hams(self):
+        """
+        Generator that yields all HAM emails in the corpus.
+        :return: A tuple `(filename, tokens)` for each HAM email.
+        """
+        for filename, tokens in self.items():
+            if self.is_ham(filename):
+                yield filename, tokens
+
+    def spams(self):
+        """
+        Generator that yields all SPAM emails in the corpus.
+        :return: A tuple `(filename, tokens)` for each SPAM email.
+        """
+        for filename, tokens in self.items():
+            if self.is_spam(filename):
+                yield filename, tokens
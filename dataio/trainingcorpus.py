@@ -12,12 +12,14 @@ class TrainingCorpus(Corpus):
     Created: 02-01-2026
     """
 
-    def __init__(self, src):
+    def __init__(self, src, stats=None, manifest=None):
         """
         Initialize the TrainingCorpus with a source directory.
         :param src: Path to the folder containing training email files.
+        :param stats: Optional `RunStats` recording read time and bytes read.
+        :param manifest: Optional `CorpusManifest` of the directory.
         """
-        super().__init__(src)
+        super().__init__(src, stats, manifest)
         self._classification_dict = read_classification_from_file(
             jpath(self.src, TRUTH_FILENAME))
 
@@ -50,15 +52,13 @@ class TrainingCorpus(Corpus):
         Generator that yields all SPAM emails in the corpus.
         :return: A tuple `(filename, body)` for each SPAM email.
         """
-        for filename, body in self.emails():
-            if self.is_spam(filename):
-                yield filename, body
+        # Emails of the other class are skipped without being read
+        return self.emails(self.is_spam)
 
     def hams(self):
         """
         Generator that yields all HAM emails in the corpus.
         :return: A tuple `(filename, body)` for each HAM email.
         """
-        for filename, body in self.emails():
-            if self.is_ham(filename):
-                yield filename, body
+        # Emails of the other class are skipped without being read
+        return self.emails(self.is_ham)
@@ -1,13 +1,20 @@
+import heapq
 import math
+import os
 import pickle
+import threading
 from collections import Counter
+from contextlib import nullcontext
 
 from filters.basefilter import BaseFilter
 from text.extractor import EmailBodyExtractor
 from config.labels import HAM_TAG, SPAM_TAG
-from text.tokenizer import EmailTokenizer
+from text.tokenizer import EmailTokenizer, VocabularyTokenizer
+from text.vocabindex import CompactModel
+from dataio.corpus import Corpus
 from dataio.trainingcorpus import TrainingCorpus
-from utils import write_classification_to_file
+from config.paths import jpath, SCORES_FILENAME
+from utils import write_classification_to_file, write_scores_to_file
 
 
 class MyFilter(BaseFilter):
@@ -24,13 +31,82 @@ class MyFilter(BaseFilter):
         vocabulary.
     :ivar model: The trained machine learning model that includes probabilities,
         vocabulary, and other attributes.
+    :ivar duplicate_index: Optional `NearDuplicateIndex`. When set, `test` reuses the
+        verdict of a previously classified near-duplicate instead of scoring the email.
+    :ivar stats: Optional `RunStats`. When set, `train`, `extend` and `test` record stage
+        timings, per-email latencies and token counters into it.
+    :ivar maintenance_interval: Number of `learn_one`/`unlearn_one` updates after which the
+        vocabulary is reselected in a background thread, None disables it.
     """
     MODEL_PATH = "./models/nb_spam_data1_data2_vocab2500.pkl"
 
-    def __init__(self, max_tokens=2500, pretrained_model=None):
+    def __init__(self, max_tokens=2500, pretrained_model=None, duplicate_index=None, stats=None,
+                 maintenance_interval=1000):
         super().__init__()
         self.max_tokens = max_tokens
-        self.model = pretrained_model
+        self.model = self._with_weights(pretrained_model)
+        self._outside_counts = (Counter(), Counter())
+        self.duplicate_index = duplicate_index
+        self.stats = stats
+        self.maintenance_interval = maintenance_interval
+        self._extractor = EmailBodyExtractor()
+        self._tokenizer = EmailTokenizer()
+        self._init_process_state()
+
+    def _init_process_state(self):
+        """
+        Creates the state that is not pickled: the synchronization state of online
+        learning, the cached vocabulary binding and its duplicate index slots.
+        """
+        self._online_lock = threading.Lock()
+        self._journal = None
+        self._updates_since_maintenance = 0
+        self._maintenance_thread = None
+        self._binding = None
+        self._duplicate_slots = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ("_online_lock", "_journal", "_updates_since_maintenance", "_maintenance_thread", "_binding",
+                     "_duplicate_slots"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_process_state()
+
+    def _run(self, name):
+        """
+        Returns a context manager measuring a top-level run when instrumentation is enabled.
+        :param name: Name of the run, e.g. `train` or `test`.
+        """
+        return nullcontext() if self.stats is None else self.stats.run(name)
+
+    def _tokenize_emails(self, emails, vocabulary=None):
+        """
+        Extracts the body of each email and tokenizes it.
+
+        :param emails: Iterable of `(filename, raw_email)` tuples.
+        :param vocabulary: Model vocabulary, used only by instrumentation to count
+            out-of-vocabulary tokens.
+        :return: Generator of `(filename, tokens)` tuples.
+        """
+        tokenizer = self._tokenizer
+        extractor = self._extractor
+        stats = self.stats
+
+        for filename, email in emails:
+            if stats is None:
+                yield filename, tokenizer.tokenize(extractor.extract(email))
+                continue
+
+            with stats.stage("extract"):
+                body = extractor.extract(email)
+            with stats.stage("tokenize"):
+                tokens = tokenizer.tokenize(body)
+            stats.record_tokens(tokens, vocabulary)
+            yield filename, tokens
 
     def _process_training_corpus(self, emails_path, ham_counter=None, spam_counter=None, ham_count=0, spam_count=0):
         """
@@ -47,30 +123,48 @@ class MyFilter(BaseFilter):
         :param spam_count: An integer denoting the total number of spam emails processed.
         :return: A tuple containing the updated ham_counter, spam_counter, ham_count, and spam_count.
         """
-        corpus = TrainingCorpus(emails_path)
-        tokenizer = EmailTokenizer()
-        extractor = EmailBodyExtractor()
+        corpus = TrainingCorpus(emails_path, self.stats)
+
+        return self._count_tokens(
+            self._tokenize_emails(corpus.hams()), self._tokenize_emails(corpus.spams()),
+            ham_counter, spam_counter, ham_count, spam_count)
+
+    def _count_tokens(self, hams, spams, ham_counter=None, spam_counter=None, ham_count=0, spam_count=0):
+        """
+        Counts token frequencies and emails of tokenized ham and spam emails.
+
+        :param hams: Iterable of `(filename, tokens)` tuples of ham emails.
+        :param spams: Iterable of `(filename, tokens)` tuples of spam emails.
+        :param ham_counter: A Counter object to update with ham token frequencies. If None, a
+            new Counter is created.
+        :param spam_counter: A Counter object to update with spam token frequencies. If None, a
+            new Counter is created.
+        :param ham_count: An integer denoting the total number of ham emails processed.
+        :param spam_count: An integer denoting the total number of spam emails processed.
+        :return: A tuple containing the updated ham_counter, spam_counter, ham_count, and spam_count.
+        """
+        stats = self.stats
 
         if ham_counter is None:
             ham_counter = Counter()
         if spam_counter is None:
             spam_counter = Counter()
 
-        for _, email in corpus.hams():
-            body = extractor.extract(email)
-            tokens = tokenizer.tokenize(body)
+        for _, tokens in hams:
             ham_counter.update(tokens)
             ham_count += 1
+            if stats is not None:
+                stats.record_email()
 
-        for _, email in corpus.spams():
-            body = extractor.extract(email)
-            tokens = tokenizer.tokenize(body)
+        for _, tokens in spams:
             spam_counter.update(tokens)
             spam_count += 1
+            if stats is not None:
+                stats.record_email()
 
         return ham_counter, spam_counter, ham_count, spam_count
 
-    def _build_model(self, ham_counter, spam_counter, ham_count, spam_count):
+    def _build_model(self, ham_counter, spam_counter, ham_count, spam_count, vocabulary=None):
         """
         Builds the probabilistic model for classifying text based on given counts of ham and spam
         emails. This method calculates prior probabilities for ham and spam, determines the most
@@ -81,43 +175,146 @@ class MyFilter(BaseFilter):
         :param spam_counter: Counter object containing token frequencies in spam emails
         :param ham_count: Total number of ham emails
         :param spam_count: Total number of spam emails
+        :param vocabulary: Optional precomputed vocabulary (set of tokens). If None, the union of
+            the `max_tokens` most frequent tokens of each class is used.
+        """
+        self.model = self._make_model(ham_counter, spam_counter, ham_count, spam_count, vocabulary)
+        self._outside_counts = self._counts_outside(ham_counter, spam_counter, self.model["vocabulary"])
+
+    def _make_model(self, ham_counter, spam_counter, ham_count, spam_count, vocabulary=None):
+        """
+        Implementation of `_build_model`, returning the model instead of setting it.
+
+        The model keeps the raw counts of the vocabulary tokens for online updates, from
+        which the probabilities are derived by `token_probabilities`, and the scoring
+        weights: the log-ratio of the smoothed spam and ham counts of every vocabulary
+        token, and the log-ratio of the ham and spam normalizers added once per
+        vocabulary token of a scored email. The counts of the other tokens are not part
+        of the model, see `_counts_outside`.
+
+        :return: The model dictionary.
         """
         total_emails = ham_count + spam_count
         prior_ham = ham_count / total_emails
         prior_spam = spam_count / total_emails
 
-        ham_top = [w for w, _ in ham_counter.most_common(self.max_tokens)]
-        spam_top = [w for w, _ in spam_counter.most_common(self.max_tokens)]
-        vocabulary = set(ham_top) | set(spam_top)
+        if vocabulary is None:
+            ham_top = self._ranked_tokens(ham_counter, self.max_tokens)
+            spam_top = self._ranked_tokens(spam_counter, self.max_tokens)
+            vocabulary = set(ham_top) | set(spam_top)
         vocab_size = len(vocabulary)
 
         total_ham_tokens = sum(ham_counter[w] for w in vocabulary)
         total_spam_tokens = sum(spam_counter[w] for w in vocabulary)
 
-        ham_probs = {w: (ham_counter.get(w, 0) + 1) / (total_ham_tokens + vocab_size) for w in vocabulary}
-        spam_probs = {w: (spam_counter.get(w, 0) + 1) / (total_spam_tokens + vocab_size) for w in vocabulary}
-
-        self.model = {
+        return {
             "prior_ham": prior_ham,
             "prior_spam": prior_spam,
-            "ham_probs": ham_probs,
-            "spam_probs": spam_probs,
             "vocabulary": vocabulary,
             "total_ham_tokens": total_ham_tokens,
-            "total_spam_tokens": total_spam_tokens
+            "total_spam_tokens": total_spam_tokens,
+            "threshold": 0.0,
+            "ham_counts": Counter({w: ham_counter[w] for w in vocabulary if ham_counter[w]}),
+            "spam_counts": Counter({w: spam_counter[w] for w in vocabulary if spam_counter[w]}),
+            "ham_emails": ham_count,
+            "spam_emails": spam_count,
+            "weights": {w: math.log(spam_counter.get(w, 0) + 1) - math.log(ham_counter.get(w, 0) + 1)
+                        for w in vocabulary},
+            "norm": math.log(total_ham_tokens + vocab_size) - math.log(total_spam_tokens + vocab_size)
         }
 
+    @staticmethod
+    def _counts_outside(ham_counter, spam_counter, vocabulary):
+        """
+        Returns the counts of the tokens outside a vocabulary. The filter keeps them
+        next to the model for vocabulary maintenance, so saved models and model sizes
+        cover only the vocabulary. They are not saved: after `load_model`, maintenance
+        reselects the vocabulary from the saved counts and the later updates.
+
+        :param ham_counter: Counter of token frequencies in ham emails.
+        :param spam_counter: Counter of token frequencies in spam emails.
+        :param vocabulary: Set of tokens of the model.
+        :return: A tuple `(ham_counter, spam_counter)` without the vocabulary tokens.
+        """
+        return (Counter({w: c for w, c in ham_counter.items() if w not in vocabulary}),
+                Counter({w: c for w, c in spam_counter.items() if w not in vocabulary}))
+
+    @staticmethod
+    def token_probabilities(model):
+        """
+        Returns the smoothed token probabilities of a model. Models with raw counts
+        derive them from the counts, so they follow online updates, which change the
+        token totals and with them the probability of every token. Models without
+        counts, e.g. the pretrained or pruned ones, store them.
+
+        :param model: Model dictionary.
+        :return: A tuple `(ham_probs, spam_probs)` of dictionaries over the vocabulary.
+        """
+        if "ham_probs" in model:
+            return model["ham_probs"], model["spam_probs"]
+
+        vocabulary = model["vocabulary"]
+        vocab_size = len(vocabulary)
+        ham_counter, spam_counter = model["ham_counts"], model["spam_counts"]
+        ham_total = model["total_ham_tokens"] + vocab_size
+        spam_total = model["total_spam_tokens"] + vocab_size
+        return ({w: (ham_counter.get(w, 0) + 1) / ham_total for w in vocabulary},
+                {w: (spam_counter.get(w, 0) + 1) / spam_total for w in vocabulary})
+
+    @staticmethod
+    def _ranked_tokens(counter, n=None):
+        """
+        Ranks tokens from the most frequent. Ties are broken by the token, so the ranking
+        does not depend on the order in which the counts were added, e.g. the order of
+        the files or of merged count shards.
+
+        :param counter: Counter of token frequencies.
+        :param n: Number of top tokens to return, all tokens if None.
+        :return: List of tokens.
+        """
+        key = lambda item: (-item[1], item[0])
+        items = sorted(counter.items(), key=key) if n is None else heapq.nsmallest(n, counter.items(), key=key)
+        return [w for w, _ in items]
+
+    def _model_counts(self):
+        """
+        Returns new counters with the raw counts of the current model and of the tokens
+        outside its vocabulary. Models without raw counts, e.g. the pretrained one, get
+        counts approximated from their probabilities.
+
+        :return: A tuple `(ham_counter, spam_counter, ham_count, spam_count)`.
+        """
+        model = self.model
+        if "ham_counts" in model:
+            ham_outside, spam_outside = self._outside_counts
+            return model["ham_counts"] + ham_outside, model["spam_counts"] + spam_outside, \
+                model["ham_emails"], model["spam_emails"]
+
+        ham_counter = Counter()
+        spam_counter = Counter()
+        for w, prob in model["ham_probs"].items():
+            ham_counter[w] = prob * model["total_ham_tokens"]
+        for w, prob in model["spam_probs"].items():
+            spam_counter[w] = prob * model["total_spam_tokens"]
+
+        ham_count = int(model["prior_ham"] * (model["total_ham_tokens"] + model["total_spam_tokens"]))
+        spam_count = int(model["prior_spam"] * (model["total_ham_tokens"] + model["total_spam_tokens"]))
+        return ham_counter, spam_counter, ham_count, spam_count
+
     def save_model(self, model_path=MODEL_PATH):
         """
-        Saves the trained model to the specified file path in binary format.
+        Saves the trained model to the specified file path in binary format. The file is
+        replaced atomically, so processes reloading it never read a partial model.
 
         :param model_path: Path to save the serialized model
         :raises RuntimeError: If no model is present to save
         """
         if self.model is None:
             raise RuntimeError("No model to save. Train or load first.")
-        with open(model_path, "wb") as f:
+        tmp_path = f"{model_path}.tmp"
+        with open(tmp_path, "wb") as f:
             pickle.dump(self.model, f)
+        os.replace(tmp_path, model_path)
 
     def load_model(self, model_path=MODEL_PATH):
         """
@@ -126,7 +323,8 @@ class MyFilter(BaseFilter):
         :param model_path: The file path to the serialized machine learning model.
         """
         with open(model_path, "rb") as f:
-            self.model = pickle.load(f)
+            self.model = self._with_weights(pickle.load(f))
+        self._outside_counts = (Counter(), Counter())
 
     def train(self, emails_path):
         """
@@ -136,8 +334,9 @@ class MyFilter(BaseFilter):
 
         :param emails_path: Path to the directory containing the training emails.
         """
-        ham_counter, spam_counter, ham_count, spam_count = self._process_training_corpus(emails_path)
-        self._build_model(ham_counter, spam_counter, ham_count, spam_count)
+        with self._run("train"):
+            ham_counter, spam_counter, ham_count, spam_count = self._process_training_corpus(emails_path)
+            self._build_model(ham_counter, spam_counter, ham_count, spam_count)
 
     # ? This method was used to build a pretrained model from 2 datasets
     def extend(self, emails_path):
@@ -152,51 +351,542 @@ class MyFilter(BaseFilter):
         if self.model is None:
             raise RuntimeError("Model not loaded or trained")
 
-        ham_counter = Counter()
-        spam_counter = Counter()
-        for w, prob in self.model["ham_probs"].items():
-            ham_counter[w] = prob * self.model["total_ham_tokens"]
-        for w, prob in self.model["spam_probs"].items():
-            spam_counter[w] = prob * self.model["total_spam_tokens"]
+        with self._run("extend"):
+            self._extend(emails_path)
 
-        ham_count = int(self.model["prior_ham"] * (self.model["total_ham_tokens"] + self.model["total_spam_tokens"]))
-        spam_count = int(self.model["prior_spam"] * (self.model["total_ham_tokens"] + self.model["total_spam_tokens"]))
+    def _extend(self, emails_path):
+        """
+        Implementation of `extend`.
 
+        :param emails_path: The path to the email dataset for model extension.
+        """
+        ham_counter, spam_counter, ham_count, spam_count = self._model_counts()
+
+        threshold = self.model.get("threshold", 0.0)
         ham_counter, spam_counter, ham_count, spam_count \
             = self._process_training_corpus(emails_path, ham_counter, spam_counter, ham_count, spam_count)
         self._build_model(ham_counter, spam_counter, ham_count, spam_count)
+        self.model["threshold"] = threshold
+
+    def train_tokenized(self, corpus):
+        """
+        Builds the model from an already tokenized training corpus.
+
+        :param corpus: TokenizedCorpus with known classification.
+        """
+        with self._run("train"):
+            self._build_model(*self._count_tokens(corpus.hams(), corpus.spams()))
+
+    def predict_tokenized(self, corpus):
+        """
+        Classifies an already tokenized corpus without writing a prediction file.
+
+        :param corpus: TokenizedCorpus to classify.
+        :return: Dictionary with filenames and predicted labels.
+        """
+        if self.model is None:
+            self.load_model(self.MODEL_PATH)
+
+        return {filename: self._predict_tokens(filename, tokens)[0] for filename, tokens in corpus.items()}
 
-    def test(self, emails_path):
+    def score_tokenized(self, corpus):
+        """
+        Computes the spam log-odds score of every email of an already tokenized corpus.
+
+        :param corpus: TokenizedCorpus to score.
+        :return: Dictionary with filenames and scores.
+        """
+        if self.model is None:
+            self.load_model(self.MODEL_PATH)
+
+        return {filename: self._score_tokens(tokens) for filename, tokens in corpus.items()}
+
+    def learn_one(self, raw_email, label):
+        """
+        Updates the model with one labelled email, e.g. a "report spam" or "not spam" click.
+
+        Only the counts and scoring weights of the tokens of the email and the priors are
+        updated, in O(tokens). The probabilities are derived from the counts, see
+        `token_probabilities`. The vocabulary stays fixed until the next maintenance, see
+        `maintain_vocabulary`.
+
+        :param raw_email: The raw email contents.
+        :param label: HAM_TAG or SPAM_TAG.
+        :raises RuntimeError: If the model has not been loaded or trained.
+        :raises ValueError: If the label is unknown.
+        """
+        self._update_one(raw_email, label, 1)
+
+    def unlearn_one(self, raw_email, label):
+        """
+        Reverts `learn_one` of an email, e.g. when a user changes their feedback.
+
+        :param raw_email: The raw email contents, as passed to `learn_one`.
+        :param label: The label the email was learned with.
+        :raises RuntimeError: If the model has not been loaded or trained.
+        :raises ValueError: If the label is unknown or the email was not learned with it.
+        """
+        self._update_one(raw_email, label, -1)
+
+    def _update_one(self, raw_email, label, sign):
+        """
+        Implementation of `learn_one` and `unlearn_one`.
+
+        :param sign: 1 to learn the email, -1 to unlearn it.
+        """
+        if self.model is None:
+            raise RuntimeError("Model not loaded or trained")
+        if label not in (HAM_TAG, SPAM_TAG):
+            raise ValueError(f"Unknown label: {label}")
+
+        _, tokens = next(self._tokenize_emails([(None, raw_email)]))
+        token_counts = Counter(tokens)
+
+        with self._online_lock:
+            if "ham_counts" not in self.model:
+                self._prepare_online_model()
+            self._apply_update(self.model, self._outside_counts, token_counts, label, sign)
+            self._update_binding(self.model, token_counts)
+            if self._journal is not None:
+                self._journal.append((token_counts, label, sign))
+
+            self._updates_since_maintenance += 1
+            interval = self.maintenance_interval
+            if interval is not None and self._updates_since_maintenance >= interval \
+                    and self._maintenance_thread is None:
+                self._maintenance_thread = threading.Thread(target=self.maintain_vocabulary, daemon=True)
+                self._maintenance_thread.start()
+
+    def _prepare_online_model(self):
+        """
+        Adds the raw counts and scoring weights to a model that lacks them.
+        """
+        threshold = self.model.get("threshold", 0.0)
+        ham_counter, spam_counter, ham_count, spam_count = self._model_counts()
+        self.model = self._make_model(ham_counter, spam_counter, ham_count, spam_count, self.model["vocabulary"])
+        self.model["threshold"] = threshold
+        self._outside_counts = (Counter(), Counter())
+
+    @staticmethod
+    def _apply_update(model, outside_counts, token_counts, label, sign):
+        """
+        Adds or removes the token counts of one email to or from a model and the counts
+        of the tokens outside its vocabulary in place.
+
+        :param model: Model dictionary with raw counts.
+        :param outside_counts: Tuple `(ham_counter, spam_counter)` of the tokens outside
+            the vocabulary, see `_counts_outside`.
+        :param token_counts: Counter of the tokens of the email.
+        :param label: HAM_TAG or SPAM_TAG.
+        :param sign: 1 to add the email, -1 to remove it.
+        :raises ValueError: If removing the email would make a count negative.
+        """
+        spam = label == SPAM_TAG
+        counter = model["spam_counts"] if spam else model["ham_counts"]
+        outside = outside_counts[1] if spam else outside_counts[0]
+        emails_key = "spam_emails" if spam else "ham_emails"
+        total_key = "total_spam_tokens" if spam else "total_ham_tokens"
+        vocabulary = model["vocabulary"]
+
+        if sign < 0 and (model[emails_key] < 1 or any((counter if w in vocabulary else outside).get(w, 0) < c
+                                                      for w, c in token_counts.items())):
+            raise ValueError("The email was not learned with this label")
+
+        weights = model["weights"]
+        ham_counter, spam_counter = model["ham_counts"], model["spam_counts"]
+
+        for w, c in token_counts.items():
+            in_vocabulary = w in vocabulary
+            target = counter if in_vocabulary else outside
+            count = target.get(w, 0) + sign * c
+            if count:
+                target[w] = count
+            else:
+                del target[w]
+            if in_vocabulary:
+                model[total_key] += sign * c
+                weights[w] = math.log(spam_counter.get(w, 0) + 1) - math.log(ham_counter.get(w, 0) + 1)
+
+        model[emails_key] += sign
+        total_emails = model["ham_emails"] + model["spam_emails"]
+        model["prior_ham"] = model["ham_emails"] / total_emails
+        model["prior_spam"] = model["spam_emails"] / total_emails
+
+        vocab_size = len(vocabulary)
+        model["norm"] = math.log(model["total_ham_tokens"] + vocab_size) \
+            - math.log(model["total_spam_tokens"] + vocab_size)
+
+    def _vocabulary_binding(self, model):
+        """
+        Returns the vocabulary tokenizer and id-indexed weights of a model, creating them
+        when the model weights were replaced since the last call.
+
+        :param model: Model dictionary with weights.
+        :return: A tuple `(weights, tokenizer, weight_list)`, where `weights` is the
+            weights dictionary the binding was created from.
+        """
+        binding = self._binding
+        weights = model["weights"]
+        if binding is None or binding[0] is not weights:
+            tokenizer = VocabularyTokenizer(weights)
+            binding = (weights, tokenizer, [weights[token] for token in tokenizer.tokens])
+            self._binding = binding
+        return binding
+
+    def _update_binding(self, model, token_counts):
+        """
+        Copies the weights of updated tokens into the id-indexed weights of the binding.
+
+        :param model: The updated model.
+        :param token_counts: Counter of the updated tokens.
+        """
+        binding = self._binding
+        if binding is None or binding[0] is not model["weights"]:
+            return
+
+        weights, tokenizer, weight_list = binding
+        token_ids = tokenizer.token_ids
+        for token in token_counts:
+            i = token_ids.get(token)
+            if i is not None:
+                weight_list[i] = weights[token]
+
+    def maintain_vocabulary(self):
+        """
+        Reselects the vocabulary from the raw counts and rebuilds the scoring weights.
+
+        The model is rebuilt from a snapshot of the counts without holding the lock, so
+        `learn_one` and `unlearn_one` are not blocked. Updates made meanwhile are replayed
+        on the new model before it replaces the current one.
+        """
+        with self._online_lock:
+            if "ham_counts" not in self.model:
+                self._prepare_online_model()
+            ham_counter, spam_counter, ham_count, spam_count = self._model_counts()
+            self._journal = []
+
+        rebuilt = None
+        try:
+            model = self._make_model(ham_counter, spam_counter, ham_count, spam_count)
+            rebuilt = model, self._counts_outside(ham_counter, spam_counter, model["vocabulary"])
+        finally:
+            with self._online_lock:
+                journal, self._journal = self._journal, None
+                if rebuilt is not None:
+                    model, outside_counts = rebuilt
+                    for token_counts, label, sign in journal:
+                        self._apply_update(model, outside_counts, token_counts, label, sign)
+                    model["threshold"] = self.model.get("threshold", 0.0)
+                    self.model = model
+                    self._outside_counts = outside_counts
+                self._updates_since_maintenance = 0
+                self._maintenance_thread = None
+
+    def set_threshold(self, threshold):
+        """
+        Stores the decision threshold in the model. Emails scoring at or above the
+        threshold are classified as spam.
+
+        :param threshold: Threshold on the spam log-odds score.
+        :raises RuntimeError: If the model has not been loaded or trained.
+        """
+        if self.model is None:
+            raise RuntimeError("Model not loaded or trained")
+        self.model["threshold"] = threshold
+
+    def compact_model(self):
+        """
+        Returns a read-only copy of the model with weights in contiguous arrays indexed
+        by a minimal perfect hash, for holding many models in one process.
+
+        :return: CompactModel instance.
+        :raises RuntimeError: If the model has not been loaded or trained.
+        """
+        if self.model is None:
+            raise RuntimeError("Model not loaded or trained")
+        return CompactModel(self.model)
+
+    def _predict_tokens(self, filename, tokens):
+        """
+        Predicts the label of a tokenized email, reusing the verdict of a near-duplicate
+        when a duplicate index is set. The signature covers the vocabulary tokens of
+        the email, as in `_predict_ids`.
+
+        :param filename: Name of the email file, used as the key in the duplicate index.
+        :param tokens: List of tokens of the email.
+        :return: A tuple `(label, score)`, the score is None if the verdict was reused.
+        """
+        index = self.duplicate_index
+        if index is None:
+            score = self._score_tokens(tokens)
+            return self._classify_score(score), score
+
+        weights = self._with_weights(self.model)["weights"]
+        signature = index.signature(token for token in tokens if token in weights)
+        match = index.query_signature(signature)
+        if match is not None:
+            return match.label, None
+
+        score = self._score_tokens(tokens)
+        label = self._classify_score(score)
+        index.add_signature(signature, label, filename)
+        return label, score
+
+    def _vocabulary_slots(self, tokenizer):
+        """
+        Returns the duplicate index slots of the vocabulary tokens of a binding,
+        computed once per binding and index.
+
+        :param tokenizer: VocabularyTokenizer of the binding.
+        :return: List of token slots indexed by token id.
+        """
+        cached = self._duplicate_slots
+        index = self.duplicate_index
+        if cached is None or cached[0] is not tokenizer or cached[1] is not index:
+            cached = (tokenizer, index, index.hasher.token_slots(tokenizer.tokens))
+            self._duplicate_slots = cached
+        return cached[2]
+
+    def _predict_ids(self, filename, ids, weight_list, model, slots=None):
+        """
+        Predicts the label of an email given as vocabulary token ids, reusing the verdict
+        of a near-duplicate when a duplicate index is set.
+
+        :param filename: Name of the email file, used as the key in the duplicate index.
+        :param ids: List of token ids from `VocabularyTokenizer.iter_ids`.
+        :param weight_list: Weights indexed by token id.
+        :param model: Model dictionary the weights belong to.
+        :param slots: Token slots from `_vocabulary_slots`, when a duplicate index is set.
+        :return: A tuple `(label, score)`, the score is None if the verdict was reused.
+        """
+        index = self.duplicate_index
+        if index is None:
+            score = self._score_ids(ids, weight_list, model)
+            return self._classify_score(score, model), score
+
+        signature = index.signature_of_slots(map(slots.__getitem__, set(ids)))
+        match = index.query_signature(signature)
+        if match is not None:
+            return match.label, None
+
+        score = self._score_ids(ids, weight_list, model)
+        label = self._classify_score(score, model)
+        index.add_signature(signature, label, filename)
+        return label, score
+
+    def score(self, raw_email):
+        """
+        Computes the spam log-odds score of one raw email.
+
+        The method is reentrant and safe to call from many threads at once: it reads the
+        model once and keeps no per-call state on the filter. The extractor and tokenizer
+        are created once per filter and are stateless. Concurrent `learn_one` calls update
+        the model in place, so a score may mix weights from before and after an update.
+
+        :param raw_email: The raw email contents, as bytes or str.
+        :return: Score, positive values favour spam.
+        :raises RuntimeError: If the model has not been loaded or trained.
+        """
+        model = self.model
+        if model is None:
+            raise RuntimeError("Model not loaded or trained")
+        return self._score_email(raw_email, model)
+
+    def classify(self, raw_email):
+        """
+        Classifies one raw email, see `score` for the thread-safety guarantees.
+
+        :param raw_email: The raw email contents, as bytes or str.
+        :return: HAM_TAG or SPAM_TAG.
+        :raises RuntimeError: If the model has not been loaded or trained.
+        """
+        model = self.model
+        if model is None:
+            raise RuntimeError("Model not loaded or trained")
+        return self._classify_score(self._score_email(raw_email, model), model)
+
+    def _score_email(self, raw_email, model):
+        """
+        Scores one raw email through the vocabulary tokenizer of a model.
+
+        :param raw_email: The raw email contents, as bytes or str.
+        :param model: Model dictionary.
+        :return: Score, positive values favour spam.
+        """
+        if "weights" not in model:
+            self._with_weights(model)
+        _, tokenizer, weight_list = self._vocabulary_binding(model)
+        return self._score_ids(tokenizer.iter_ids(self._extractor.extract(raw_email)), weight_list, model)
+
+    @staticmethod
+    def _score_ids(ids, weight_list, model):
+        """
+        Computes the spam log-odds score of an email given as vocabulary token ids. The
+        result equals `_score_tokens` of the same email.
+
+        :param ids: Iterable of token ids from `VocabularyTokenizer.iter_ids`.
+        :param weight_list: Weights indexed by token id.
+        :param model: Model dictionary the weights belong to.
+        :return: Score, positive values favour spam.
+        """
+        score = math.log(model["prior_spam"]) - math.log(model["prior_ham"])
+        in_vocabulary = 0
+
+        for i in ids:
+            score += weight_list[i]
+            in_vocabulary += 1
+
+        return score + in_vocabulary * model["norm"]
+
+    def _score_tokens(self, tokens, model=None):
+        """
+        Computes the spam log-odds score of a tokenized email, i.e. the difference of
+        the spam and ham log-probabilities.
+
+        :param tokens: List of tokens of the email.
+        :param model: The model to score with, the current model if None.
+        :return: Score, positive values favour spam.
+        """
+        if model is None:
+            model = self.model
+        if "weights" not in model:
+            self._with_weights(model)
+        weights = model["weights"]
+        norm = model["norm"]
+
+        score = math.log(model["prior_spam"]) - math.log(model["prior_ham"])
+        in_vocabulary = 0
+
+        for token in tokens:
+            weight = weights.get(token)
+            if weight is not None:
+                score += weight
+                in_vocabulary += 1
+
+        return score + in_vocabulary * norm
+
+    @staticmethod
+    def _with_weights(model):
+        """
+        Adds the scoring weights to a model that has only probabilities, e.g. one saved
+        before the weights were introduced.
+
+        :param model: Model dictionary or None.
+        :return: The same model.
+        """
+        if model is not None and "weights" not in model:
+            ham_probs, spam_probs = model["ham_probs"], model["spam_probs"]
+            model["norm"] = 0.0
+            model["weights"] = {w: math.log(spam_probs[w]) - math.log(ham_probs[w]) for w in model["vocabulary"]}
+        return model
+
+    def _classify_score(self, score, model=None):
+        """
+        Turns a spam log-odds score into a label using the model threshold.
+
+        :param score: Score computed by `_score_tokens`.
+        :param model: The model that computed the score, the current model if None.
+        :return: HAM_TAG or SPAM_TAG.
+        """
+        if model is None:
+            model = self.model
+        return HAM_TAG if score < model.get("threshold", 0.0) else SPAM_TAG
+
+    def _classify_tokens(self, tokens):
+        """
+        Classifies a tokenized email with the current model.
+
+        :param tokens: List of tokens of the email.
+        :return: HAM_TAG or SPAM_TAG.
+        """
+        return self._classify_score(self._score_tokens(tokens))
+
+    def test(self, emails_path, write_scores=False):
         """
         Tests the spam classifier on a set of emails, processes each email using a tokenizer
         and an extractor, and classifies them based on calculated probabilities for ham or spam.
 
         :param emails_path: The path to the directory containing the emails to be
             tested.
+        :param write_scores: If True, the spam log-odds score of every scored email is also
+            written to the `!scores.txt` file in the same directory. Emails whose verdict
+            was reused from a near-duplicate have no score.
         """
         super().test(emails_path)
 
         if self.model is None:
             self.load_model(self.MODEL_PATH)
 
-        tokenizer = EmailTokenizer()
-        extractor = EmailBodyExtractor()
+        with self._run("test"):
+            self._test(jpath(emails_path, SCORES_FILENAME) if write_scores else None)
+
+    def iter_predictions(self, emails_path):
+        """
+        Classifies the emails of a directory one by one without writing a prediction file.
 
-        for filename, email in self._corpus.emails():
-            body = extractor.extract(email)
-            tokens = tokenizer.tokenize(body)
+        :param emails_path: The path to the directory containing the emails to be classified.
+        :return: Generator of `(filename, label)` tuples.
+        """
+        if self.model is None:
+            self.load_model(self.MODEL_PATH)
 
-            log_ham = math.log(self.model["prior_ham"])
-            log_spam = math.log(self.model["prior_spam"])
+        return ((filename, label) for filename, label, _ in self._iter_verdicts(Corpus(emails_path, self.stats)))
 
-            for token in tokens:
-                if token in self.model["vocabulary"]:
-                    log_ham += math.log(self.model["ham_probs"][token])
-                    log_spam += math.log(self.model["spam_probs"][token])
+    def _iter_verdicts(self, corpus):
+        """
+        Generator of predictions and scores for the emails of a corpus.
 
-            self._predictions[filename] = HAM_TAG if log_ham > log_spam else SPAM_TAG
+        :param corpus: Corpus instance.
+        :return: A tuple `(filename, label, score)` for each email.
+        """
+        stats = self.stats
+        model = self.model
+        if self.duplicate_index is None and stats is None:
+            for filename, email in corpus.emails():
+                score = self._score_email(email, model)
+                yield filename, self._classify_score(score, model), score
+            return
+
+        extractor = self._extractor
+        if "weights" not in model:
+            self._with_weights(model)
+        _, tokenizer, weight_list = self._vocabulary_binding(model)
+        slots = None if self.duplicate_index is None else self._vocabulary_slots(tokenizer)
+
+        for filename, email in corpus.emails():
+            if stats is None:
+                ids = list(tokenizer.iter_ids(extractor.extract(email)))
+                yield (filename, *self._predict_ids(filename, ids, weight_list, model, slots))
+                continue
+
+            with stats.stage("extract"):
+                body = extractor.extract(email)
+            with stats.stage("tokenize"):
+                ids, oov_tokens = tokenizer.ids_with_oov(body)
+            stats.record_ids(ids, oov_tokens)
+            with stats.stage("score"):
+                label, score = self._predict_ids(filename, ids, weight_list, model, slots)
+            stats.record_email()
+            yield filename, label, score
+
+    def _test(self, scores_file_path=None):
+        """
+        Implementation of `test` over the corpus prepared by `BaseFilter.test`.
 
-        write_classification_to_file(
-            self._prediction_file_path,
-            self._predictions
-        )
+        :param scores_file_path: Path of the scores file, or None to skip writing scores.
+        """
+        stats = self.stats
+        scores = dict()
+
+        for filename, label, score in self._iter_verdicts(self._corpus):
+            self._predictions[filename] = label
+            if score is not None:
+                scores[filename] = score
+
+        with nullcontext() if stats is None else stats.stage("write"):
+            write_classification_to_file(
+                self._prediction_file_path,
+                self._predictions
+            )
+            if scores_file_path is not None:
+                write_scores_to_file(scores_file_path, scores)
@@ -17,12 +17,15 @@ class BaseFilter(ABC):
     :ivar _prediction_file_path: Path to the prediction file generated during the
         testing phase.
     :ivar _predictions: A dictionary to store prediction results.
+    :ivar stats: Optional `RunStats` collecting timings and counters, None disables
+        instrumentation.
     """
 
     def __init__(self):
         self._corpus = None
         self._prediction_file_path = None
         self._predictions = dict()
+        self.stats = None
 
     @abstractmethod
     def train(self, emails_path):
@@ -40,5 +43,31 @@ class BaseFilter(ABC):
         Subclasses typically extend this method.
         :param emails_path: Path to the emails for testing.
         """
-        self._corpus = Corpus(emails_path)
+        self._corpus = Corpus(emails_path, self.stats)
         self._prediction_file_path = jpath(emails_path, PREDICTION_FILENAME)
+
+    def iter_predictions(self, emails_path):
+        """
+        Generator of predictions for a corpus, without writing a prediction file.
+        Subclasses override this to support streaming evaluation.
+        :param emails_path: Path to the emails for testing.
+        :return: A tuple `(filename, prediction)` for each email.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming predictions")
+
+    def train_tokenized(self, corpus):
+        """
+        Train the filter on an already tokenized corpus.
+        Subclasses override this to take part in shared-tokenization evaluation.
+        :param corpus: TokenizedCorpus with known classification.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support tokenized corpora")
+
+    def predict_tokenized(self, corpus):
+        """
+        Predict labels for an already tokenized corpus without touching the disk.
+        Subclasses override this to take part in shared-tokenization evaluation.
+        :param corpus: TokenizedCorpus to classify.
+        :return: Dictionary with filenames and predicted labels.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support tokenized corpora")
@@ -0,0 +1,287 @@
+"""
+Header-first cascade classifier.
+
+Usage:
+    python -m filters.cascade TRAIN_DIR TEST_DIR [--low L] [--high H]
+
+A small model over header tokens scores every email first. Only emails whose header
+score falls inside the uncertainty band `(low, high)` are extracted, tokenized and
+classified by the body model, i.e. MyFilter.
+"""
+import argparse
+import json
+import math
+import time
+
+from filter import MyFilter
+from filters.basefilter import BaseFilter
+from config.labels import HAM_TAG, SPAM_TAG
+from config.paths import jpath, TRUTH_FILENAME
+from dataio.corpus import Corpus, _header_end
+from dataio.tokenized import TokenizedCorpus
+from dataio.trainingcorpus import TrainingCorpus
+from metrics.quality import compute_quality_for_predictions
+from text.tokenizer import VocabularyTokenizer
+from utils import read_classification_from_file, write_classification_to_file
+
+
+class CascadeFilter(BaseFilter):
+    """
+    Two-stage spam filter scoring headers first and bodies only when uncertain.
+
+    Header tokens are the tokens of selected header values prefixed with the header
+    name, e.g. `subject:free`. An email whose header score is at most `low` is ham and
+    at least `high` is spam without looking at the body.
+
+    :ivar HEADERS: Names of the headers used by the header model.
+    :ivar band: Tuple `(low, high)` of the uncertainty band of header scores.
+    :ivar header_filter: MyFilter over header tokens.
+    :ivar body_filter: MyFilter over body tokens.
+    :ivar report: Counters of the last `test` run: `emails`, `early_exits` and
+        `early_exit_fraction`.
+    """
+    HEADERS = ("subject", "from", "reply-to", "to", "received", "return-path", "message-id",
+               "content-type", "x-mailer")
+
+    def __init__(self, band=(-20.0, 20.0), max_tokens=2500, header_max_tokens=500):
+        """
+        :param band: Tuple `(low, high)` of the uncertainty band of header scores.
+        :param max_tokens: The `max_tokens` parameter of the body model.
+        :param header_max_tokens: The `max_tokens` parameter of the header model.
+        """
+        super().__init__()
+        self.band = band
+        self.header_filter = MyFilter(max_tokens=header_max_tokens)
+        self.body_filter = MyFilter(max_tokens=max_tokens)
+        self.report = None
+        self._headers = frozenset(self.HEADERS)
+        self._binding = None
+
+    def _header_values(self, raw_email):
+        """
+        Collects the values of the selected headers without parsing the body.
+
+        The header block, up to the first empty line with LF or CRLF line endings, is
+        scanned line by line and folded lines are joined to their header.
+
+        :param raw_email: The raw email contents, as bytes or str.
+        :return: Dictionary with header names and their values joined into one string.
+        """
+        head = raw_email[:_header_end(raw_email)]
+        if isinstance(head, bytes):
+            head = head.decode("utf-8", errors="replace")
+        wanted = self._headers
+        values = dict()
+        current = None
+
+        for line in head.split("\n"):
+            line = line.rstrip("\r")
+            if line[:1] in (" ", "\t"):
+                # Continuation of a folded header
+                if current is not None:
+                    current.append(line)
+                continue
+            name, sep, value = line.partition(":")
+            name = name.strip().lower()
+            current = values.setdefault(name, []) if sep and name in wanted else None
+            if current is not None:
+                current.append(value)
+
+        return {name: " ".join(lines) for name, lines in values.items()}
+
+    def header_tokens(self, raw_email):
+        """
+        Tokenizes the selected headers of an email. Tokens are prefixed with the header
+        name, all values of one header are tokenized together.
+
+        :param raw_email: The raw email contents, as bytes or str.
+        :return: List of header tokens.
+        """
+        tokenizer = self.body_filter._tokenizer
+        tokens = []
+        for name, value in self._header_values(raw_email).items():
+            prefix = name + ":"
+            tokens.extend(prefix + token for token in tokenizer.tokenize(value))
+        return tokens
+
+    def _header_binding(self):
+        """
+        Returns vocabulary tokenizers of the header model, one per header, creating them
+        when the header model changed.
+
+        :return: A tuple `(weights, bindings)`, where `bindings` maps header names to
+            tuples `(tokenizer, weight_list)`.
+        """
+        binding = self._binding
+        weights = self.header_filter.model["weights"]
+        if binding is None or binding[0] is not weights:
+            bindings = dict()
+            for name in self.HEADERS:
+                prefix = name + ":"
+                tokenizer = VocabularyTokenizer(w[len(prefix):] for w in weights if w.startswith(prefix))
+                bindings[name] = (tokenizer, [weights[prefix + token] for token in tokenizer.tokens])
+            binding = (weights, bindings)
+            self._binding = binding
+        return binding
+
+    def header_score(self, raw_email):
+        """
+        Scores the headers of an email with the header model. The result equals scoring
+        `header_tokens` with the header model, but words outside its vocabulary are
+        skipped before stemming.
+
+        :param raw_email: The raw email contents, as bytes or str.
+        :return: Spam log-odds score of the headers.
+        """
+        model = self.header_filter.model
+        _, bindings = self._header_binding()
+        score = math.log(model["prior_spam"]) - math.log(model["prior_ham"])
+        in_vocabulary = 0
+
+        for name, value in self._header_values(raw_email).items():
+            tokenizer, weight_list = bindings[name]
+            for i in tokenizer.iter_ids(value):
+                score += weight_list[i]
+                in_vocabulary += 1
+
+        return score + in_vocabulary * model["norm"]
+
+    def train(self, emails_path):
+        """
+        Trains the header and body models in one pass over the training corpus.
+
+        :param emails_path: Path to the directory containing the training emails.
+        """
+        corpus = TrainingCorpus(emails_path, self.stats)
+        filenames, header_tokens, emails = [], [], []
+
+        for filename, email in corpus.emails():
+            filenames.append(filename)
+            header_tokens.append(self.header_tokens(email))
+            emails.append((filename, email))
+
+        body_tokens = [tokens for _, tokens in self.body_filter._tokenize_emails(emails)]
+        truth = {filename: corpus.get_class(filename) for filename in filenames}
+        self.header_filter.train_tokenized(TokenizedCorpus(filenames, header_tokens, truth))
+        self.body_filter.train_tokenized(TokenizedCorpus(filenames, body_tokens, truth))
+
+    def _classify(self, raw_email):
+        """
+        :param raw_email: The raw email contents, as bytes or str.
+        :return: A tuple `(label, early_exit)`, `early_exit` is True if the header
+            model decided alone.
+        """
+        low, high = self.band
+        header_score = self.header_score(raw_email)
+        if header_score <= low:
+            return HAM_TAG, True
+        if header_score >= high:
+            return SPAM_TAG, True
+        return self.body_filter.classify(raw_email), False
+
+    def classify(self, raw_email):
+        """
+        Classifies one raw email.
+
+        :param raw_email: The raw email contents, as bytes or str.
+        :return: HAM_TAG or SPAM_TAG.
+        :raises RuntimeError: If the filter has not been trained.
+        """
+        if self.body_filter.model is None:
+            raise RuntimeError("Model not trained")
+        return self._classify(raw_email)[0]
+
+    def test(self, emails_path):
+        """
+        Classifies all emails of a corpus, writes the prediction file and stores the
+        fraction of early exits in `report`.
+
+        :param emails_path: Path to the emails for testing.
+        :raises RuntimeError: If the filter has not been trained.
+        """
+        if self.body_filter.model is None:
+            raise RuntimeError("Model not trained")
+        super().test(emails_path)
+
+        early_exits = 0
+        for filename, email in self._corpus.emails():
+            self._predictions[filename], early_exit = self._classify(email)
+            early_exits += early_exit
+
+        emails = len(self._predictions)
+        self.report = {
+            "emails": emails,
+            "early_exits": early_exits,
+            "early_exit_fraction": early_exits / emails if emails else 0.0,
+        }
+        write_classification_to_file(self._prediction_file_path, self._predictions)
+
+    def iter_predictions(self, emails_path):
+        """
+        Generator of predictions for a corpus, without writing a prediction file.
+
+        :param emails_path: Path to the emails for testing.
+        :return: A tuple `(filename, prediction)` for each email.
+        """
+        for filename, email in Corpus(emails_path, self.stats).emails():
+            yield filename, self.classify(email)
+
+
+def evaluate(train_dir, test_dir, band=(-20.0, 20.0)):
+    """
+    Compares the cascade with the body model alone on a held-out corpus.
+
+    :param train_dir: Path to the training corpus.
+    :param test_dir: Path to the held-out corpus, with `!truth.txt`.
+    :param band: Uncertainty band of the cascade.
+    :return: Dictionary with the early-exit fraction, and the quality and classification
+        time of the cascade and of MyFilter.
+    """
+    cascade = CascadeFilter(band)
+    cascade.train(train_dir)
+
+    truth = read_classification_from_file(jpath(test_dir, TRUTH_FILENAME))
+    emails = list(Corpus(test_dir).emails())
+    cascade_predictions, body_predictions = dict(), dict()
+    early_exits = 0
+
+    if emails:
+        # Create the vocabulary bindings of both models before timing
+        cascade._classify(emails[0][1])
+        cascade.body_filter.classify(emails[0][1])
+
+    start = time.perf_counter()
+    for filename, email in emails:
+        cascade_predictions[filename], early_exit = cascade._classify(email)
+        early_exits += early_exit
+    cascade_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for filename, email in emails:
+        body_predictions[filename] = cascade.body_filter.classify(email)
+    body_time = time.perf_counter() - start
+
+    return {
+        "band": list(band),
+        "emails": len(emails),
+        "early_exit_fraction": early_exits / len(emails),
+        "cascade_quality": compute_quality_for_predictions(truth, cascade_predictions),
+        "body_quality": compute_quality_for_predictions(truth, body_predictions),
+        "cascade_time_s": cascade_time,
+        "body_time_s": body_time,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the header-first cascade against MyFilter.")
+    parser.add_argument("train_dir")
+    parser.add_argument("test_dir")
+    parser.add_argument("--low", type=float, default=-20.0)
+    parser.add_argument("--high", type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    print(json.dumps(evaluate(args.train_dir, args.test_dir, (args.low, args.high)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import math
+import os
+import pickle
+import signal
+import threading
+import time
+from collections import namedtuple
+
+from filter import MyFilter
+
+
+Verdict = namedtuple("Verdict", ["label", "score", "model_version"])
+ModelSnapshot = namedtuple("ModelSnapshot", ["version", "path", "loaded_at", "filter"])
+
+REQUIRED_KEYS = ("prior_ham", "prior_spam", "vocabulary")
+
+
+def validate_model(model):
+    """
+    Checks that a loaded object is a usable MyFilter model.
+
+    :param model: The unpickled model.
+    :raises ValueError: If the model is malformed.
+    """
+    if not isinstance(model, dict):
+        raise ValueError(f"Model is not a dictionary: {type(model).__name__}")
+    missing = [key for key in REQUIRED_KEYS if key not in model]
+    if missing:
+        raise ValueError(f"Model is missing keys: {', '.join(missing)}")
+    if not model["vocabulary"]:
+        raise ValueError("Model has an empty vocabulary")
+    for key in ("prior_ham", "prior_spam"):
+        if not 0 < model[key] < 1:
+            raise ValueError(f"Model has an invalid {key}: {model[key]}")
+    try:
+        probabilities = MyFilter.token_probabilities(model)
+    except KeyError as e:
+        raise ValueError(f"Model is missing keys: {e.args[0]}") from None
+    for key, probs in zip(("ham_probs", "spam_probs"), probabilities):
+        if any(w not in probs for w in model["vocabulary"]):
+            raise ValueError(f"Model {key} does not cover the vocabulary")
+    # An infinite threshold, classifying every email as ham or spam, is a valid result
+    # of `metrics.threshold.sweep_thresholds`
+    threshold = model.get("threshold", 0.0)
+    if not isinstance(threshold, (int, float)) or math.isnan(threshold):
+        raise ValueError(f"Model has an invalid threshold: {threshold!r}")
+
+
+class ModelHandle:
+    """
+    Hot-reloadable MyFilter model for long-running scoring processes.
+
+    The current model is held in one immutable `ModelSnapshot`, replaced by a single
+    attribute assignment. Every scoring call reads the snapshot once, so concurrent
+    calls see either the old or the new model, never a mix. New models are loaded and
+    validated before the swap; a model that fails to load or validate is skipped and
+    the current one stays in use.
+
+    Reloads are triggered by `reload`, by a watcher thread polling the modification
+    of the model file (`start`), or by a signal (`install_signal_handler`). Model files
+    should be replaced atomically, as `MyFilter.save_model` does.
+
+    :ivar model_path: Path to the watched model file.
+    :ivar poll_interval: Seconds between checks of the model file by the watcher.
+    :ivar last_error: The exception of the last failed reload, or None.
+    """
+
+    def __init__(self, model_path=MyFilter.MODEL_PATH, poll_interval=1.0, filter_factory=MyFilter):
+        """
+        :param model_path: Path to the model file, loaded immediately.
+        :param poll_interval: Seconds between checks of the model file by the watcher.
+        :param filter_factory: Callable creating the filter for a loaded model, called
+            with the `pretrained_model` keyword.
+        :raises OSError: If the initial model cannot be read.
+        :raises ValueError: If the initial model is malformed.
+        """
+        self.model_path = model_path
+        self.poll_interval = poll_interval
+        self.last_error = None
+        self._filter_factory = filter_factory
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._snapshot = None
+        self._file_signature = None
+
+        if not self.reload():
+            raise self.last_error
+
+    @property
+    def snapshot(self):
+        """The current `ModelSnapshot`."""
+        return self._snapshot
+
+    @property
+    def version(self):
+        """Version of the current model, incremented by every successful reload."""
+        return self._snapshot.version
+
+    def _signature(self):
+        """
+        :return: A tuple identifying the current contents of the model file.
+        """
+        st = os.stat(self.model_path)
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def reload(self):
+        """
+        Loads, validates and swaps in the model file. The new filter scores an empty
+        email before the swap, so its vocabulary tokenizer is built here and not by the
+        first requests after the reload.
+
+        :return: True if the new model is in use, False if it failed to load or validate.
+        """
+        with self._reload_lock:
+            try:
+                signature = self._signature()
+                with open(self.model_path, "rb") as f:
+                    model = pickle.load(f)
+                validate_model(model)
+                spam_filter = self._filter_factory(pretrained_model=model)
+                spam_filter.score(b"")
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError, KeyError, AttributeError) as e:
+                self.last_error = e
+                return False
+
+            version = 1 if self._snapshot is None else self._snapshot.version + 1
+            self._file_signature = signature
+            self._snapshot = ModelSnapshot(version, self.model_path, time.time(), spam_filter)
+            self.last_error = None
+            return True
+
+    def check_for_update(self):
+        """
+        Reloads the model if the model file changed since the last load attempt.
+
+        :return: True if a new model was swapped in.
+        """
+        try:
+            signature = self._signature()
+        except OSError as e:
+            self.last_error = e
+            return False
+        if signature == self._file_signature:
+            return False
+
+        reloaded = self.reload()
+        if not reloaded:
+            # Retry a broken file only after it changes again
+            self._file_signature = signature
+        return reloaded
+
+    def request_reload(self):
+        """
+        Reloads the model in a background thread.
+
+        :return: The started thread.
+        """
+        thread = threading.Thread(target=self.reload, daemon=True)
+        thread.start()
+        return thread
+
+    def install_signal_handler(self, signum=None):
+        """
+        Reloads the model in the background whenever the process receives a signal.
+        Must be called from the main thread.
+
+        :param signum: The signal number, SIGHUP by default.
+        :raises ValueError: If no signal is given and the platform has no SIGHUP, e.g.
+            on Windows.
+        """
+        if signum is None:
+            signum = getattr(signal, "SIGHUP", None)
+            if signum is None:
+                raise ValueError("SIGHUP is not available on this platform, pass another signal")
+        signal.signal(signum, lambda *_: self.request_reload())
+
+    def start(self):
+        """
+        Starts a background thread watching the model file.
+        """
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        """
+        Stops the watcher thread.
+        """
+        if self._watcher is None:
+            return
+        self._stop.set()
+        self._watcher.join()
+        self._watcher = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check_for_update()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def classify(self, raw_email):
+        """
+        Classifies one email with the current model.
+
+        :param raw_email: The raw email contents, as bytes or str.
+        :return: `Verdict` with the label, the spam score and the version of the model
+            that produced them.
+        """
+        snapshot = self._snapshot
+        spam_filter = snapshot.filter
+        score = spam_filter.score(raw_email)
+        return Verdict(spam_filter._classify_score(score), score, snapshot.version)
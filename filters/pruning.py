@@ -0,0 +1,253 @@
+"""
+Compaction of MyFilter models by pruning low-information tokens.
+
+Usage:
+    python -m filters.pruning TRAIN_DIR TEST_DIR [--method logratio|mi] [--max-tokens N]
+                              [--fractions 1 0.5 ...] [--agreement 0.99 ...] [--output PATH]
+
+The vocabulary of `_build_model` is the union of the most frequent tokens of both
+classes, so it holds many tokens, e.g. common words, that are about as likely in
+ham as in spam. Tokens are ranked by the absolute log-ratio of their class
+probabilities, or by the mutual information between the token and the class, and
+the least informative ones are dropped. The weights and the normalizer of the kept
+tokens do not change, so a pruned token removes exactly its own contribution from
+the score. The report trains on TRAIN_DIR and compares the full model with pruned
+ones of several sizes, and with the smallest ones whose verdicts agree with the full
+model on the training emails at the given rates, by size, scoring time, agreement on
+TEST_DIR and quality score. `--output` saves the model pruned to the first
+agreement rate.
+"""
+import argparse
+import json
+import math
+import pickle
+import time
+
+from filter import MyFilter
+from config.labels import SPAM_TAG, HAM_TAG
+from dataio.tokenized import TokenizedCorpus
+from metrics.confmat import BinaryConfusionMatrix
+from metrics.crossval import count_tokens
+from metrics.quality import quality_score
+
+METHODS = ("logratio", "mi")
+DEFAULT_FRACTIONS = (1.0, 0.5, 0.25, 0.1, 0.05, 0.02)
+DEFAULT_AGREEMENTS = (0.999, 0.99)
+TIMING_RUNS = 3
+
+# Keys of the pruned model copied from the full model
+_SCALAR_KEYS = ("prior_ham", "prior_spam", "total_ham_tokens", "total_spam_tokens", "threshold", "norm")
+
+
+def rank_tokens(model, method="logratio"):
+    """
+    Rank the vocabulary of a model from the most informative token.
+
+    `logratio` ranks by the absolute log-ratio of the spam and ham probabilities of a
+    token, i.e. its contribution to the score of an email containing it. `mi` ranks by
+    the mutual information between the occurrence of the token in the token stream and
+    the class, which also favours frequent tokens.
+
+    :param model: Model dictionary with weights.
+    :param method: `logratio` or `mi`.
+    :return: List of tokens. Ties are broken by the token.
+    :raises ValueError: If the method is unknown.
+    """
+    weights, norm = model["weights"], model["norm"]
+    if method == "logratio":
+        informativeness = {w: abs(weight + norm) for w, weight in weights.items()}
+    elif method == "mi":
+        total = model["total_ham_tokens"] + model["total_spam_tokens"]
+        p_ham = model["total_ham_tokens"] / total if total else model["prior_ham"]
+        p_spam = 1.0 - p_ham
+        ham_probs, spam_probs = MyFilter.token_probabilities(model)
+        informativeness = dict()
+        for w in weights:
+            h, s = ham_probs[w], spam_probs[w]
+            p = p_ham * h + p_spam * s
+            informativeness[w] = p_ham * (h * math.log(h / p) + (1 - h) * math.log((1 - h) / (1 - p))) \
+                + p_spam * (s * math.log(s / p) + (1 - s) * math.log((1 - s) / (1 - p)))
+    else:
+        raise ValueError(f"Unknown ranking method: {method}")
+
+    return sorted(informativeness, key=lambda w: (-informativeness[w], w))
+
+
+def restrict_model(model, vocabulary):
+    """
+    Copy a model with only the given tokens. The raw counts are not copied: pruned
+    models are meant for scoring, and online updates approximate the counts from the
+    probabilities, as for a model without counts.
+
+    :param model: Model dictionary with weights.
+    :param vocabulary: Iterable of tokens of the model to keep.
+    :return: The pruned model dictionary.
+    """
+    vocabulary = set(vocabulary)
+    pruned = {key: model[key] for key in _SCALAR_KEYS if key in model}
+    pruned["vocabulary"] = vocabulary
+    ham_probs, spam_probs = MyFilter.token_probabilities(model)
+    for key, values in (("ham_probs", ham_probs), ("spam_probs", spam_probs), ("weights", model["weights"])):
+        pruned[key] = {w: values[w] for w in vocabulary}
+    return pruned
+
+
+def prune_model(model, size, method="logratio"):
+    """
+    :param model: Model dictionary with weights.
+    :param size: Number of tokens to keep.
+    :param method: Ranking method, see `rank_tokens`.
+    :return: The pruned model dictionary with the `size` most informative tokens.
+    """
+    return restrict_model(model, rank_tokens(model, method)[:size])
+
+
+def agreement_rate(model, pruned, tokens):
+    """
+    :param model: The full model dictionary.
+    :param pruned: The pruned model dictionary.
+    :param tokens: List of token lists of emails.
+    :return: Fraction of emails both models classify the same, 1.0 if there are none.
+    """
+    if not tokens:
+        return 1.0
+    spam_filter = MyFilter()
+    full_labels = [spam_filter._classify_score(spam_filter._score_tokens(t, model), model) for t in tokens]
+    return _agreement(spam_filter, pruned, tokens, full_labels)
+
+
+def _agreement(spam_filter, pruned, tokens, full_labels):
+    agreeing = sum(spam_filter._classify_score(spam_filter._score_tokens(t, pruned), pruned) == label
+                   for t, label in zip(tokens, full_labels))
+    return agreeing / len(tokens)
+
+
+def prune_to_agreement(model, tokens, target, method="logratio"):
+    """
+    Find the smallest pruned model whose verdicts agree with the full model at least
+    at the target rate, by bisection over the number of kept tokens.
+
+    :param model: Model dictionary with weights.
+    :param tokens: List of token lists of the emails to compare the verdicts on.
+    :param target: Agreement rate, between 0 and 1.
+    :param method: Ranking method, see `rank_tokens`.
+    :return: A tuple `(pruned, agreement)` of the pruned model dictionary and its
+        agreement rate on the emails.
+    """
+    ranked = rank_tokens(model, method)
+    spam_filter = MyFilter()
+    full_labels = [spam_filter._classify_score(spam_filter._score_tokens(t, model), model) for t in tokens]
+
+    low, high = 0, len(ranked)
+    best = restrict_model(model, ranked)
+    best_agreement = 1.0
+    while low < high:
+        size = (low + high) // 2
+        pruned = restrict_model(model, ranked[:size])
+        agreement = _agreement(spam_filter, pruned, tokens, full_labels) if tokens else 1.0
+        if agreement >= target:
+            best, best_agreement = pruned, agreement
+            high = size
+        else:
+            low = size + 1
+    return best, best_agreement
+
+
+def _evaluate(model, full_model, test, truths):
+    """
+    :return: Dictionary with the vocabulary size, pickled model size, best scoring time
+        of the held-out set, agreement with the full model and quality score.
+    """
+    spam_filter = MyFilter()
+    scoring_time = None
+    # Best of several runs, the scoring times of small models are close to the noise
+    for _ in range(TIMING_RUNS):
+        start = time.perf_counter()
+        predictions = [spam_filter._classify_score(spam_filter._score_tokens(t, model), model) for t in test.tokens]
+        elapsed = time.perf_counter() - start
+        scoring_time = elapsed if scoring_time is None else min(scoring_time, elapsed)
+
+    bc_matrix = BinaryConfusionMatrix(SPAM_TAG, HAM_TAG)
+    bc_matrix.update_many(truths, predictions)
+    return {
+        "vocabulary_size": len(model["vocabulary"]),
+        "model_bytes": len(pickle.dumps(model)),
+        "scoring_time_s": scoring_time,
+        "agreement": agreement_rate(full_model, model, test.tokens),
+        "quality": quality_score(**bc_matrix.as_dict()),
+    }
+
+
+def pruning_report(train, test, method="logratio", max_tokens=2500, fractions=DEFAULT_FRACTIONS,
+                   agreements=DEFAULT_AGREEMENTS):
+    """
+    Compare a trained model with pruned versions of it.
+    :param train: Path to a training corpus directory or a TokenizedCorpus.
+    :param test: Path to a held-out corpus directory (with `!truth.txt`) or a TokenizedCorpus.
+    :param method: Ranking method, see `rank_tokens`.
+    :param max_tokens: The `max_tokens` parameter of the trained filter.
+    :param fractions: Iterable of fractions of the vocabulary to keep.
+    :param agreements: Iterable of agreement rates with the full model on the training
+        emails, each giving the smallest pruned model reaching it.
+    :return: A tuple `(results, pruned)`: the list of dictionaries described in
+        `_evaluate`, with `fraction` or `target_agreement` set, and the list of models
+        pruned to the agreement rates.
+    """
+    if not isinstance(train, TokenizedCorpus):
+        train = TokenizedCorpus.from_directory(train)
+    if not isinstance(test, TokenizedCorpus):
+        test = TokenizedCorpus.from_directory(test)
+
+    spam_filter = MyFilter(max_tokens=max_tokens)
+    spam_filter._build_model(*count_tokens(train, range(len(train))))
+    # The full model without raw counts, comparable in size with the pruned ones
+    full_model = restrict_model(spam_filter.model, spam_filter.model["vocabulary"])
+    ranked = rank_tokens(full_model, method)
+    truths = [test.get_class(filename) for filename in test.filenames]
+    results = []
+
+    for fraction in sorted(set(fractions), reverse=True):
+        model = restrict_model(full_model, ranked[:round(fraction * len(ranked))])
+        results.append({"fraction": fraction, **_evaluate(model, full_model, test, truths)})
+
+    pruned_models = []
+    for target in agreements:
+        model, _ = prune_to_agreement(full_model, train.tokens, target, method)
+        pruned_models.append(model)
+        results.append({"target_agreement": target, **_evaluate(model, full_model, test, truths)})
+
+    return results, pruned_models
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prune low-information tokens from a MyFilter model.")
+    parser.add_argument("train_dir")
+    parser.add_argument("test_dir")
+    parser.add_argument("--method", choices=METHODS, default="logratio")
+    parser.add_argument("--max-tokens", type=int, default=2500)
+    parser.add_argument("--fractions", type=float, nargs="+", default=list(DEFAULT_FRACTIONS))
+    parser.add_argument("--agreement", type=float, nargs="+", default=list(DEFAULT_AGREEMENTS))
+    parser.add_argument("--output", default=None, help="save the model pruned to the first agreement rate")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    results, pruned_models = pruning_report(args.train_dir, args.test_dir, args.method, args.max_tokens,
+                                            args.fractions, args.agreement)
+    if args.output is not None and pruned_models:
+        spam_filter = MyFilter(max_tokens=args.max_tokens)
+        spam_filter.model = pruned_models[0]
+        spam_filter.save_model(args.output)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'target':>10} {'vocabulary':>10} {'model_kB':>9} {'score_ms':>9} {'agreement':>10} {'quality':>8}")
+    for r in results:
+        target = f"{r['fraction']:.0%}" if "fraction" in r else f"{r['target_agreement']:.1%} agr"
+        print(f"{target:>10} {r['vocabulary_size']:>10} {r['model_bytes'] / 1024:>9.1f}"
+              f" {1000 * r['scoring_time_s']:>9.1f} {r['agreement']:>10.4f} {r['quality']:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
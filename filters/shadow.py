@@ -0,0 +1,194 @@
+"""
+Shadow scoring of candidate models against the live model.
+
+Usage:
+    python -m filters.shadow TEST_DIR --primary MODEL --shadow MODEL [--shadow MODEL ...]
+                             [--name NAME ...] [--log PATH]
+
+Every email is read, extracted and split into words once and scored by the primary
+model and by every shadow model, each through its own vocabulary ids. Only the
+primary verdicts are written to `!prediction.txt`. The emails on which a shadow model disagrees with the primary one
+are logged to `!shadow.txt`, one line `filename name primary_label shadow_label delta`
+each, where `delta` is the shadow score minus the primary score. The report
+summarizes the agreement and the score deltas of every shadow model.
+"""
+import argparse
+import json
+
+from filter import MyFilter
+from filters.basefilter import BaseFilter
+from config.labels import SPAM_TAG
+from config.paths import jpath, SHADOW_FILENAME
+from dataio.corpus import Corpus
+from dataio.tokenized import TokenizedCorpus
+from utils import write_classification_to_file
+
+
+class ShadowFilter(BaseFilter):
+    """
+    Classifies emails with a primary MyFilter while scoring them with shadow filters on
+    the same words. A shadow model costs one dictionary lookup per word of an email.
+    The near-duplicate index of the primary filter is not used.
+
+    :ivar primary: MyFilter whose verdicts are written.
+    :ivar shadows: List of shadow MyFilter instances.
+    :ivar names: List of names of the shadow filters, used in the log and the report.
+    :ivar report: Dictionary of the last `test` run with the number of `emails` and a
+        `shadows` list with the agreement and score deltas of every shadow filter.
+    """
+
+    def __init__(self, primary, shadows, names=None):
+        """
+        :param primary: MyFilter whose verdicts are written.
+        :param shadows: Iterable of shadow MyFilter instances.
+        :param names: Optional names of the shadow filters, `shadow-1`, `shadow-2`, ... by
+            default.
+        :raises ValueError: If the names do not match the filters or contain whitespace.
+        """
+        super().__init__()
+        self.primary = primary
+        self.shadows = list(shadows)
+        self.names = [f"shadow-{i}" for i in range(1, len(self.shadows) + 1)] if names is None else list(names)
+        if len(self.names) != len(self.shadows) or any(name.split() != [name] for name in self.names):
+            raise ValueError("Every shadow filter needs one name without whitespace")
+        self.report = None
+
+    @property
+    def filters(self):
+        """List of the primary filter followed by the shadow filters."""
+        return [self.primary] + self.shadows
+
+    def _models(self):
+        """
+        :return: List of the models of `filters`.
+        :raises RuntimeError: If a filter has no model.
+        """
+        models = [spam_filter.model for spam_filter in self.filters]
+        if any(model is None for model in models):
+            raise RuntimeError("Model not loaded or trained")
+        return [MyFilter._with_weights(model) for model in models]
+
+    def train(self, emails_path):
+        """
+        Trains the primary and all shadow filters on one tokenization pass of a corpus.
+
+        :param emails_path: Path to the directory containing the training emails.
+        """
+        corpus = TokenizedCorpus.from_directory(emails_path, self.stats)
+        for spam_filter in self.filters:
+            spam_filter.train_tokenized(corpus)
+
+    def _iter_verdicts(self, corpus):
+        """
+        Generator of the verdicts of all models for the emails of a corpus.
+
+        Each email is extracted and split into words once. Every model maps the words
+        to the ids of its own vocabulary and scores them as `MyFilter.test` does, so the
+        primary model costs the same as in a plain run.
+
+        :param corpus: Corpus instance.
+        :return: A tuple `(filename, labels, scores)` for each email, with the labels and
+            scores of the models in the order of `filters`.
+        """
+        models = self._models()
+        bindings = [spam_filter._vocabulary_binding(model)[1:] for spam_filter, model in zip(self.filters, models)]
+        primary = self.primary
+        extractor = primary._extractor
+        words_of = primary._tokenizer._words
+        score_ids = primary._score_ids
+        classify_score = primary._classify_score
+        stats = primary.stats
+
+        for filename, email in corpus.emails():
+            if stats is None:
+                body = extractor.extract(email)
+                words = list(words_of(body)) if body else []
+                scores = [score_ids(tokenizer.iter_word_ids(words), weight_list, model)
+                          for (tokenizer, weight_list), model in zip(bindings, models)]
+            else:
+                with stats.stage("extract"):
+                    body = extractor.extract(email)
+                with stats.stage("tokenize"):
+                    words = list(words_of(body)) if body else []
+                with stats.stage("score"):
+                    scores = [score_ids(tokenizer.iter_word_ids(words), weight_list, model)
+                              for (tokenizer, weight_list), model in zip(bindings, models)]
+                stats.record_email()
+            yield filename, [classify_score(score, model) for score, model in zip(scores, models)], scores
+
+    def test(self, emails_path, log_path=None):
+        """
+        Writes the primary verdicts to the prediction file, logs the disagreements of
+        the shadow filters and stores their summary in `report`.
+
+        :param emails_path: Path to the emails for testing.
+        :param log_path: Path of the disagreement log, `!shadow.txt` in the directory by
+            default.
+        :raises RuntimeError: If a filter has no model.
+        """
+        self._models()
+        super().test(emails_path)
+        # The report and the prediction file cover this corpus only
+        self._predictions = dict()
+        if log_path is None:
+            log_path = jpath(emails_path, SHADOW_FILENAME)
+
+        summaries = [{"name": name, "disagreements": 0, "ham_to_spam": 0, "spam_to_ham": 0,
+                      "sum_delta": 0.0, "sum_abs_delta": 0.0, "max_abs_delta": 0.0} for name in self.names]
+
+        with open(log_path, "w", encoding="utf-8") as log:
+            for filename, labels, scores in self._iter_verdicts(self._corpus):
+                primary_label, primary_score = labels[0], scores[0]
+                self._predictions[filename] = primary_label
+
+                for summary, label, score in zip(summaries, labels[1:], scores[1:]):
+                    delta = score - primary_score
+                    summary["sum_delta"] += delta
+                    summary["sum_abs_delta"] += abs(delta)
+                    summary["max_abs_delta"] = max(summary["max_abs_delta"], abs(delta))
+                    if label != primary_label:
+                        summary["disagreements"] += 1
+                        summary["ham_to_spam" if label == SPAM_TAG else "spam_to_ham"] += 1
+                        log.write(f"{filename} {summary['name']} {primary_label} {label} {delta!r}\n")
+
+        emails = len(self._predictions)
+        for summary in summaries:
+            summary["agreement"] = 1.0 - summary["disagreements"] / emails if emails else 1.0
+            summary["mean_delta"] = summary.pop("sum_delta") / emails if emails else 0.0
+            summary["mean_abs_delta"] = summary.pop("sum_abs_delta") / emails if emails else 0.0
+        self.report = {"emails": emails, "shadows": summaries}
+        write_classification_to_file(self._prediction_file_path, self._predictions)
+
+    def iter_predictions(self, emails_path):
+        """
+        Generator of the primary predictions for a corpus, without writing any file.
+
+        :param emails_path: Path to the emails for testing.
+        :return: A tuple `(filename, prediction)` for each email.
+        """
+        for filename, labels, _ in self._iter_verdicts(Corpus(emails_path, self.stats)):
+            yield filename, labels[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare shadow models with the primary model on a corpus.")
+    parser.add_argument("test_dir")
+    parser.add_argument("--primary", default=MyFilter.MODEL_PATH)
+    parser.add_argument("--shadow", action="append", required=True, help="path to a shadow model, repeatable")
+    parser.add_argument("--name", action="append", default=None, help="name of a shadow model, repeatable")
+    parser.add_argument("--log", default=None)
+    args = parser.parse_args(argv)
+
+    filters = []
+    for model_path in [args.primary] + args.shadow:
+        spam_filter = MyFilter()
+        spam_filter.load_model(model_path)
+        filters.append(spam_filter)
+
+    shadow = ShadowFilter(filters[0], filters[1:], args.name)
+    shadow.test(args.test_dir, args.log)
+    print(json.dumps(shadow.report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
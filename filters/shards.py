@@ -0,0 +1,227 @@
+"""
+Distributed training of MyFilter from mergeable count shards.
+
+Usage:
+    python -m filters.shards count CORPUS_DIR SHARD_PATH [--index I] [--count N] [--corpus-id ID]
+    python -m filters.shards merge SHARD_PATH [SHARD_PATH ...] --output PATH [--partial] [--max-tokens N]
+
+A shard holds the token counts and the email counts of both classes for a subset
+of a training corpus: the emails whose filename hashes to shard `I` of `N`, so
+every node can select its slice without coordination. Each shard records the
+identity of its corpus, a digest of the names and sizes of the email files by
+default, so the same corpus mounted at different paths is recognized. Counts are
+additive, so
+shards merge in any order and grouping. `merge --partial` writes the merged
+counts as a new shard for reducing in a tree. Without it, `merge` builds and
+saves the final MyFilter model, equal to one trained on all the emails at once.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import zlib
+from collections import Counter
+
+from filter import MyFilter
+from dataio.trainingcorpus import TrainingCorpus
+
+FORMAT = "myfilter-count-shard"
+VERSION = 1
+
+
+def shard_of(filename, count):
+    """
+    Assign an email to a shard by a stable hash of its filename.
+    :param filename: The name of the email file.
+    :param count: Number of shards.
+    :return: Index of the shard, from 0 to `count - 1`.
+    """
+    return zlib.crc32(filename.encode("utf-8")) % count
+
+
+def corpus_digest(emails_path):
+    """
+    Identify a corpus by its contents rather than its location, without reading the
+    emails.
+    :param emails_path: Path to the corpus directory.
+    :return: Hex digest of the sorted names and sizes of the email files.
+    """
+    with os.scandir(emails_path) as scan:
+        listing = sorted((entry.name, entry.stat().st_size) for entry in scan
+                         if not entry.name.startswith("!") and entry.is_file())
+    digest = hashlib.blake2b(digest_size=16)
+    for name, size in listing:
+        digest.update(f"{name}\0{size}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CountShard:
+    """
+    Token and email counts of both classes for a subset of a training corpus.
+
+    :ivar ham_counts: Counter of token frequencies in ham emails.
+    :ivar spam_counts: Counter of token frequencies in spam emails.
+    :ivar ham_emails: Number of ham emails.
+    :ivar spam_emails: Number of spam emails.
+    :ivar sources: List of `[corpus_id, index, count]` lists of the counted slices.
+    """
+
+    def __init__(self, ham_counts=None, spam_counts=None, ham_emails=0, spam_emails=0, sources=None):
+        self.ham_counts = Counter() if ham_counts is None else Counter(ham_counts)
+        self.spam_counts = Counter() if spam_counts is None else Counter(spam_counts)
+        self.ham_emails = ham_emails
+        self.spam_emails = spam_emails
+        self.sources = [] if sources is None else [list(source) for source in sources]
+
+    def merge(self, other):
+        """
+        Add the counts of another shard to this one.
+        :param other: CountShard to add.
+        :return: This shard.
+        :raises ValueError: If the shards split a corpus into a different number of
+            slices, whose emails may overlap, or if both count the same slice.
+        """
+        partitions = {corpus: count for corpus, _, count in self.sources}
+        for corpus, _, count in other.sources:
+            if partitions.setdefault(corpus, count) != count:
+                raise ValueError(f"Shards split {corpus} into {partitions[corpus]} and {count} slices")
+
+        overlap = [source for source in other.sources if source in self.sources]
+        if overlap:
+            raise ValueError(f"Shards count the same slices: {overlap}")
+
+        self.ham_counts.update(other.ham_counts)
+        self.spam_counts.update(other.spam_counts)
+        self.ham_emails += other.ham_emails
+        self.spam_emails += other.spam_emails
+        self.sources.extend(other.sources)
+        return self
+
+    def save(self, filepath):
+        """
+        Write the shard as gzipped JSON. The file is replaced atomically.
+        :param filepath: Path to the shard file.
+        """
+        data = {
+            "format": FORMAT,
+            "version": VERSION,
+            "ham_emails": self.ham_emails,
+            "spam_emails": self.spam_emails,
+            "sources": self.sources,
+            "ham_counts": self.ham_counts,
+            "spam_counts": self.spam_counts,
+        }
+        tmp_path = f"{filepath}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, filepath)
+
+    @classmethod
+    def load(cls, filepath):
+        """
+        Read a shard file.
+        :param filepath: Path to the shard file.
+        :return: CountShard instance.
+        :raises ValueError: If the file is not a count shard of a known version.
+        """
+        try:
+            with gzip.open(filepath, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, EOFError, json.JSONDecodeError) as e:
+            raise ValueError(f"Not a count shard: {filepath}") from e
+        if not isinstance(data, dict) or data.get("format") != FORMAT or data.get("version") != VERSION:
+            raise ValueError(f"Not a count shard: {filepath}")
+
+        return cls(data["ham_counts"], data["spam_counts"], data["ham_emails"], data["spam_emails"],
+                   data["sources"])
+
+    def build_filter(self, max_tokens=2500):
+        """
+        Build a MyFilter model from the counts.
+        :param max_tokens: The `max_tokens` parameter of the filter.
+        :return: MyFilter with the built model.
+        :raises ValueError: If the shard has no emails of either class.
+        """
+        if not self.ham_emails or not self.spam_emails:
+            raise ValueError("Shards must contain both ham and spam emails")
+
+        spam_filter = MyFilter(max_tokens=max_tokens)
+        spam_filter._build_model(Counter(self.ham_counts), Counter(self.spam_counts),
+                                 self.ham_emails, self.spam_emails)
+        return spam_filter
+
+
+def count_shard(emails_path, index=0, count=1, corpus_id=None):
+    """
+    Count the tokens of one slice of a training corpus. Only the emails of the slice
+    are read.
+    :param emails_path: Path to the training corpus directory.
+    :param index: Index of the slice, from 0 to `count - 1`.
+    :param count: Number of slices the corpus is split into.
+    :param corpus_id: Identity of the corpus, the same on every node. Defaults to
+        `corpus_digest` of the directory.
+    :return: CountShard of the slice.
+    :raises ValueError: If the index is out of range.
+    """
+    if not 0 <= index < count:
+        raise ValueError(f"Invalid shard index {index} of {count}")
+
+    corpus = TrainingCorpus(emails_path)
+    spam_filter = MyFilter()
+    if corpus_id is None:
+        corpus_id = corpus_digest(emails_path)
+    shard = CountShard(sources=[[corpus_id, index, count]])
+    emails = corpus.emails(lambda filename: shard_of(filename, count) == index)
+
+    for filename, tokens in spam_filter._tokenize_emails(emails):
+        if corpus.is_spam(filename):
+            shard.spam_counts.update(tokens)
+            shard.spam_emails += 1
+        elif corpus.is_ham(filename):
+            shard.ham_counts.update(tokens)
+            shard.ham_emails += 1
+    return shard
+
+
+def merge_shards(filepaths):
+    """
+    Merge shard files, loading one at a time.
+    :param filepaths: Iterable of paths to shard files.
+    :return: CountShard with the sum of the counts.
+    """
+    merged = CountShard()
+    for filepath in filepaths:
+        merged.merge(CountShard.load(filepath))
+    return merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train MyFilter from mergeable count shards.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    count = commands.add_parser("count", help="count the tokens of one slice of a corpus")
+    count.add_argument("corpus_dir")
+    count.add_argument("shard_path")
+    count.add_argument("--index", type=int, default=0)
+    count.add_argument("--count", type=int, default=1)
+    count.add_argument("--corpus-id", default=None,
+                       help="identity of the corpus on all nodes, a digest of its file names and sizes by default")
+
+    merge = commands.add_parser("merge", help="merge shards into a model or a partial shard")
+    merge.add_argument("shard_paths", nargs="+")
+    merge.add_argument("--output", required=True)
+    merge.add_argument("--partial", action="store_true", help="write a merged shard instead of a model")
+    merge.add_argument("--max-tokens", type=int, default=2500)
+
+    args = parser.parse_args(argv)
+    if args.command == "count":
+        count_shard(args.corpus_dir, args.index, args.count, args.corpus_id).save(args.shard_path)
+    elif args.partial:
+        merge_shards(args.shard_paths).save(args.output)
+    else:
+        merge_shards(args.shard_paths).build_filter(args.max_tokens).save_model(args.output)
+
+
+if __name__ == "__main__":
+    main()
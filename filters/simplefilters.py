@@ -2,6 +2,7 @@ import random
 from abc import abstractmethod
 
 from filters.basefilter import BaseFilter
+from dataio.corpus import Corpus
 from config.labels import HAM_TAG, SPAM_TAG
 from utils import write_classification_to_file
 
@@ -20,14 +21,36 @@ class _ConstantFilter(BaseFilter):
         """
         super().test(emails_path)
 
-        for filename, _ in self._corpus.emails():
-            self._predictions[filename] = self.TAG
+        # Only the filenames are needed, the emails are never read
+        for handle in self._corpus.handles():
+            self._predictions[handle.filename] = self.TAG
 
         write_classification_to_file(
             self._prediction_file_path,
             self._predictions
         )
 
+    def iter_predictions(self, emails_path):
+        """
+        Generator of the same TAG for all emails in the corpus.
+        :param emails_path: Path to the emails for testing.
+        :return: A tuple `(filename, prediction)` for each email.
+        """
+        for handle in Corpus(emails_path, self.stats).handles():
+            yield handle.filename, self.TAG
+
+    def train_tokenized(self, corpus):
+        """No training needed."""
+        pass
+
+    def predict_tokenized(self, corpus):
+        """
+        Predict the same TAG for all emails in a tokenized corpus.
+        :param corpus: TokenizedCorpus to classify.
+        :return: Dictionary with filenames and predicted labels.
+        """
+        return {filename: self.TAG for filename in corpus.filenames}
+
     @abstractmethod
     def train(self, emails_path):
         """
@@ -75,8 +98,9 @@ class RandomFilter(BaseFilter):
 
         tags = (HAM_TAG, SPAM_TAG)
 
-        for filename, _ in self._corpus.emails():
-            self._predictions[filename] = random.choice(tags)
+        # Only the filenames are needed, the emails are never read
+        for handle in self._corpus.handles():
+            self._predictions[handle.filename] = random.choice(tags)
 
         write_classification_to_file(
             self._prediction_file_path,
@@ -86,3 +110,26 @@ class RandomFilter(BaseFilter):
     def train(self, emails_path):
         """No training needed."""
         pass
+
+    def iter_predictions(self, emails_path):
+        """
+        Generator of random predictions for each email in the corpus.
+        :param emails_path: Path to the emails for testing.
+        :return: A tuple `(filename, prediction)` for each email.
+        """
+        tags = (HAM_TAG, SPAM_TAG)
+        for handle in Corpus(emails_path, self.stats).handles():
+            yield handle.filename, random.choice(tags)
+
+    def train_tokenized(self, corpus):
+        """No training needed."""
+        pass
+
+    def predict_tokenized(self, corpus):
+        """
+        Predict randomly for each email in a tokenized corpus.
+        :param corpus: TokenizedCorpus to classify.
+        :return: Dictionary with filenames and predicted labels.
+        """
+        tags = (HAM_TAG, SPAM_TAG)
+        return {filename: random.choice(tags) for filename in corpus.filenames}
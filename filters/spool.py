@@ -0,0 +1,445 @@
+"""
+Continuous classification of emails delivered to a spool directory.
+
+Usage:
+    python -m filters.spool SPOOL_DIR [--model PATH] [--predictions PATH]
+                            [--ham-dir DIR --spam-dir DIR] [--poll] [--interval S]
+                            [--retry-interval S]
+
+The model is loaded once. Files already in the spool form the initial backlog, and
+new files are detected with inotify on Linux, or by polling the directory
+elsewhere. Every file is classified once: its verdict is appended to a streaming
+predictions file in the `!prediction.txt` format, or the file is moved into a ham
+or a spam folder. Files whose names start with `!` or `.` are ignored, so
+deliveries can be written under a hidden name and renamed when complete.
+"""
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import select
+import shutil
+import struct
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from filter import MyFilter
+from config.labels import SPAM_TAG
+from config.paths import jpath, PREDICTION_FILENAME
+from utils import read_classification_from_file
+
+
+def _is_email_name(filename):
+    return not filename.startswith(("!", "."))
+
+
+class InotifyWatcher:
+    """
+    Detects files written or moved into a directory with Linux inotify, via ctypes.
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_Q_OVERFLOW = 0x00004000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, path):
+        """
+        :param path: Path to the watched directory.
+        :raises OSError: If inotify is not available or the directory cannot be watched.
+        """
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or libc_name is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self._fd, os.fsencode(path), self.IN_CLOSE_WRITE | self.IN_MOVED_TO) < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, f"Cannot watch {path}")
+
+    def poll(self, timeout):
+        """
+        Waits for new files.
+        :param timeout: Maximum number of seconds to wait.
+        :return: List of names of files completed since the last call, or None if the
+            kernel event queue overflowed and events were lost.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+
+        filenames = []
+        overflowed = False
+        while True:
+            try:
+                buffer = os.read(self._fd, 1 << 16)
+            except BlockingIOError:
+                break
+            names, buffer_overflowed = self._parse_events(buffer)
+            filenames.extend(names)
+            overflowed = overflowed or buffer_overflowed
+        return None if overflowed else filenames
+
+    @classmethod
+    def _parse_events(cls, buffer):
+        """
+        :param buffer: Bytes read from the inotify file descriptor.
+        :return: A tuple `(filenames, overflowed)` with the names of the files of the
+            events and whether the buffer holds a queue overflow event.
+        """
+        filenames = []
+        overflowed = False
+        offset = 0
+        while offset < len(buffer):
+            _, mask, _, length = cls._EVENT.unpack_from(buffer, offset)
+            offset += cls._EVENT.size
+            name = buffer[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & cls.IN_Q_OVERFLOW:
+                overflowed = True
+            elif name:
+                filenames.append(os.fsdecode(name))
+        return filenames, overflowed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """
+    Detects new files by listing a directory. A file is reported once its size and
+    modification time did not change between two listings, so files still being
+    written are not reported early.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path to the watched directory.
+        """
+        self.path = path
+        self._known = set(self._listing())
+        self._pending = dict()
+
+    def _listing(self):
+        """
+        :return: Dictionary with the names of the files and their `(size, mtime_ns)`.
+        """
+        listing = dict()
+        with os.scandir(self.path) as scan:
+            for entry in scan:
+                try:
+                    if entry.is_file():
+                        st = entry.stat()
+                        listing[entry.name] = (st.st_size, st.st_mtime_ns)
+                except FileNotFoundError:
+                    continue
+        return listing
+
+    def poll(self, timeout):
+        """
+        Waits and lists the directory once.
+        :param timeout: Number of seconds to wait before listing.
+        :return: List of names of new files with stable metadata.
+        """
+        time.sleep(timeout)
+        listing = self._listing()
+        filenames = []
+        pending = dict()
+
+        for name, signature in listing.items():
+            if name in self._known:
+                continue
+            if self._pending.get(name) == signature:
+                filenames.append(name)
+                self._known.add(name)
+            else:
+                pending[name] = signature
+
+        self._known.intersection_update(listing)
+        self._pending = pending
+        return filenames
+
+    def close(self):
+        pass
+
+
+def make_watcher(path, polling=False):
+    """
+    :param path: Path to the watched directory.
+    :param polling: If True, polling is used even when inotify is available.
+    :return: InotifyWatcher if available, PollingWatcher otherwise.
+    """
+    if not polling:
+        try:
+            return InotifyWatcher(path)
+        except OSError:
+            pass
+    return PollingWatcher(path)
+
+
+class SpoolClassifier:
+    """
+    Classifies every file delivered to a spool directory once, with a loaded filter.
+
+    :ivar spool_dir: Path to the spool directory.
+    :ivar predictions_path: Path to the streaming predictions file, or None when files
+        are moved into the ham and spam folders.
+    :ivar processed: Number of classified files.
+    :ivar missing: Number of files that disappeared before they were classified.
+    :ivar errors: Number of failed attempts to read, classify, move or record a file.
+        A failed file stays in the spool and is queued again after `retry_interval`.
+    :ivar last_error: Message of the last such error, or None.
+    :ivar retry_interval: Seconds after which a failed file is queued again.
+    :ivar last_latency: Seconds from the detection of the last classified file to its
+        verdict.
+    :ivar latency_histogram: Counter of per-file latencies bucketed by powers of two,
+        keyed by the bucket upper bound in microseconds.
+    """
+
+    def __init__(self, spool_dir, spam_filter, predictions_path=None, ham_dir=None, spam_dir=None,
+                 polling=False, poll_interval=1.0, retry_interval=60.0):
+        """
+        :param spool_dir: Path to the spool directory.
+        :param spam_filter: Trained filter with a `classify` method of raw emails.
+        :param predictions_path: Path to the streaming predictions file. Defaults to
+            `!prediction.txt` in the spool directory unless folders are given. Files
+            listed in an existing predictions file are not classified again.
+        :param ham_dir: Folder receiving ham files, together with `spam_dir`.
+        :param spam_dir: Folder receiving spam files, together with `ham_dir`.
+        :param polling: If True, the directory is polled even when inotify is available.
+        :param poll_interval: Maximum seconds between checks of the stop flag, and
+            between listings when polling.
+        :param retry_interval: Seconds after which a file whose classification failed is
+            queued again.
+        :raises ValueError: If only one of the folders is given.
+        """
+        if (ham_dir is None) != (spam_dir is None):
+            raise ValueError("Both the ham and the spam folder must be given")
+        if ham_dir is None and predictions_path is None:
+            predictions_path = jpath(spool_dir, PREDICTION_FILENAME)
+
+        self.spool_dir = spool_dir
+        self.spam_filter = spam_filter
+        self.predictions_path = predictions_path
+        self.folders = None if ham_dir is None else (ham_dir, spam_dir)
+        self.polling = polling
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+
+        self.processed = 0
+        self.missing = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_latency = None
+        self.latency_histogram = Counter()
+
+        self._queue = deque()
+        self._queued = set()
+        # Files recorded in the predictions file. Moved files leave the spool and are
+        # not remembered, so this stays empty in folder mode.
+        self._done = set()
+        self._retry = dict()
+        if predictions_path is not None and os.path.isfile(predictions_path):
+            self._done.update(read_classification_from_file(predictions_path))
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def backlog(self):
+        """Number of detected files waiting for classification."""
+        return len(self._queue)
+
+    def status(self):
+        """
+        :return: JSON-serializable dictionary with the counters, the backlog depth, the
+            number of failed files waiting for a retry and the latency histogram.
+        """
+        return {
+            "processed": self.processed,
+            "missing": self.missing,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "backlog": self.backlog,
+            "retry_pending": len(self._retry),
+            "last_latency_s": self.last_latency,
+            "latency_histogram_us": {str(bound): count for bound, count in sorted(self.latency_histogram.items())},
+        }
+
+    def enqueue(self, filenames):
+        """
+        Adds files to the backlog, unless they are queued or classified already.
+        :param filenames: Iterable of names of files in the spool directory.
+        """
+        now = time.perf_counter()
+        for filename in filenames:
+            if _is_email_name(filename) and filename not in self._queued and filename not in self._done:
+                self._queue.append((filename, now))
+                self._queued.add(filename)
+
+    def scan(self):
+        """
+        Adds all files present in the spool directory to the backlog.
+        """
+        with os.scandir(self.spool_dir) as scan:
+            self.enqueue(entry.name for entry in scan if entry.is_file())
+
+    def retry_failed(self):
+        """
+        Adds the failed files whose retry interval has passed to the backlog.
+        """
+        now = time.monotonic()
+        due = [filename for filename, retry_at in self._retry.items() if retry_at <= now]
+        for filename in due:
+            del self._retry[filename]
+        self.enqueue(due)
+
+    def process_backlog(self, max_files=None):
+        """
+        Classifies queued files.
+        :param max_files: Maximum number of files to classify, all if None.
+        :return: Number of classified files.
+        """
+        count = 0
+        while self._queue and (max_files is None or count < max_files):
+            filename, detected = self._queue.popleft()
+            self._queued.discard(filename)
+            if self._classify_file(filename):
+                latency = time.perf_counter() - detected
+                self.last_latency = latency
+                self.latency_histogram[1 << int(1e6 * latency).bit_length()] += 1
+                self.processed += 1
+                count += 1
+        return count
+
+    def _classify_file(self, filename):
+        """
+        Classifies one file and emits its verdict. Files are moved with `shutil.move`,
+        so the folders may be on another file system than the spool. Any error of one
+        file, including an email the filter fails on, is recorded and the file retried.
+        :return: True if the file was classified, False if it disappeared or an error
+            occurred.
+        """
+        path = jpath(self.spool_dir, filename)
+        try:
+            with open(path, "rb") as f:
+                raw_email = f.read()
+        except FileNotFoundError:
+            self.missing += 1
+            return False
+        except OSError as e:
+            return self._record_error(filename, e)
+
+        try:
+            label = self.spam_filter.classify(raw_email)
+            if self.folders is None:
+                with open(self.predictions_path, "a", encoding="utf-8") as f:
+                    f.write(filename + " " + label + "\n")
+                self._done.add(filename)
+            else:
+                ham_dir, spam_dir = self.folders
+                shutil.move(path, jpath(spam_dir if label == SPAM_TAG else ham_dir, filename))
+        except Exception as e:
+            return self._record_error(filename, e)
+
+        self._retry.pop(filename, None)
+        return True
+
+    def _record_error(self, filename, error):
+        """
+        Counts a file that could not be classified and schedules its retry, so one bad
+        file does not stop the watch.
+        :return: False.
+        """
+        self.errors += 1
+        self.last_error = f"{filename}: {type(error).__name__}: {error}"
+        self._retry[filename] = time.monotonic() + self.retry_interval
+        return False
+
+    def run(self):
+        """
+        Classifies the files in the spool directory and then new arrivals until `stop`
+        is called.
+        """
+        watcher = make_watcher(self.spool_dir, self.polling)
+        try:
+            # Files delivered before the watch started form the initial backlog
+            self.scan()
+            while not self._stop.is_set():
+                self.process_backlog()
+                filenames = watcher.poll(self.poll_interval)
+                if filenames is None:
+                    # Events were lost, the spool is listed instead
+                    self.scan()
+                else:
+                    self.enqueue(filenames)
+                if self._retry:
+                    self.retry_failed()
+            self.process_backlog()
+        finally:
+            watcher.close()
+
+    def start(self):
+        """
+        Starts `run` in a background thread.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the watch. The background thread classifies the remaining backlog first.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify emails delivered to a spool directory.")
+    parser.add_argument("spool_dir")
+    parser.add_argument("--model", default=MyFilter.MODEL_PATH)
+    parser.add_argument("--predictions", default=None)
+    parser.add_argument("--ham-dir", default=None)
+    parser.add_argument("--spam-dir", default=None)
+    parser.add_argument("--poll", action="store_true", help="poll the directory instead of using inotify")
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--retry-interval", type=float, default=60.0,
+                        help="seconds before a file that failed is tried again")
+    args = parser.parse_args(argv)
+
+    spam_filter = MyFilter()
+    spam_filter.load_model(args.model)
+    spool = SpoolClassifier(args.spool_dir, spam_filter, args.predictions, args.ham_dir, args.spam_dir,
+                            args.poll, args.interval, args.retry_interval)
+    try:
+        spool.run()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(spool.status(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+from collections import Counter
+
+
 class BinaryConfusionMatrix:
     """
     Binary confusion matrix for a fixed positive and negative label.
@@ -39,6 +42,66 @@ class BinaryConfusionMatrix:
         j = self._tag_to_index[prediction]
         self._matrix[i][j] += 1
 
+    def _add_counts(self, counts):
+        """
+        Add counts of `(truth, prediction)` pairs to the matrix. Every distinct pair is
+        validated once, so bulk updates cost one check per pair kind, not per item.
+        :param counts: Mapping of `(truth, prediction)` tuples and their counts.
+
+        :raises ValueError: If a tag is invalid; the matrix is left unchanged.
+        """
+        for truth, prediction in counts:
+            self._validate_tag(truth, "truth")
+            self._validate_tag(prediction, "prediction")
+
+        for (truth, prediction), count in counts.items():
+            self._matrix[self._tag_to_index[truth]][self._tag_to_index[prediction]] += count
+
+    def update_many(self, truths, predictions):
+        """
+        Update the confusion matrix from two parallel sequences of labels.
+        :param truths: Iterable of true labels.
+        :param predictions: Iterable of predicted labels, in the same order.
+        """
+        self._add_counts(Counter(zip(truths, predictions)))
+
+    def update_from_stream(self, pairs, truth_dict):
+        """
+        Update the confusion matrix from a stream of predictions.
+        :param pairs: Iterable of `(email_name, prediction)` tuples, e.g. produced by
+            a filter's `iter_predictions`.
+        :param truth_dict: Dictionary with email names and true labels.
+        :return: Number of consumed predictions.
+
+        :raises KeyError: If a predicted email has no true label.
+        """
+        counts = Counter()
+        for email_name, prediction in pairs:
+            try:
+                truth_label = truth_dict[email_name]
+            except KeyError:
+                raise KeyError(f"Missing truth for email: {email_name}") from None
+            counts[truth_label, prediction] += 1
+
+        self._add_counts(counts)
+        return sum(counts.values())
+
+    def merge(self, other):
+        """
+        Add the counts of another confusion matrix, e.g. one computed by a parallel worker.
+        :param other: BinaryConfusionMatrix with the same positive and negative tags.
+        :return: This matrix.
+
+        :raises ValueError: If the matrices use different tags.
+        """
+        if other._tag_to_index != self._tag_to_index:
+            raise ValueError("Cannot merge confusion matrices with different tags")
+
+        for i in range(2):
+            for j in range(2):
+                self._matrix[i][j] += other._matrix[i][j]
+        return self
+
     def as_dict(self):
         """
         Return the confusion matrix as a dictionary.
@@ -0,0 +1,164 @@
+"""
+Parallel k-fold cross-validation of MyFilter.
+
+Usage:
+    python -m metrics.crossval CORPUS_DIR [--folds K] [--max-tokens N] [--workers N] [--seed S]
+
+The corpus is tokenized once. Token counts are computed for the whole corpus and
+for every fold, and the model of a fold is built from the global counts minus the
+counts of the held-out fold, so no fold is retrained from scratch.
+"""
+import argparse
+import json
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from filter import MyFilter
+from config.labels import SPAM_TAG, HAM_TAG
+from dataio.tokenized import TokenizedCorpus
+from metrics.confmat import BinaryConfusionMatrix
+from metrics.quality import quality_score
+
+# Corpus and global counts shared by the fold worker processes, set by `_init_worker`
+_shared_state = None
+
+
+def assign_folds(corpus, k, seed=0):
+    """
+    Split the emails of a corpus into k folds, stratified by class.
+    :param corpus: TokenizedCorpus with known classification.
+    :param k: Number of folds.
+    :param seed: Seed of the shuffle.
+    :return: List of k lists of email positions.
+    """
+    rng = random.Random(seed)
+    hams = [i for i, filename in enumerate(corpus.filenames) if corpus.is_ham(filename)]
+    spams = [i for i, filename in enumerate(corpus.filenames) if corpus.is_spam(filename)]
+    rng.shuffle(hams)
+    rng.shuffle(spams)
+
+    folds = [[] for _ in range(k)]
+    for position, index in enumerate(hams + spams):
+        folds[position % k].append(index)
+    return folds
+
+
+def count_tokens(corpus, indices):
+    """
+    Count token frequencies and emails per class for selected emails.
+    :param corpus: TokenizedCorpus with known classification.
+    :param indices: Iterable of email positions.
+    :return: A tuple `(ham_counter, spam_counter, ham_count, spam_count)`.
+    """
+    ham_counter, spam_counter = Counter(), Counter()
+    ham_count = spam_count = 0
+    for i in indices:
+        filename = corpus.filenames[i]
+        if corpus.is_spam(filename):
+            spam_counter.update(corpus.tokens[i])
+            spam_count += 1
+        elif corpus.is_ham(filename):
+            ham_counter.update(corpus.tokens[i])
+            ham_count += 1
+    return ham_counter, spam_counter, ham_count, spam_count
+
+
+def _init_worker(corpus, global_counts, max_tokens):
+    global _shared_state
+    _shared_state = (corpus, global_counts, max_tokens)
+
+
+def _evaluate_fold(fold_indices):
+    """
+    Build the model of one fold from the global counts and test it on the fold.
+    :param fold_indices: Positions of the held-out emails.
+    :return: Confusion matrix of the fold.
+    """
+    corpus, (ham_counter, spam_counter, ham_count, spam_count), max_tokens = _shared_state
+    fold_ham, fold_spam, fold_ham_count, fold_spam_count = count_tokens(corpus, fold_indices)
+
+    spam_filter = MyFilter(max_tokens=max_tokens)
+    spam_filter._build_model(ham_counter - fold_ham, spam_counter - fold_spam,
+                             ham_count - fold_ham_count, spam_count - fold_spam_count)
+
+    bc_matrix = BinaryConfusionMatrix(SPAM_TAG, HAM_TAG)
+    bc_matrix.update_many(
+        (corpus.get_class(corpus.filenames[i]) for i in fold_indices),
+        (spam_filter._classify_tokens(corpus.tokens[i]) for i in fold_indices))
+    return bc_matrix
+
+
+def cross_validate(corpus, k=5, max_tokens=2500, max_workers=None, seed=0):
+    """
+    Run k-fold cross-validation of MyFilter.
+    :param corpus: Path to a training corpus directory or a TokenizedCorpus.
+    :param k: Number of folds.
+    :param max_tokens: The `max_tokens` parameter of the evaluated MyFilter.
+    :param max_workers: Number of worker processes, 1 evaluates in the current process.
+    :param seed: Seed of the fold assignment.
+    :return: Dictionary with the confusion matrix and quality score of every fold
+        under `folds`, and of all folds together under `aggregate`.
+    :raises ValueError: If k is below 2 or the training split of a fold lacks ham or
+        spam emails, i.e. the corpus is too small for k folds.
+    """
+    if not isinstance(corpus, TokenizedCorpus):
+        corpus = TokenizedCorpus.from_directory(corpus)
+    if k < 2:
+        raise ValueError(f"At least 2 folds are needed: {k}")
+
+    folds = assign_folds(corpus, k, seed)
+    global_counts = count_tokens(corpus, range(len(corpus)))
+
+    _, _, ham_count, spam_count = global_counts
+    for i, fold in enumerate(folds):
+        fold_spam_count = sum(1 for j in fold if corpus.is_spam(corpus.filenames[j]))
+        fold_ham_count = sum(1 for j in fold if corpus.is_ham(corpus.filenames[j]))
+        if ham_count == fold_ham_count or spam_count == fold_spam_count:
+            raise ValueError(f"Training split of fold {i} has {ham_count - fold_ham_count} ham and "
+                             f"{spam_count - fold_spam_count} spam emails, both classes are needed")
+
+    if max_workers == 1:
+        _init_worker(corpus, global_counts, max_tokens)
+        matrices = [_evaluate_fold(fold) for fold in folds]
+    else:
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                 initargs=(corpus, global_counts, max_tokens)) as executor:
+            matrices = list(executor.map(_evaluate_fold, folds))
+
+    total = BinaryConfusionMatrix(SPAM_TAG, HAM_TAG)
+    fold_results = []
+    for i, bc_matrix in enumerate(matrices):
+        total.merge(bc_matrix)
+        fold_results.append({
+            "fold": i,
+            "emails": len(folds[i]),
+            "confusion_matrix": bc_matrix.as_dict(),
+            "quality": quality_score(**bc_matrix.as_dict()),
+        })
+
+    return {
+        "folds": fold_results,
+        "aggregate": {
+            "confusion_matrix": total.as_dict(),
+            "quality": quality_score(**total.as_dict()),
+            "mean_fold_quality": sum(r["quality"] for r in fold_results) / k,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="k-fold cross-validation of MyFilter.")
+    parser.add_argument("corpus_dir")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=2500)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = cross_validate(args.corpus_dir, args.folds, args.max_tokens, args.workers, args.seed)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import cProfile
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class StageStats:
+    """
+    Accumulated wall and CPU time of one processing stage.
+
+    :ivar calls: Number of measured calls.
+    :ivar wall: Total wall-clock time in seconds.
+    :ivar cpu: Total CPU time of the process in seconds.
+    """
+    __slots__ = ("calls", "wall", "cpu")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def as_dict(self):
+        return {"calls": self.calls, "wall_s": self.wall, "cpu_s": self.cpu}
+
+
+class RunStats:
+    """
+    Collects timings and counters of filter runs.
+
+    An instance is passed to a filter (and through it to its corpora). The filter
+    records per-stage wall and CPU time, per-email latencies, bytes read, token counts
+    and out-of-vocabulary tokens. Filters without a stats object skip all of this,
+    so instrumentation costs nothing when it is disabled.
+
+    :ivar stages: Dictionary of stage names and their `StageStats`.
+    :ivar latency_histogram: Counter of per-email latencies bucketed by powers of two,
+        keyed by the bucket upper bound in microseconds.
+    :ivar emails: Number of processed emails.
+    :ivar bytes_read: Number of bytes read from email files.
+    :ivar tokens: Number of produced tokens.
+    :ivar oov_tokens: Number of tokens not present in the model vocabulary.
+    :ivar vocabulary_tokens_checked: Number of tokens checked against a model vocabulary,
+        the denominator of `oov_ratio`. Training tokens are not checked.
+    :ivar profile_path: If set, top-level runs are profiled by cProfile and the
+        statistics are dumped to this path.
+    """
+
+    def __init__(self, profile_path=None):
+        """
+        :param profile_path: Optional path of the cProfile dump.
+        """
+        self.stages = dict()
+        self.latency_histogram = Counter()
+        self.emails = 0
+        self.bytes_read = 0
+        self.tokens = 0
+        self.oov_tokens = 0
+        self.vocabulary_tokens_checked = 0
+        self.profile_path = profile_path
+        self._profiler = None
+        self._email_clock = time.perf_counter()
+
+    def add_stage_time(self, name, wall, cpu):
+        """
+        Add a measured time to a stage.
+        :param name: Stage name.
+        :param wall: Wall-clock time in seconds.
+        :param cpu: CPU time in seconds.
+        """
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageStats()
+        stage.calls += 1
+        stage.wall += wall
+        stage.cpu += cpu
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager measuring the wall and CPU time of the enclosed block.
+        :param name: Stage name.
+        """
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    @contextmanager
+    def run(self, name):
+        """
+        Context manager for a top-level run such as `train` or `test`.
+
+        Measures the run as a stage, restarts the per-email latency clock and
+        profiles the run when `profile_path` is set.
+        :param name: Run name.
+        """
+        if self.profile_path is not None and self._profiler is None:
+            self._profiler = cProfile.Profile()
+
+        self._email_clock = time.perf_counter()
+        if self._profiler is not None:
+            self._profiler.enable()
+        try:
+            with self.stage(name):
+                yield
+        finally:
+            if self._profiler is not None:
+                self._profiler.disable()
+                self._profiler.dump_stats(self.profile_path)
+
+    def record_email(self):
+        """
+        Record one processed email. Its latency is the time elapsed since the previous
+        email (or since the start of the run).
+        """
+        now = time.perf_counter()
+        latency_us = int(1e6 * (now - self._email_clock))
+        self._email_clock = now
+        self.emails += 1
+        self.latency_histogram[1 << latency_us.bit_length()] += 1
+
+    def record_bytes(self, n_bytes):
+        """
+        Record bytes read from an email file.
+        :param n_bytes: Number of bytes.
+        """
+        self.bytes_read += n_bytes
+
+    def record_tokens(self, tokens, vocabulary=None):
+        """
+        Record the tokens of one email.
+        :param tokens: List of tokens.
+        :param vocabulary: Model vocabulary, if given, out-of-vocabulary tokens are counted.
+        """
+        self.tokens += len(tokens)
+        if vocabulary is not None:
+            self.vocabulary_tokens_checked += len(tokens)
+            self.oov_tokens += sum(1 for token in tokens if token not in vocabulary)
+
+    def record_ids(self, ids, oov_tokens):
+        """
+        Record the tokens of one email scored through vocabulary token ids, counted as
+        `record_tokens` counts them against the vocabulary.
+        :param ids: List of token ids.
+        :param oov_tokens: Number of tokens of the email outside the vocabulary.
+        """
+        n_tokens = len(ids) + oov_tokens
+        self.tokens += n_tokens
+        self.vocabulary_tokens_checked += n_tokens
+        self.oov_tokens += oov_tokens
+
+    @property
+    def oov_ratio(self):
+        """
+        Fraction of tokens checked against a vocabulary that were not in it.
+        """
+        if not self.vocabulary_tokens_checked:
+            return 0.0
+        return self.oov_tokens / self.vocabulary_tokens_checked
+
+    def as_dict(self):
+        """
+        Return all statistics as a JSON-serializable dictionary.
+        """
+        return {
+            "stages": {name: stage.as_dict() for name, stage in self.stages.items()},
+            "emails": self.emails,
+            "bytes_read": self.bytes_read,
+            "tokens": self.tokens,
+            "oov_tokens": self.oov_tokens,
+            "vocabulary_tokens_checked": self.vocabulary_tokens_checked,
+            "oov_ratio": self.oov_ratio,
+            "latency_histogram_us": {str(bound): count for bound, count in sorted(self.latency_histogram.items())},
+        }
+
+    def write_report(self, path):
+        """
+        Write the statistics as a JSON report.
+        :param path: Path of the report file.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, indent=2)
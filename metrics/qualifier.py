@@ -1,7 +1,13 @@
 import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
 from config.paths import jpath, PREDICTION_FILENAME
-from quality import compute_quality_for_corpus
+from dataio.tokenized import TokenizedCorpus
+from metrics.quality import compute_quality_for_corpus, compute_quality_for_predictions
+
+# Tokenized corpora shared by the evaluation worker processes, set by `_init_worker`
+_shared_corpora = None
 
 
 def get_class_name(obj):
@@ -57,3 +63,61 @@ def compute_quality_for_filters(train_dir, test_dir, filters):
         quality_dict[filter_name] = compute_quality_for_filter_with_training(train_dir, test_dir, fr)
 
     return quality_dict
+
+
+def _init_worker(train_corpus, test_corpus):
+    """
+    Store the tokenized corpora in a worker process, so they are sent once per worker
+    instead of once per filter.
+    """
+    global _shared_corpora
+    _shared_corpora = (train_corpus, test_corpus)
+
+
+def _evaluate_tokenized(filter_instance):
+    """
+    Train and test a filter on the shared tokenized corpora of the current process.
+    :param filter_instance: Instance of a filter supporting tokenized corpora.
+    :return: Quality score computed for the test corpus.
+    """
+    train_corpus, test_corpus = _shared_corpora
+    filter_instance.train_tokenized(train_corpus)
+    predictions = filter_instance.predict_tokenized(test_corpus)
+    return compute_quality_for_predictions(test_corpus.truth(), predictions)
+
+
+def compute_quality_for_filters_shared(train_dir, test_dir, filters, max_workers=None):
+    """
+    Compute quality scores for multiple filters with a single tokenization pass.
+
+    Both corpora are read, extracted and tokenized once, then every filter is
+    trained and tested on the shared token lists in a pool of worker processes.
+    Predictions stay in memory, so nothing is written to the test directory.
+    Filters must implement `train_tokenized` and `predict_tokenized`.
+
+    :param train_dir: Path to the training emails directory.
+    :param test_dir: Path to the testing emails directory (with `!truth.txt`).
+    :param filters: List of filter instances to evaluate.
+    :param max_workers: Number of worker processes, 1 evaluates in the current process.
+    :return: Dictionary with filter names and their quality score. Repeated class
+        names get a numeric suffix (`MyFilter`, `MyFilter_2`, ...).
+    """
+    train_corpus = TokenizedCorpus.from_directory(train_dir)
+    test_corpus = TokenizedCorpus.from_directory(test_dir)
+
+    names = []
+    name_counts = Counter()
+    for fr in filters:
+        name = get_class_name(fr)
+        name_counts[name] += 1
+        names.append(name if name_counts[name] == 1 else f"{name}_{name_counts[name]}")
+
+    if max_workers == 1:
+        _init_worker(train_corpus, test_corpus)
+        scores = [_evaluate_tokenized(fr) for fr in filters]
+    else:
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                 initargs=(train_corpus, test_corpus)) as executor:
+            scores = list(executor.map(_evaluate_tokenized, filters))
+
+    return dict(zip(names, scores))
@@ -1,5 +1,5 @@
 from config.labels import SPAM_TAG, HAM_TAG
-from utils import read_classification_from_file
+from dataio.labelfile import read_classification
 from metrics.confmat import BinaryConfusionMatrix
 from config.paths import jpath, TRUTH_FILENAME, PREDICTION_FILENAME
 
@@ -21,19 +21,62 @@ def compute_quality_for_corpus(corpus_dir):
     """
     Compute the quality score for a given email corpus directory.
     :param corpus_dir: Path to the corpus directory containing the truth and prediction files.
+        Either file may be in the text or the binary label format.
     :return: Quality score for the corpus.
     """
     # Load truth and prediction labels
-    truth_dict = read_classification_from_file(
+    truth_dict = read_classification(
         jpath(corpus_dir, TRUTH_FILENAME)
     )
-    prediction_dict = read_classification_from_file(
+    prediction_dict = read_classification(
         jpath(corpus_dir, PREDICTION_FILENAME)
     )
 
+    return compute_quality_for_predictions(truth_dict, prediction_dict)
+
+
+def compute_quality_for_predictions(truth_dict, prediction_dict):
+    """
+    Compute the quality score of in-memory predictions.
+    :param truth_dict: Dictionary with email names and true labels.
+    :param prediction_dict: Dictionary with email names and predicted labels.
+        Predictions of emails without a true label are ignored.
+    :return: Quality score of the predictions.
+    """
     # Create and compute binary confusion matrix
     bc_matrix = BinaryConfusionMatrix(SPAM_TAG, HAM_TAG)
     bc_matrix.compute_from_dicts(truth_dict, prediction_dict)
 
     # Compute and return quality score
     return quality_score(**bc_matrix.as_dict())
+
+
+def compute_quality_for_stream(truth_dict, prediction_pairs):
+    """
+    Compute the quality score from a stream of predictions, without a prediction file.
+    :param truth_dict: Dictionary with email names and true labels.
+    :param prediction_pairs: Iterable of `(email_name, prediction)` tuples, e.g. the
+        output of a filter's `iter_predictions`. Predictions of emails without a
+        true label are ignored, as by `compute_quality_for_predictions`.
+    :return: Quality score of the predictions.
+
+    :raises KeyError: If an email is predicted more than once, or if an email with
+        a true label was not predicted.
+    """
+    predicted = set()
+
+    def unique_pairs():
+        for email_name, prediction in prediction_pairs:
+            if email_name in predicted:
+                raise KeyError(f"Duplicate prediction for email: {email_name}")
+            predicted.add(email_name)
+            if email_name in truth_dict:
+                yield email_name, prediction
+
+    bc_matrix = BinaryConfusionMatrix(SPAM_TAG, HAM_TAG)
+    bc_matrix.update_from_stream(unique_pairs(), truth_dict)
+    missing = truth_dict.keys() - predicted
+    if missing:
+        raise KeyError(f"Missing prediction for email: {min(missing)}")
+
+    return quality_score(**bc_matrix.as_dict())
@@ -0,0 +1,125 @@
+"""
+Decision threshold tuning of MyFilter for `quality_score`.
+
+Usage:
+    python -m metrics.threshold HELDOUT_DIR --output PATH [--model PATH] [--train TRAIN_DIR]
+
+Every held-out email is scored once with the spam log-odds of the model. The
+scores are sorted, and all candidate thresholds are evaluated in one cumulative
+pass over the sorted scores, so the sweep is O(n log n) instead of re-testing the
+corpus once per threshold. The best threshold is stored in a copy of the model
+saved to `--output`, so the input model is never overwritten.
+"""
+import argparse
+import json
+import math
+
+from filter import MyFilter
+from config.labels import SPAM_TAG, HAM_TAG
+from dataio.tokenized import TokenizedCorpus
+from metrics.confmat import BinaryConfusionMatrix
+from metrics.quality import quality_score
+
+
+def sweep_thresholds(scores, truths, curve=False):
+    """
+    Find the threshold on spam scores that maximizes `quality_score`.
+
+    Emails scoring at or above the threshold are classified as spam. Candidate
+    thresholds lie halfway between neighbouring distinct scores, plus -inf and +inf
+    for the all-spam and all-ham classifications. Among equally good thresholds the
+    one closest to zero, the default of the model, is chosen.
+
+    :param scores: Iterable of spam scores.
+    :param truths: Iterable of true labels, parallel to `scores`.
+    :param curve: If True, the result also contains the evaluated candidates.
+    :return: Dictionary with the best `threshold`, its `quality` and `confusion_matrix`,
+        and the `curve` as a list of `(threshold, quality)` tuples if requested.
+    :raises ValueError: If there are no scores.
+    """
+    pairs = sorted(zip(scores, truths), key=lambda pair: pair[0])
+    if not pairs:
+        raise ValueError("No scores to sweep")
+
+    # Start with every email predicted as spam, i.e. threshold -inf
+    counts = {"tp": 0, "tn": 0, "fp": 0, "fn": 0}
+    for _, truth in pairs:
+        counts["tp" if truth == SPAM_TAG else "fp"] += 1
+
+    threshold = -math.inf
+    best = None
+    candidates = []
+    i = 0
+
+    while True:
+        quality = quality_score(**counts)
+        candidates.append((threshold, quality))
+        if best is None or quality > best[1] or (quality == best[1] and abs(threshold) < abs(best[0])):
+            best = (threshold, quality, dict(counts))
+
+        if i == len(pairs):
+            break
+
+        # Move all emails with the next distinct score from spam to ham predictions
+        score = pairs[i][0]
+        while i < len(pairs) and pairs[i][0] == score:
+            if pairs[i][1] == SPAM_TAG:
+                counts["tp"] -= 1
+                counts["fn"] += 1
+            else:
+                counts["fp"] -= 1
+                counts["tn"] += 1
+            i += 1
+
+        threshold = (score + pairs[i][0]) / 2 if i < len(pairs) else math.inf
+
+    result = {"threshold": best[0], "quality": best[1], "confusion_matrix": best[2]}
+    if curve:
+        result["curve"] = candidates
+    return result
+
+
+def tune_threshold(spam_filter, heldout):
+    """
+    Score a held-out corpus with a trained filter, and store the threshold with the
+    best quality score in its model.
+    :param spam_filter: MyFilter with a trained or loaded model.
+    :param heldout: Path to a held-out corpus directory (with `!truth.txt`) or a TokenizedCorpus.
+    :return: Result of `sweep_thresholds`, with the `default_quality` of threshold 0 added.
+    """
+    if not isinstance(heldout, TokenizedCorpus):
+        heldout = TokenizedCorpus.from_directory(heldout)
+
+    scores = spam_filter.score_tokenized(heldout)
+    truths = [heldout.get_class(filename) for filename in heldout.filenames]
+    result = sweep_thresholds((scores[filename] for filename in heldout.filenames), truths)
+
+    bc_matrix = BinaryConfusionMatrix(SPAM_TAG, HAM_TAG)
+    bc_matrix.update_many(truths, (SPAM_TAG if scores[filename] >= 0 else HAM_TAG
+                                   for filename in heldout.filenames))
+    result["default_quality"] = quality_score(**bc_matrix.as_dict())
+    spam_filter.set_threshold(result["threshold"])
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune the decision threshold of MyFilter.")
+    parser.add_argument("heldout_dir")
+    parser.add_argument("--model", default=MyFilter.MODEL_PATH, help="model to tune")
+    parser.add_argument("--train", default=None, help="train a new model on this corpus first")
+    parser.add_argument("--output", required=True, help="where to save the tuned model")
+    args = parser.parse_args(argv)
+
+    spam_filter = MyFilter()
+    if args.train is not None:
+        spam_filter.train_tokenized(TokenizedCorpus.from_directory(args.train))
+    else:
+        spam_filter.load_model(args.model)
+
+    result = tune_threshold(spam_filter, args.heldout_dir)
+    spam_filter.save_model(args.output)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
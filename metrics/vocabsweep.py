@@ -0,0 +1,112 @@
+"""
+One-pass sweep of the vocabulary size (`MyFilter.max_tokens`).
+
+Usage:
+    python -m metrics.vocabsweep TRAIN_DIR TEST_DIR [--sizes 100 250 500 ...]
+
+Both corpora are tokenized and the training tokens counted once. Tokens of each
+class are ranked once; the vocabulary of every size is the union of the top-K
+prefixes of the two rankings, grown incrementally from the smallest size. Every
+model is scored on the cached held-out tokens.
+"""
+import argparse
+import json
+import pickle
+import time
+
+from filter import MyFilter
+from config.labels import SPAM_TAG, HAM_TAG
+from dataio.tokenized import TokenizedCorpus
+from metrics.confmat import BinaryConfusionMatrix
+from metrics.crossval import count_tokens
+from metrics.quality import quality_score
+
+DEFAULT_SIZES = (50, 100, 250, 500, 1000, 1500, 2000, 2500, 3000, 4000, 5000)
+
+
+def nested_vocabularies(ham_counter, spam_counter, sizes):
+    """
+    Generate the vocabularies of several sizes from nested top-K prefixes.
+
+    The result for size K equals the vocabulary `MyFilter._build_model` selects
+    with `max_tokens=K`.
+
+    :param ham_counter: Counter of token frequencies in ham emails.
+    :param spam_counter: Counter of token frequencies in spam emails.
+    :param sizes: Iterable of vocabulary sizes (`max_tokens` values).
+    :return: Generator of `(size, vocabulary)` tuples in ascending order of size. The
+        vocabulary set is shared and grows between steps, copy it to keep it.
+    """
+    ham_ranked = MyFilter._ranked_tokens(ham_counter)
+    spam_ranked = MyFilter._ranked_tokens(spam_counter)
+    vocabulary = set()
+    previous = 0
+
+    for size in sorted(set(sizes)):
+        vocabulary.update(ham_ranked[previous:size])
+        vocabulary.update(spam_ranked[previous:size])
+        previous = size
+        yield size, vocabulary
+
+
+def sweep_vocabulary_sizes(train, test, sizes=DEFAULT_SIZES):
+    """
+    Evaluate MyFilter for many vocabulary sizes with a single tokenization pass.
+    :param train: Path to a training corpus directory or a TokenizedCorpus.
+    :param test: Path to a held-out corpus directory (with `!truth.txt`) or a TokenizedCorpus.
+    :param sizes: Iterable of `max_tokens` values to evaluate.
+    :return: List of dictionaries, one per size, with the vocabulary size, pickled model
+        size, scoring time of the held-out set, confusion matrix and quality score.
+    """
+    if not isinstance(train, TokenizedCorpus):
+        train = TokenizedCorpus.from_directory(train)
+    if not isinstance(test, TokenizedCorpus):
+        test = TokenizedCorpus.from_directory(test)
+
+    ham_counter, spam_counter, ham_count, spam_count = count_tokens(train, range(len(train)))
+    truths = [test.get_class(filename) for filename in test.filenames]
+    results = []
+
+    for size, vocabulary in nested_vocabularies(ham_counter, spam_counter, sizes):
+        spam_filter = MyFilter(max_tokens=size)
+        spam_filter._build_model(ham_counter, spam_counter, ham_count, spam_count, set(vocabulary))
+
+        start = time.perf_counter()
+        predictions = [spam_filter._classify_tokens(tokens) for tokens in test.tokens]
+        scoring_time = time.perf_counter() - start
+
+        bc_matrix = BinaryConfusionMatrix(SPAM_TAG, HAM_TAG)
+        bc_matrix.update_many(truths, predictions)
+        results.append({
+            "max_tokens": size,
+            "vocabulary_size": len(vocabulary),
+            "model_bytes": len(pickle.dumps(spam_filter.model)),
+            "scoring_time_s": scoring_time,
+            "confusion_matrix": bc_matrix.as_dict(),
+            "quality": quality_score(**bc_matrix.as_dict()),
+        })
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep the vocabulary size of MyFilter.")
+    parser.add_argument("train_dir")
+    parser.add_argument("test_dir")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = sweep_vocabulary_sizes(args.train_dir, args.test_dir, args.sizes)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'max_tokens':>10} {'vocabulary':>10} {'model_kB':>9} {'score_ms':>9} {'quality':>8}")
+    for r in results:
+        print(f"{r['max_tokens']:>10} {r['vocabulary_size']:>10} {r['model_bytes'] / 1024:>9.1f}"
+              f" {1000 * r['scoring_time_s']:>9.1f} {r['quality']:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
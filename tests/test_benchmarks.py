@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the regression checks of the benchmark suite."""
+
+import unittest
+
+from benchmarks.suite import summarize, compare_results
+
+THRESHOLDS = {'default': 0.2, 'stages': {'read': 0.5}}
+
+
+def results_with(**mean_us):
+    """Create minimal benchmark results with the given mean latencies per stage."""
+    stages = {stage: {'mean_us': value} for stage, value in mean_us.items()}
+    return {'corpora': {'data/1': {'stages': stages}}}
+
+
+class SummarizeTest(unittest.TestCase):
+
+    def test_summarize_computesThroughputAndPercentiles(self):
+        summary = summarize([0.001] * 99 + [0.1])
+        self.assertEqual(summary['count'], 100)
+        self.assertAlmostEqual(summary['p50_us'], 1000.0)
+        self.assertAlmostEqual(summary['p99_us'], 1000.0)
+        self.assertAlmostEqual(summary['throughput_per_s'], 100 / 0.199)
+
+    def test_summarize_noSamples_isZero(self):
+        summary = summarize([])
+        self.assertEqual(summary['count'], 0)
+        self.assertEqual(summary['throughput_per_s'], 0.0)
+        self.assertEqual((summary['mean_us'], summary['p50_us'], summary['p99_us']), (0.0, 0.0, 0.0))
+
+
+class CompareResultsTest(unittest.TestCase):
+
+    def test_noRegression_withinThreshold(self):
+        baseline = results_with(tokenize=100.0, read=10.0)
+        current = results_with(tokenize=115.0, read=14.0)
+        self.assertEqual(compare_results(current, baseline, THRESHOLDS), [])
+
+    def test_regression_reportedPerStage(self):
+        baseline = results_with(tokenize=100.0, read=10.0)
+        current = results_with(tokenize=130.0, read=16.0)
+        regressions = compare_results(current, baseline, THRESHOLDS)
+        self.assertEqual([(c, s) for c, s, _, _ in regressions],
+                         [('data/1', 'tokenize'), ('data/1', 'read')])
+
+    def test_unknownCorpusAndStage_areIgnored(self):
+        baseline = results_with(tokenize=100.0)
+        current = results_with(tokenize=100.0, score=500.0)
+        self.assertEqual(compare_results(current, baseline, THRESHOLDS), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the header-first cascade filter."""
+
+import math
+import os
+import shutil
+import unittest
+
+from config.labels import SPAM_TAG, HAM_TAG
+from dataio.corpus import Corpus
+from dataio.synthetic import SyntheticCorpusGenerator
+from filters.cascade import CascadeFilter
+from utils import read_classification_from_file
+
+CORPUS_DIR = 'corpus_for_testing_delete_me'
+PREDICTION_FILENAME = '!prediction.txt'
+
+
+class CascadeFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        SyntheticCorpusGenerator(seed=4, pathological_rate=0).write_corpus(CORPUS_DIR, 40)
+        self.filter = CascadeFilter()
+        self.filter.train(CORPUS_DIR)
+        self.emails = list(Corpus(CORPUS_DIR).emails())
+
+    def tearDown(self):
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+
+    def test_headerTokens_joinFoldedLinesAndSkipBody(self):
+        raw_email = ('Subject: cheap\n watches\nX-Other: ignored\nFrom: Shop shop@example.com\n'
+                     '\nSubject: body text\n')
+        self.assertEqual(self.filter.header_tokens(raw_email),
+                         ['subject:cheap', 'subject:watch', 'from:shop', 'from:emailaddr'])
+
+    def test_headerTokens_crlfLineEndings_sameAsLf(self):
+        raw_email = ('Subject: cheap\n watches\nX-Other: ignored\nFrom: Shop shop@example.com\n'
+                     '\nSubject: body text\n')
+        crlf_email = raw_email.replace('\n', '\r\n')
+        expected = self.filter.header_tokens(raw_email)
+        self.assertEqual(self.filter._header_values(crlf_email), self.filter._header_values(raw_email))
+        self.assertEqual(self.filter.header_tokens(crlf_email), expected)
+        self.assertEqual(self.filter.header_tokens(crlf_email.encode('utf-8')), expected)
+        self.assertEqual(self.filter.header_score(crlf_email), self.filter.header_score(raw_email))
+
+    def test_headerScore_equalsScoringHeaderTokens(self):
+        for _, raw_email in self.emails:
+            tokens = self.filter.header_tokens(raw_email)
+            self.assertEqual(self.filter.header_score(raw_email),
+                             self.filter.header_filter._score_tokens(tokens))
+
+    def test_test_writesPredictionsAndReport(self):
+        self.filter.test(CORPUS_DIR)
+        predictions = read_classification_from_file(os.path.join(CORPUS_DIR, PREDICTION_FILENAME))
+        self.assertEqual(set(predictions), {filename for filename, _ in self.emails})
+        self.assertEqual(self.filter.report['emails'], len(self.emails))
+        self.assertTrue(0 <= self.filter.report['early_exit_fraction'] <= 1)
+
+    def test_infiniteBand_usesBodyModel(self):
+        self.filter.band = (-math.inf, math.inf)
+        for _, raw_email in self.emails:
+            self.assertEqual(self.filter._classify(raw_email),
+                             (self.filter.body_filter.classify(raw_email), False))
+
+    def test_emptyBand_usesHeaderModel(self):
+        self.filter.band = (0.0, 0.0)
+        for _, raw_email in self.emails:
+            label, early_exit = self.filter._classify(raw_email)
+            self.assertTrue(early_exit)
+            self.assertEqual(label, SPAM_TAG if self.filter.header_score(raw_email) >= 0 else HAM_TAG)
+
+    def test_untrained_raisesRuntimeError(self):
+        with self.assertRaises(RuntimeError):
+            CascadeFilter().classify(self.emails[0][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
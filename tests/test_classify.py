@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the single-message classify API of MyFilter."""
+
+import os
+import shutil
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from config.labels import SPAM_TAG, HAM_TAG
+from dataio.synthetic import SyntheticCorpusGenerator
+from utils import read_classification_from_file, read_scores_from_file
+
+CORPUS_DIR = 'corpus_for_testing_delete_me'
+PREDICTION_FILENAME = '!prediction.txt'
+SCORES_FILENAME = '!scores.txt'
+
+
+class ClassifyTest(unittest.TestCase):
+
+    def setUp(self):
+        from filter import MyFilter
+        SyntheticCorpusGenerator(seed=1, pathological_rate=0).write_corpus(CORPUS_DIR, 40)
+        self.filter = MyFilter(max_tokens=50)
+        self.filter.train(CORPUS_DIR)
+        self.emails = {}
+        for filename in os.listdir(CORPUS_DIR):
+            if not filename.startswith('!'):
+                with open(os.path.join(CORPUS_DIR, filename), 'rb') as f:
+                    self.emails[filename] = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+
+    def test_classify_matchesTest(self):
+        self.filter.test(CORPUS_DIR)
+        predictions = read_classification_from_file(os.path.join(CORPUS_DIR, PREDICTION_FILENAME))
+        for filename, raw_email in self.emails.items():
+            self.assertEqual(self.filter.classify(raw_email), predictions[filename])
+
+    def test_score_acceptsBytesAndStr(self):
+        for raw_email in self.emails.values():
+            try:
+                text = raw_email.decode('utf-8')
+            except UnicodeDecodeError:
+                continue  # 8-bit mail in a national charset has no UTF-8 text form
+            self.assertEqual(self.filter.score(raw_email), self.filter.score(text))
+
+    def test_classify_doesNotTouchTestState(self):
+        self.filter.classify(next(iter(self.emails.values())))
+        self.assertEqual(self.filter._predictions, {})
+        self.assertIsNone(self.filter._corpus)
+
+    def test_classify_concurrentCalls_matchSequentialCalls(self):
+        expected = {filename: self.filter.score(raw_email) for filename, raw_email in self.emails.items()}
+        items = list(self.emails.items()) * 10
+        with ThreadPoolExecutor(8) as executor:
+            scores = list(executor.map(lambda item: (item[0], self.filter.score(item[1])), items))
+        for filename, score in scores:
+            self.assertEqual(score, expected[filename])
+
+    def test_classify_followsThreshold(self):
+        raw_email = next(iter(self.emails.values()))
+        score = self.filter.score(raw_email)
+        self.filter.set_threshold(score)
+        self.assertEqual(self.filter.classify(raw_email), SPAM_TAG)
+        self.filter.set_threshold(score + 1)
+        self.assertEqual(self.filter.classify(raw_email), HAM_TAG)
+
+    def test_test_scoresEqualWithAndWithoutStringTokens(self):
+        from metrics.instrumentation import RunStats
+        self.filter.test(CORPUS_DIR, write_scores=True)
+        id_scores = read_scores_from_file(os.path.join(CORPUS_DIR, SCORES_FILENAME))
+        self.filter.stats = RunStats()
+        self.filter.test(CORPUS_DIR, write_scores=True)
+        self.assertEqual(id_scores, read_scores_from_file(os.path.join(CORPUS_DIR, SCORES_FILENAME)))
+
+    def test_learnOne_updatesBoundWeights(self):
+        raw_email = next(iter(self.emails.values()))
+        before = self.filter.score(raw_email)
+        self.filter.learn_one(raw_email, SPAM_TAG)
+        _, tokens = next(self.filter._tokenize_emails([(None, raw_email)]))
+        self.assertEqual(self.filter.score(raw_email), self.filter._score_tokens(tokens))
+        self.assertGreater(self.filter.score(raw_email), before)
+
+    def test_classify_withoutModel_raisesRuntimeError(self):
+        from filter import MyFilter
+        with self.assertRaises(RuntimeError):
+            MyFilter().classify(b'Subject: hi\n\nhello')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -79,6 +79,44 @@ class BinaryConfusionMatrixTest(unittest.TestCase):
         # Assert
         self.assertDictEqual(self.cm.as_dict(), {"tp": 1, "tn": 1, "fp": 1, "fn": 1})
 
+    def test_updateMany_countsParallelLabels(self):
+        # Exercise the SUT
+        self.cm.update_many([SPAM_TAG, SPAM_TAG, HAM_TAG, HAM_TAG, HAM_TAG],
+                            [SPAM_TAG, HAM_TAG, SPAM_TAG, HAM_TAG, HAM_TAG])
+        # Assert
+        self.assertDictEqual(self.cm.as_dict(), {"tp": 1, "tn": 2, "fp": 1, "fn": 1})
+
+    def test_updateMany_raisesValueError_andKeepsCounts_forWrongValue(self):
+        # Assert and exercise the SUT
+        with self.assertRaises(ValueError):
+            self.cm.update_many([SPAM_TAG, SPAM_TAG], [SPAM_TAG, "a bad value"])
+        self.assertDictEqual(self.cm.as_dict(), {"tp": 0, "tn": 0, "fp": 0, "fn": 0})
+
+    def test_updateFromStream_looksUpTruth(self):
+        # Prepare fixture
+        truth = {1: SPAM_TAG, 2: SPAM_TAG, 3: HAM_TAG, 4: HAM_TAG}
+        stream = iter([(4, HAM_TAG), (2, HAM_TAG), (1, SPAM_TAG), (3, SPAM_TAG)])
+        # Excercise the SUT
+        n = self.cm.update_from_stream(stream, truth)
+        # Assert
+        self.assertEqual(n, 4)
+        self.assertDictEqual(self.cm.as_dict(), {"tp": 1, "tn": 1, "fp": 1, "fn": 1})
+
+    def test_updateFromStream_raisesKeyError_forUnknownEmail(self):
+        with self.assertRaises(KeyError):
+            self.cm.update_from_stream([(5, SPAM_TAG)], {1: SPAM_TAG})
+
+    def test_merge_addsCountsOfPartialMatrices(self):
+        # Prepare fixture
+        other = BinaryConfusionMatrix(pos_tag=INI_SPAM_TAG, neg_tag=INI_HAM_TAG)
+        self.cm.update(SPAM_TAG, SPAM_TAG)
+        other.update(SPAM_TAG, SPAM_TAG)
+        other.update(HAM_TAG, SPAM_TAG)
+        # Excercise the SUT
+        self.cm.merge(other)
+        # Assert
+        self.assertDictEqual(self.cm.as_dict(), {"tp": 2, "tn": 0, "fp": 1, "fn": 0})
+
 
 if __name__ == "__main__":
     unittest.main()
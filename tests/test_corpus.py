@@ -6,22 +6,21 @@ import os
 import shutil
 import unittest
 import random
-from datetime import datetime
+from unittest import mock
 from tests.test_readClassificationFromFile import (
     random_filename, 
     random_string,
     replaced_open)
 
-from dataio.corpus import Corpus
+from dataio.corpus import Corpus, EmailHandle
+from dataio.synthetic import FNAMECHARS, SyntheticCorpusGenerator
 
 SPECIAL_FILENAME = '!special.txt'
 CORPUS_DIR = 'testing_corpus_delete_me'
 N_EMAILS = 20
-LCCHARS = 'abcdefghijklmnopqrstuvwxyz'
-FNAMECHARS = LCCHARS+'0123456789'
 FCONTENTSCHARS = FNAMECHARS + ' \nříšžžčýůňúěďáéó'
-# Dates from 2002-05-30 to 2010-08-16 will be used
-DATETIME_ORDINAL_RANGE = (731000, 734000)
+# Fake addresses and dates are shared with the synthetic corpora
+FAKE_EMAILS = SyntheticCorpusGenerator(seed=random.getrandbits(32))
 
 
 class TestCorpus(unittest.TestCase):
@@ -66,17 +65,55 @@ class TestCorpus(unittest.TestCase):
                          'The read file contents are not equal to the expected contents.')
 
 
-def random_email_address(namelength=5, domain2length=7, domain1length=3):
-    return random_string(namelength, LCCHARS) + \
-           '@' + \
-           random_string(domain2length, LCCHARS) + \
-           '.' + \
-           random_string(domain1length, LCCHARS)
+class TestEmailHandle(unittest.TestCase):
 
+    def setUp(self):
+        self.expected = create_corpus_dictionary(N_EMAILS)
+        create_corpus_dir_from_dictionary(self.expected)
+
+    def tearDown(self):
+        delete_corpus_directory()
+
+    def test_handles_nothingReadUntilAsked(self):
+        with mock.patch('builtins.open', side_effect=AssertionError('file opened')):
+            filenames = {h.filename for h in Corpus(CORPUS_DIR).handles()}
+        self.assertEqual(filenames, set(self.expected))
+
+    def test_readAll_equalsEmailsContents(self):
+        with replaced_open():
+            observed = {h.filename: h.read_all() for h in Corpus(CORPUS_DIR).handles()}
+        self.assertEqual(observed, self.expected)
+
+    def test_readAndSize_rawBytes(self):
+        for handle in Corpus(CORPUS_DIR).handles():
+            raw = self.expected[handle.filename].encode('utf-8')
+            self.assertEqual(handle.size, len(raw))
+            self.assertEqual(handle.read(10), raw[:10])
+            self.assertEqual(handle.read(), raw)
+
+    def test_readAll_notUtf8_rawBytes(self):
+        contents = 'Subject: kůň\n\nžluťoučký\n'.encode('iso-8859-2')
+        with open(os.path.join(CORPUS_DIR, 'latin2'), 'wb') as f:
+            f.write(contents)
+        with replaced_open():
+            self.assertEqual(EmailHandle(CORPUS_DIR, 'latin2').read_all(), contents)
+
+    def test_headers_parsesOnlyTheHeaderBlock(self):
+        for handle in Corpus(CORPUS_DIR).handles():
+            headers = handle.headers()
+            self.assertTrue(headers['From'])
+            self.assertEqual(headers.get_payload(), '')
+
+    def test_headers_largeFileIsMapped(self):
+        contents = 'Subject: big\r\nFrom: a@b.cz\r\n\r\n' + 'x' * (2 * EmailHandle.MMAP_THRESHOLD)
+        save_file_to_corpus_dir('big', contents)
+        headers = EmailHandle(CORPUS_DIR, 'big').headers()
+        self.assertEqual(headers['Subject'], 'big')
+        self.assertEqual(headers.get_payload(), '')
 
-def random_date(dtrange=DATETIME_ORDINAL_RANGE):
-    d = datetime.fromordinal(random.randint(dtrange[0], dtrange[1]))
-    return d.strftime('%a, %d %b %Y %H:%M:%S +0200')
+    def test_headers_noBody_wholeFileIsHeaders(self):
+        save_file_to_corpus_dir('headonly', 'Subject: only')
+        self.assertEqual(EmailHandle(CORPUS_DIR, 'headonly').headers()['Subject'], 'only')
 
 
 def create_corpus_dictionary(nitems=N_EMAILS):
@@ -92,9 +129,9 @@ def create_corpus_dictionary(nitems=N_EMAILS):
 # The following structure contains a triple for each header:
 # (header string, probability of generating this header, function used to generate the contents)
 GENERATED_EMAIL_HEADERS = [
-    ('Date: ', 1.0, random_date),
-    ('From: ', 1.0, random_email_address),
-    ('To: ', 0.5, random_email_address),
+    ('Date: ', 1.0, FAKE_EMAILS.random_date),
+    ('From: ', 1.0, FAKE_EMAILS.random_email_address),
+    ('To: ', 0.5, FAKE_EMAILS.random_email_address),
     ('Subject: ', 0.5, lambda: random_string(30, chars=FNAMECHARS+' '))
     ]
 
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the k-fold cross-validation engine."""
+
+import os
+import shutil
+import unittest
+
+from dataio.tokenized import TokenizedCorpus
+from metrics.crossval import assign_folds, count_tokens, cross_validate
+from tests.test_readClassificationFromFile import save_classification_to_file
+from tests.test_corpus import create_corpus_dictionary, create_corpus_dir_from_dictionary
+from tests.test_trainingcorpus import create_classification_for
+
+CORPUS_DIR = 'corpus_for_testing_delete_me'
+TRUTH_FILENAME = '!truth.txt'
+N_EMAILS = 30
+K = 3
+
+
+class CrossValidationTest(unittest.TestCase):
+
+    def setUp(self):
+        email_dict = create_corpus_dictionary(N_EMAILS)
+        create_corpus_dir_from_dictionary(email_dict, CORPUS_DIR)
+        save_classification_to_file(create_classification_for(email_dict.keys()),
+                                    os.path.join(CORPUS_DIR, TRUTH_FILENAME))
+        self.corpus = TokenizedCorpus.from_directory(CORPUS_DIR)
+
+    def tearDown(self):
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+
+    def test_assignFolds_partitionsAllEmails(self):
+        folds = assign_folds(self.corpus, K)
+        self.assertEqual(len(folds), K)
+        self.assertEqual(sorted(i for fold in folds for i in fold), list(range(N_EMAILS)))
+
+    def test_subtractedCounts_equalCountsOfRemainingFolds(self):
+        folds = assign_folds(self.corpus, K)
+        ham, spam, n_ham, n_spam = count_tokens(self.corpus, range(N_EMAILS))
+        fold_ham, fold_spam, fold_n_ham, fold_n_spam = count_tokens(self.corpus, folds[0])
+        rest = folds[1] + folds[2]
+        self.assertEqual(count_tokens(self.corpus, rest),
+                         (ham - fold_ham, spam - fold_spam, n_ham - fold_n_ham, n_spam - fold_n_spam))
+
+    def test_crossValidate_sameResult_inProcessAndParallel(self):
+        serial = cross_validate(self.corpus, K, max_workers=1)
+        parallel = cross_validate(self.corpus, K, max_workers=2)
+        self.assertEqual(serial, parallel)
+        total = sum(serial['aggregate']['confusion_matrix'].values())
+        self.assertEqual(total, N_EMAILS)
+        self.assertEqual(len(serial['folds']), K)
+
+    def test_crossValidate_singleSpam_raisesValueErrorNamingFold(self):
+        spams = [f for f in self.corpus.filenames if self.corpus.is_spam(f)]
+        keep = [i for i, f in enumerate(self.corpus.filenames) if f not in spams[1:]]
+        corpus = TokenizedCorpus([self.corpus.filenames[i] for i in keep], [self.corpus.tokens[i] for i in keep],
+                                 {self.corpus.filenames[i]: self.corpus.get_class(self.corpus.filenames[i])
+                                  for i in keep})
+        with self.assertRaisesRegex(ValueError, r'fold \d'):
+            cross_validate(corpus, K, max_workers=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for charset-aware body extraction."""
+
+import unittest
+
+from text.extractor import EmailBodyExtractor
+from text.tokenizer import EmailTokenizer
+
+HEADERS = 'From: a@example.com\nSubject: test\nContent-Type: text/plain; charset="{charset}"\n{extra}\n'
+
+
+def make_email(body, charset='utf-8', encoding=None):
+    extra = '' if encoding is None else f'Content-Transfer-Encoding: {encoding}\n'
+    return HEADERS.format(charset=charset, extra=extra) + body
+
+
+class EmailBodyExtractorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.extractor = EmailBodyExtractor()
+
+    def test_extract_returnsText(self):
+        self.assertEqual(self.extractor.extract(make_email('hello world\n')), 'hello world\n')
+
+    def test_extract_quotedPrintable_usesDeclaredCharset(self):
+        email = make_email('caf=E9 cr=E8me\n', charset='iso-8859-1', encoding='quoted-printable')
+        self.assertEqual(self.extractor.extract(email), 'café crème\n')
+
+    def test_extract_base64_usesDeclaredCharset(self):
+        email = make_email('4oKsIDEw\n', charset='utf-8', encoding='base64')
+        self.assertEqual(self.extractor.extract(email), '€ 10')
+
+    def test_extract_8bitBytes_usesDeclaredCharset(self):
+        email = make_email('', charset='windows-1252', encoding='8bit').encode('ascii') + b'\x80 price\n'
+        self.assertEqual(self.extractor.extract(email), '€ price\n')
+
+    def test_extract_string_isNotDecodedAgain(self):
+        email = make_email('žluťoučký kůň\n', charset='iso-8859-2', encoding='8bit')
+        self.assertEqual(self.extractor.extract(email), 'žluťoučký kůň\n')
+
+    def test_extract_unknownCharset_fallsBackToUtf8(self):
+        email = make_email('', charset='x-unknown', encoding='8bit').encode('ascii') + 'naïve\n'.encode('utf-8')
+        self.assertEqual(self.extractor.extract(email), 'naïve\n')
+
+    def test_extract_multipart_decodesTextPart(self):
+        email = ('Content-Type: multipart/alternative; boundary="b"\n\n--b\n'
+                 'Content-Type: text/plain; charset="iso-8859-1"\nContent-Transfer-Encoding: quoted-printable\n\n'
+                 'gr=FC=DFe\n--b--\n')
+        self.assertEqual(self.extractor.extract(email), 'grüße')
+
+
+class TokenizerSingleDecodeTest(unittest.TestCase):
+
+    def test_tokenize_doesNotDecodeQuotedPrintableAgain(self):
+        tokens = EmailTokenizer().tokenize('key=3Dvalue')
+        self.assertEqual(tokens, ['key', '3dvalue'])
+
+    def test_tokenize_stringAndUtf8BytesAgree(self):
+        text = 'Zdarma výhra 1000 € na www.example.com'
+        tokenizer = EmailTokenizer()
+        self.assertEqual(tokenizer.tokenize(text), tokenizer.tokenize(text.encode('utf-8')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,10 +2,12 @@
 # -*- coding: utf-8 -*-
 """Tests for MyFilter class."""
 
+import os
 import unittest
 from pathlib import Path
 
 import tests.tst_filterbase
+from tests.test_readClassificationFromFile import replaced_open
 
 
 class MyFilterTest(tests.tst_filterbase.BaseFilterTestCase):
@@ -18,6 +20,23 @@ class MyFilterTest(tests.tst_filterbase.BaseFilterTestCase):
         base_dir = Path(__file__).resolve().parent
         self.filter.MODEL_PATH = base_dir / "models" / "test_nb_spam_vocab2500.pkl"
 
+    def test_trainAndTest_8bitMailInNationalCharset(self):
+        """Emails that are not valid UTF-8 are decoded with their declared charset."""
+        text = 'Příliš žluťoučký kůň úpěl ďábelské ódy'
+        contents = ('From: a@example.com\nSubject: test\nContent-Type: text/plain; charset="iso-8859-2"\n'
+                    'Content-Transfer-Encoding: 8bit\n\n' + text + '\n').encode('iso-8859-2')
+        with open(os.path.join(tests.tst_filterbase.CORPUS_DIR, 'latin2'), 'wb') as f:
+            f.write(contents)
+        self.file_dict['latin2'] = contents
+        self.add_truth_to_corpus()
+
+        with replaced_open():
+            self.filter.train(tests.tst_filterbase.CORPUS_DIR)
+            self.filter.test(tests.tst_filterbase.CORPUS_DIR)
+
+        self.assertPredictionFileExistsAndContainsClassificationFor(self.file_dict)
+        self.assertLessEqual(set(self.filter._tokenizer.tokenize(text)), self.filter.model['vocabulary'])
+
        
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the hot-reloadable model handle."""
+
+import math
+import os
+import shutil
+import threading
+import types
+import unittest
+from unittest import mock
+
+from config.labels import HAM_TAG
+from dataio.synthetic import SyntheticCorpusGenerator
+from dataio.tokenized import TokenizedCorpus
+from filters.hotreload import ModelHandle, validate_model
+
+MODEL_DIR = 'models_for_testing_delete_me'
+MODEL_PATH = os.path.join(MODEL_DIR, 'model.pkl')
+
+
+def train_filter(seed, count=40):
+    from filter import MyFilter
+    spam_filter = MyFilter(max_tokens=50)
+    emails = list(SyntheticCorpusGenerator(seed=seed, pathological_rate=0).emails(count))
+    tokens = [tokens for _, tokens in spam_filter._tokenize_emails((f, c) for f, c, _ in emails)]
+    spam_filter.train_tokenized(TokenizedCorpus([f for f, _, _ in emails], tokens,
+                                                {f: label for f, _, label in emails}))
+    return spam_filter
+
+
+class ModelHandleTest(unittest.TestCase):
+
+    def setUp(self):
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        self.first = train_filter(seed=1)
+        self.second = train_filter(seed=2)
+        self.first.save_model(MODEL_PATH)
+        self.email = next(SyntheticCorpusGenerator(seed=3, pathological_rate=0).emails(1))[1]
+
+    def tearDown(self):
+        shutil.rmtree(MODEL_DIR, ignore_errors=True)
+
+    def test_classify_reportsModelVersion(self):
+        handle = ModelHandle(MODEL_PATH)
+        verdict = handle.classify(self.email)
+        self.assertEqual(verdict.model_version, 1)
+        _, tokens = next(self.first._tokenize_emails([(None, self.email)]))
+        self.assertAlmostEqual(verdict.score, self.first._score_tokens(tokens))
+
+    def test_checkForUpdate_swapsChangedModel(self):
+        handle = ModelHandle(MODEL_PATH)
+        self.assertFalse(handle.check_for_update())
+
+        self.second.save_model(MODEL_PATH)
+        self.assertTrue(handle.check_for_update())
+        verdict = handle.classify(self.email)
+        self.assertEqual(verdict.model_version, 2)
+        _, tokens = next(self.second._tokenize_emails([(None, self.email)]))
+        self.assertAlmostEqual(verdict.score, self.second._score_tokens(tokens))
+
+    def test_installSignalHandler_withoutSighup_raisesValueError(self):
+        handle = ModelHandle(MODEL_PATH)
+        platform_signal = types.SimpleNamespace(signal=mock.Mock())
+        with mock.patch('filters.hotreload.signal', platform_signal), self.assertRaises(ValueError):
+            handle.install_signal_handler()
+        platform_signal.signal.assert_not_called()
+
+    def test_checkForUpdate_brokenModel_keepsCurrentModel(self):
+        handle = ModelHandle(MODEL_PATH)
+        with open(MODEL_PATH, 'wb') as f:
+            f.write(b'not a pickle')
+
+        self.assertFalse(handle.check_for_update())
+        self.assertIsNotNone(handle.last_error)
+        self.assertEqual(handle.classify(self.email).model_version, 1)
+        # The broken file is not retried until it changes
+        self.assertFalse(handle.check_for_update())
+
+        self.second.save_model(MODEL_PATH)
+        self.assertTrue(handle.check_for_update())
+        self.assertIsNone(handle.last_error)
+
+    def test_requestReload_loadsInBackground(self):
+        handle = ModelHandle(MODEL_PATH)
+        self.second.save_model(MODEL_PATH)
+        handle.request_reload().join()
+        self.assertEqual(handle.version, 2)
+
+    def test_concurrentClassify_seesWholeModels(self):
+        handle = ModelHandle(MODEL_PATH)
+        _, tokens = next(self.first._tokenize_emails([(None, self.email)]))
+        expected = {1: self.first._score_tokens(tokens), 2: self.second._score_tokens(tokens),
+                    3: self.first._score_tokens(tokens)}
+        errors = []
+
+        def score():
+            for _ in range(50):
+                verdict = handle.classify(self.email)
+                if abs(verdict.score - expected[verdict.model_version]) > 1e-9:
+                    errors.append(verdict)
+
+        threads = [threading.Thread(target=score) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        self.second.save_model(MODEL_PATH)
+        handle.reload()
+        self.first.save_model(MODEL_PATH)
+        handle.reload()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_validateModel_rejectsMalformedModels(self):
+        from filter import MyFilter
+        model = dict(self.first.model)
+        validate_model(model)
+        for key, value in (('vocabulary', set()), ('prior_ham', 0.0)):
+            with self.assertRaises(ValueError):
+                validate_model(dict(model, **{key: value}))
+        with self.assertRaises(ValueError):
+            validate_model({k: v for k, v in model.items() if k != 'spam_counts'})
+        ham_probs, _ = MyFilter.token_probabilities(model)
+        with self.assertRaises(ValueError):
+            validate_model(dict(model, ham_probs=ham_probs, spam_probs={}))
+        with self.assertRaises(ValueError):
+            validate_model([model])
+        for threshold in (float('nan'), '0'):
+            with self.assertRaises(ValueError):
+                validate_model(dict(model, threshold=threshold))
+
+    def test_reload_sweptInfiniteThreshold_loads(self):
+        self.second.set_threshold(math.inf)
+        self.second.save_model(MODEL_PATH)
+        handle = ModelHandle(MODEL_PATH)
+        self.assertEqual(handle.classify(self.email).label, HAM_TAG)
+
+    def test_reload_bindsVocabularyBeforeTheSwap(self):
+        handle = ModelHandle(MODEL_PATH)
+        self.second.save_model(MODEL_PATH)
+        handle.reload()
+        spam_filter = handle.snapshot.filter
+        self.assertIsNotNone(spam_filter._binding)
+        with mock.patch('filter.VocabularyTokenizer', side_effect=AssertionError):
+            handle.classify(self.email)
+
+
+if __name__ == '__main__':
+    unittest.main()
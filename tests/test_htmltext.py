@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the streaming HTML-to-text stage."""
+
+import unittest
+
+from dataio.synthetic import SyntheticCorpusGenerator
+from text.extractor import EmailBodyExtractor
+from text.htmltext import HTMLText, HTMLTextStream, iter_html_text
+from text.tokenizer import EmailTokenizer
+
+
+def html_text(chunks):
+    return ''.join(iter_html_text(chunks))
+
+
+class HTMLTextStreamTest(unittest.TestCase):
+
+    def test_tagsBecomeSpaces(self):
+        self.assertEqual(html_text(['<p>free<br/>money</p>']).split(), ['free', 'money'])
+
+    def test_scriptAndStyleContentsAreDropped(self):
+        text = html_text(['<style>.a{color:red}</style>hello<SCRIPT type="x">var spam = 1;</script > world'])
+        self.assertEqual(text.split(), ['hello', 'world'])
+
+    def test_commentsAreDropped(self):
+        self.assertEqual(html_text(['a<!-- hidden <b>words</b> -->b']).split(), ['a', 'b'])
+
+    def test_entitiesAreDecodedInTextOnly(self):
+        self.assertEqual(html_text(['&lt;b&gt;bold&lt;/b&gt; &amp; caf&eacute;']), '<b>bold</b> & café')
+
+    def test_textLessThanSignIsKept(self):
+        self.assertEqual(html_text(['1 < 2 and 3 <']), '1 < 2 and 3 <')
+
+    def test_constructsCutByChunksAreJoined(self):
+        chunks = ['fr', 'ee<', 'b class="x', '">mo', 'ney &am', 'p; more<scr', 'ipt>x</sc', 'ript>end']
+        self.assertEqual(html_text(chunks), html_text([''.join(chunks)]))
+        self.assertEqual(html_text(chunks).split(), ['free', 'money', '&', 'more', 'end'])
+
+    def test_finish_dropsUnclosedScript(self):
+        stream = HTMLTextStream()
+        text = stream.push('visible <script>never closed')
+        self.assertEqual((text + stream.finish()).split(), ['visible'])
+
+    def test_push_holdsBackAtMostMaxPending(self):
+        stream = HTMLTextStream()
+        stream.MAX_PENDING = 100
+        text = stream.push('<script>' + 'x' * 200)
+        self.assertGreater(len(text), 100)
+
+
+class TokenizerHTMLTest(unittest.TestCase):
+
+    def test_tokenize_escapedMarkupIsNotStripped(self):
+        tokens = EmailTokenizer().tokenize(HTMLText('&lt;div&gt;winner&lt;/div&gt;'))
+        self.assertEqual(tokens, ['div', 'winner', 'div'])
+
+    def test_tokenize_ignoresScripts(self):
+        tokens = EmailTokenizer().tokenize(HTMLText('<html><script>document.write("casino")</script>lottery</html>'))
+        self.assertEqual(tokens, ['lottery'])
+
+    def test_tokenize_plainText_markupIsKept(self):
+        # A stray < neither removes the words up to the next > nor drops the rest
+        text = 'if a<b and c>d then <style sheets are nice, <!-- trailing words'
+        self.assertEqual(EmailTokenizer().tokenize(text), ['then', 'style', 'sheet', 'nice', 'trail', 'word'])
+
+    def test_extract_marksOnlyHtmlParts(self):
+        extractor = EmailBodyExtractor()
+        plain = extractor.extract('Content-Type: text/plain\n\nprice <script> here')
+        html = extractor.extract(b'Content-Type: text/html\n\n<p>price</p>')
+        self.assertNotIsInstance(plain, HTMLText)
+        self.assertIsInstance(html, HTMLText)
+        self.assertEqual(EmailTokenizer().tokenize(plain), ['price', 'script', 'here'])
+        self.assertEqual(EmailTokenizer().tokenize(html), ['price'])
+
+    def test_tokenize_sameTokensForAnyChunkSize(self):
+        extractor = EmailBodyExtractor()
+        tokenizer, small = EmailTokenizer(), EmailTokenizer()
+        small.CHUNK_SIZE = 64
+        for _, contents, _ in SyntheticCorpusGenerator(seed=42).emails(40):
+            body = extractor.extract(contents)
+            self.assertEqual(small.tokenize(body), tokenizer.tokenize(body))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the run instrumentation of MyFilter."""
+
+import os
+import json
+import shutil
+import unittest
+from unittest import mock
+
+from metrics.instrumentation import RunStats
+from tests.test_readClassificationFromFile import save_classification_to_file
+from tests.test_corpus import create_corpus_dictionary, create_corpus_dir_from_dictionary
+from tests.test_trainingcorpus import create_classification_for
+
+CORPUS_DIR = 'corpus_for_testing_delete_me'
+REPORT_FILENAME = 'stats_report_delete_me.json'
+TRUTH_FILENAME = '!truth.txt'
+
+
+class RunStatsTest(unittest.TestCase):
+
+    def test_recordTokens_countsOutOfVocabularyTokens(self):
+        stats = RunStats()
+        stats.record_tokens(['a', 'b', 'c', 'd'], vocabulary={'a', 'b', 'c'})
+        self.assertEqual(stats.tokens, 4)
+        self.assertEqual(stats.oov_tokens, 1)
+        self.assertEqual(stats.oov_ratio, 0.25)
+
+    def test_recordIds_countsTokensAndOutOfVocabularyTokens(self):
+        stats = RunStats()
+        stats.record_ids([0, 1, 2], 1)
+        self.assertEqual((stats.tokens, stats.oov_tokens), (4, 1))
+        self.assertEqual(stats.as_dict()['vocabulary_tokens_checked'], 4)
+        self.assertEqual(stats.oov_ratio, 0.25)
+
+    def test_stage_accumulatesCalls(self):
+        stats = RunStats()
+        for _ in range(3):
+            with stats.stage('extract'):
+                pass
+        self.assertEqual(stats.stages['extract'].calls, 3)
+
+
+class InstrumentedFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.email_dict = create_corpus_dictionary()
+        create_corpus_dir_from_dictionary(self.email_dict, CORPUS_DIR)
+        save_classification_to_file(create_classification_for(self.email_dict.keys()),
+                                    os.path.join(CORPUS_DIR, TRUTH_FILENAME))
+
+    def tearDown(self):
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+        if os.path.exists(REPORT_FILENAME):
+            os.unlink(REPORT_FILENAME)
+
+    def test_trainAndTest_recordStagesAndCounters(self):
+        from filter import MyFilter
+        stats = RunStats()
+        spam_filter = MyFilter(stats=stats)
+        spam_filter.train(CORPUS_DIR)
+        spam_filter.test(CORPUS_DIR)
+
+        n_emails = len(self.email_dict)
+        self.assertEqual(stats.emails, 2 * n_emails)
+        self.assertEqual(sum(stats.latency_histogram.values()), 2 * n_emails)
+        for stage in ('read', 'extract', 'tokenize', 'score', 'train', 'test'):
+            self.assertIn(stage, stats.stages)
+        self.assertEqual(stats.stages['score'].calls, n_emails)
+        self.assertGreater(stats.bytes_read, 0)
+
+        stats.write_report(REPORT_FILENAME)
+        with open(REPORT_FILENAME, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        self.assertEqual(report['emails'], 2 * n_emails)
+
+    def test_test_instrumentsTheVocabularyIdPath(self):
+        from filter import MyFilter
+        from text.tokenizer import EmailTokenizer
+        spam_filter = MyFilter(max_tokens=5)
+        spam_filter.train(CORPUS_DIR)
+        predictions = dict(spam_filter.iter_predictions(CORPUS_DIR))
+        # The counters of the string token path on the same emails
+        expected = RunStats()
+        for _, tokens in spam_filter._tokenize_emails(self.email_dict.items()):
+            expected.record_tokens(tokens, spam_filter.model['vocabulary'])
+
+        stats = RunStats()
+        spam_filter.stats = stats
+        with mock.patch.object(EmailTokenizer, 'tokenize', side_effect=AssertionError):
+            spam_filter.test(CORPUS_DIR)
+
+        self.assertEqual(spam_filter._predictions, predictions)
+        self.assertEqual(stats.stages['score'].calls, len(self.email_dict))
+        self.assertEqual((stats.tokens, stats.oov_tokens, stats.vocabulary_tokens_checked),
+                         (expected.tokens, expected.oov_tokens, expected.vocabulary_tokens_checked))
+        self.assertGreater(stats.oov_tokens, 0)
+        self.assertEqual(stats.as_dict()['oov_ratio'], expected.oov_ratio)
+
+
+if __name__ == '__main__':
+    unittest.main()
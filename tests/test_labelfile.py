@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the binary label file format."""
+
+import os
+import shutil
+import unittest
+
+from dataio.labelfile import write_labels, read_labels, read_scores, iter_records, read_classification, \
+    LabelFile, text_to_binary, binary_to_text
+from tests.test_readClassificationFromFile import (
+    create_classification,
+    save_classification_to_file,
+    replaced_open)
+from utils import read_classification_from_file, write_scores_to_file, read_scores_from_file
+
+CORPUS_DIR = 'corpus_for_testing_delete_me'
+TRUTH_FILENAME = '!truth.txt'
+PREDICTION_FILENAME = '!prediction.txt'
+BINARY_FILENAME = os.path.join(CORPUS_DIR, 'labels.bin')
+
+
+class LabelFileTest(unittest.TestCase):
+
+    def setUp(self):
+        os.makedirs(CORPUS_DIR, exist_ok=True)
+        self.classification = create_classification(50)
+        self.scores = {filename: float(i) - 20.5 for i, filename in enumerate(self.classification)}
+
+    def tearDown(self):
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+
+    def test_writeAndRead_labelsOnly(self):
+        write_labels(BINARY_FILENAME, self.classification)
+        self.assertDictEqual(self.classification, read_labels(BINARY_FILENAME))
+        self.assertDictEqual({}, read_scores(BINARY_FILENAME))
+
+    def test_writeAndRead_scoresAndModelIds(self):
+        del self.scores[next(iter(self.scores))]
+        write_labels(BINARY_FILENAME, self.classification, self.scores, 'model-1')
+
+        records = list(iter_records(BINARY_FILENAME))
+        self.assertEqual([r.filename for r in records], sorted(self.classification))
+        for r in records:
+            self.assertEqual(r.label, self.classification[r.filename])
+            self.assertEqual(r.score, self.scores.get(r.filename))
+            self.assertEqual(r.model_id, 'model-1')
+        self.assertDictEqual(self.scores, read_scores(BINARY_FILENAME))
+
+    def test_lookup_findsEveryFilenameAndRejectsUnknown(self):
+        self.classification['žluťoučký.eml'] = 'SPAM'
+        write_labels(BINARY_FILENAME, self.classification, self.scores)
+
+        with LabelFile(BINARY_FILENAME) as label_file:
+            self.assertEqual(len(label_file), len(self.classification))
+            for filename, label in self.classification.items():
+                record = label_file.lookup(filename)
+                self.assertEqual(record.label, label)
+                self.assertEqual(record.score, self.scores.get(filename))
+            self.assertIsNone(label_file.lookup('missing'))
+            self.assertNotIn('', label_file)
+
+    def test_emptyClassification(self):
+        write_labels(BINARY_FILENAME, {})
+        self.assertDictEqual({}, read_labels(BINARY_FILENAME))
+        with LabelFile(BINARY_FILENAME) as label_file:
+            self.assertIsNone(label_file.lookup('missing'))
+
+    def test_filenameWithNewline_raisesValueError(self):
+        with self.assertRaises(ValueError):
+            write_labels(BINARY_FILENAME, {'a\nb': 'OK'})
+
+    def test_textFile_isNotALabelFile(self):
+        text_path = os.path.join(CORPUS_DIR, TRUTH_FILENAME)
+        save_classification_to_file(self.classification, text_path)
+        with self.assertRaises(ValueError):
+            LabelFile(text_path)
+        with replaced_open():
+            self.assertDictEqual(self.classification, read_classification(text_path))
+
+    def test_conversion_roundTripsThroughText(self):
+        text_path = os.path.join(CORPUS_DIR, TRUTH_FILENAME)
+        scores_path = os.path.join(CORPUS_DIR, 'scores.txt')
+        save_classification_to_file(self.classification, text_path)
+        write_scores_to_file(scores_path, self.scores)
+
+        text_to_binary(text_path, BINARY_FILENAME, scores_path)
+        os.unlink(text_path)
+        os.unlink(scores_path)
+        binary_to_text(BINARY_FILENAME, text_path, scores_path)
+
+        self.assertDictEqual(self.classification, read_classification_from_file(text_path))
+        self.assertDictEqual(self.scores, read_scores_from_file(scores_path))
+
+    def test_computeQualityForCorpus_acceptsBinaryFiles(self):
+        from metrics.quality import compute_quality_for_corpus
+        write_labels(os.path.join(CORPUS_DIR, TRUTH_FILENAME), self.classification)
+        save_classification_to_file(self.classification, os.path.join(CORPUS_DIR, PREDICTION_FILENAME))
+        with replaced_open():
+            self.assertEqual(compute_quality_for_corpus(CORPUS_DIR), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
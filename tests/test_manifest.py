@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the corpus manifest."""
+
+import json
+import os
+import shutil
+import unittest
+
+from config.paths import MANIFEST_FILENAME
+from dataio.corpus import Corpus
+from dataio.manifest import CorpusManifest, process_corpus
+from dataio.synthetic import SyntheticCorpusGenerator
+from dataio.tokenized import TokenizedCorpus
+
+CORPUS_DIR = 'corpus_for_testing_delete_me'
+
+
+class CorpusManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        SyntheticCorpusGenerator(seed=45, pathological_rate=0).write_corpus(CORPUS_DIR, 30)
+        self.filenames = {filename for filename, _ in Corpus(CORPUS_DIR).emails()}
+
+    def tearDown(self):
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+
+    def path(self, filename):
+        return os.path.join(CORPUS_DIR, filename)
+
+    def test_build_listsEmailFilesOnly(self):
+        manifest = CorpusManifest.build(CORPUS_DIR)
+        self.assertEqual(set(manifest.filenames()), self.filenames)
+        self.assertTrue(os.path.isfile(self.path(MANIFEST_FILENAME)))
+        self.assertNotIn(MANIFEST_FILENAME, set(CorpusManifest.load(CORPUS_DIR).filenames()))
+
+    def test_filenames_areInInodeOrder(self):
+        manifest = CorpusManifest.build(CORPUS_DIR)
+        inodes = [manifest[filename].inode for filename in manifest.filenames()]
+        self.assertEqual(inodes, sorted(inodes))
+
+    def test_update_reportsOnlyChanges(self):
+        CorpusManifest.build(CORPUS_DIR)
+        manifest = CorpusManifest.load(CORPUS_DIR)
+        self.assertFalse(any(manifest.update().values()))
+
+        changed, removed = sorted(self.filenames)[:2]
+        with open(self.path(changed), 'a', encoding='utf-8') as f:
+            f.write('more\n')
+        os.remove(self.path(removed))
+        with open(self.path('new.email'), 'w', encoding='utf-8') as f:
+            f.write('Subject: new\n\nbody\n')
+
+        changes = manifest.update()
+        self.assertEqual(changes['changed'], [changed])
+        self.assertEqual(changes['removed'], [removed])
+        self.assertEqual(changes['added'], ['new.email'])
+
+    def test_update_touchedFile_keepsDigest(self):
+        manifest = CorpusManifest.build(CORPUS_DIR)
+        filename = manifest.filenames()[0]
+        digest = manifest[filename].digest
+        os.utime(self.path(filename), ns=(0, 0))
+
+        changes = manifest.update()
+        self.assertEqual(changes['touched'], [filename])
+        self.assertEqual(manifest[filename].digest, digest)
+
+    def test_shards_partitionAndBalanceBytes(self):
+        manifest = CorpusManifest.build(CORPUS_DIR)
+        shards = manifest.shards(3)
+        self.assertEqual(sorted(f for shard in shards for f in shard), sorted(self.filenames))
+
+        sizes = [sum(manifest[f].size for f in shard) for shard in shards]
+        largest_file = max(manifest[f].size for f in self.filenames)
+        self.assertLessEqual(max(sizes) - min(sizes), largest_file)
+
+    def test_corpus_withManifest_readsAllEmails(self):
+        manifest = CorpusManifest.build(CORPUS_DIR)
+        filenames = [filename for filename, _ in Corpus(CORPUS_DIR, manifest=manifest).emails()]
+        self.assertEqual(filenames, manifest.filenames())
+
+    def test_processCorpus_reusesCachedResults(self):
+        calls = []
+
+        def process(email):
+            calls.append(email)
+            return len(email)
+
+        first = process_corpus(CORPUS_DIR, 'lengths', process)
+        self.assertEqual(len(calls), 30)
+
+        filename = sorted(self.filenames)[0]
+        with open(self.path(filename), 'a', encoding='utf-8') as f:
+            f.write('more\n')
+        second = process_corpus(CORPUS_DIR, 'lengths', process)
+        self.assertEqual(len(calls), 31)
+        self.assertEqual(dict(second)[filename], dict(first)[filename] + 5)
+
+    def test_processCorpus_unreadableCache_recomputesResults(self):
+        cache_path = os.path.join(CORPUS_DIR, '!cache-lengths.json')
+        for contents in (b'\x80\x04K*.', b'{"version": 1, "results": [1, 2]}', b'[]', b'{"results": '):
+            with open(cache_path, 'wb') as f:
+                f.write(contents)
+            calls = []
+            process_corpus(CORPUS_DIR, 'lengths', lambda email: calls.append(email) or len(email))
+            self.assertEqual(len(calls), 30)
+
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)['results']), 30)
+
+    def test_tokenizedCorpus_cache_matchesUncached(self):
+        uncached = TokenizedCorpus.from_directory(CORPUS_DIR)
+        TokenizedCorpus.from_directory(CORPUS_DIR, cache=True)
+        cached = TokenizedCorpus.from_directory(CORPUS_DIR, cache=True)
+        self.assertEqual(dict(cached.items()), dict(uncached.items()))
+        self.assertEqual(cached.truth(), uncached.truth())
+
+
+if __name__ == '__main__':
+    unittest.main()
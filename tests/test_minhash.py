@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the MinHash near-duplicate index."""
+
+import types
+import unittest
+
+from dataio.synthetic import SyntheticCorpusGenerator
+from dataio.tokenized import TokenizedCorpus
+from text.minhash import MinHasher, NearDuplicateIndex
+
+BASE_TOKENS = ['cheap', 'viagra', 'offer', 'click', 'here', 'now', 'limit', 'time',
+               'best', 'price', 'guarante', 'free', 'ship', 'order', 'today', 'onlin',
+               'pharmacy', 'discount', 'bonu', 'pill', 'secur', 'payment', 'deliv', 'world']
+
+
+class MinHasherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.hasher = MinHasher(num_perm=64)
+
+    def test_signature_isNone_forEmptyTokens(self):
+        self.assertIsNone(self.hasher.signature([]))
+
+    def test_signature_ignoresOrderAndDuplicates(self):
+        sig1 = self.hasher.signature(BASE_TOKENS)
+        sig2 = self.hasher.signature(list(reversed(BASE_TOKENS)) + BASE_TOKENS[:5])
+        self.assertEqual(sig1, sig2)
+
+    def test_signatureOfSlots_matchesSignature(self):
+        slots = self.hasher.token_slots(BASE_TOKENS)
+        self.assertEqual(self.hasher.signature_of_slots(slots), self.hasher.signature(BASE_TOKENS))
+        self.assertIsNone(self.hasher.signature_of_slots([]))
+
+    def test_similarity_isHigh_forMutatedTokens(self):
+        mutated = BASE_TOKENS[:-1] + ['randomname']
+        similarity = MinHasher.similarity(
+            self.hasher.signature(BASE_TOKENS), self.hasher.signature(mutated))
+        self.assertGreater(similarity, 0.7)
+
+    def test_similarity_isLow_forDisjointTokens(self):
+        other = ['meet', 'tomorrow', 'project', 'report', 'deadline', 'agenda']
+        similarity = MinHasher.similarity(
+            self.hasher.signature(BASE_TOKENS), self.hasher.signature(other))
+        self.assertLess(similarity, 0.3)
+
+
+class NearDuplicateIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = NearDuplicateIndex(bands=16, rows=4, threshold=0.7, max_size=3)
+
+    def test_query_returnsVerdict_ofNearDuplicate(self):
+        self.index.add(BASE_TOKENS, 'SPAM', 'campaign1')
+        match = self.index.query(BASE_TOKENS[1:] + ['trackingid'])
+        self.assertIsNotNone(match)
+        self.assertEqual(match.key, 'campaign1')
+        self.assertEqual(match.label, 'SPAM')
+
+    def test_query_returnsNone_forUnrelatedEmail(self):
+        self.index.add(BASE_TOKENS, 'SPAM', 'campaign1')
+        self.assertIsNone(self.index.query(['meet', 'tomorrow', 'project', 'report']))
+
+    def test_add_evictsLeastRecentlyUsed_whenFull(self):
+        self.index.add(BASE_TOKENS, 'SPAM', 'old')
+        self.index.add(['a1', 'b1', 'c1'], 'OK', 'x')
+        self.index.add(['a2', 'b2', 'c2'], 'OK', 'y')
+        self.index.add(['a3', 'b3', 'c3'], 'OK', 'z')
+        self.assertEqual(len(self.index), 3)
+        self.assertIsNone(self.index.query(BASE_TOKENS))
+
+
+class FilterDuplicateIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        from filter import MyFilter
+        emails = list(SyntheticCorpusGenerator(seed=5, pathological_rate=0).emails(60))
+        self.filter = MyFilter(max_tokens=200)
+        tokens = [tokens for _, tokens in self.filter._tokenize_emails((f, c) for f, c, _ in emails)]
+        self.filter.train_tokenized(TokenizedCorpus([f for f, _, _ in emails], tokens,
+                                                    {f: label for f, _, label in emails}))
+        # Every email is seen twice, the second copy reuses the verdict of the first
+        self.emails = [(f, c) for f, c, _ in emails] * 2
+
+    def test_iterVerdicts_idsMatchTokens(self):
+        corpus = types.SimpleNamespace(emails=lambda: iter(self.emails))
+        self.filter.duplicate_index = NearDuplicateIndex()
+        verdicts = list(self.filter._iter_verdicts(corpus))
+
+        self.filter.duplicate_index = NearDuplicateIndex()
+        expected = [(filename, *self.filter._predict_tokens(filename, tokens))
+                    for filename, tokens in self.filter._tokenize_emails(self.emails)]
+        self.assertEqual(verdicts, expected)
+        self.assertTrue(all(score is None for _, _, score in verdicts[len(verdicts) // 2:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for online learning of MyFilter."""
+
+import pickle
+import unittest
+from collections import Counter
+
+from config.labels import SPAM_TAG, HAM_TAG
+from dataio.synthetic import SyntheticCorpusGenerator
+from dataio.tokenized import TokenizedCorpus
+
+
+def generate_emails(count, seed):
+    generator = SyntheticCorpusGenerator(seed=seed, pathological_rate=0)
+    return [(filename, contents, label) for filename, contents, label in generator.emails(count)]
+
+
+class OnlineLearningTest(unittest.TestCase):
+
+    def setUp(self):
+        from filter import MyFilter
+        self.filter_class = MyFilter
+        self.train = generate_emails(60, seed=1)
+        self.feedback = generate_emails(10, seed=2)
+        self.filter = self.create_trained_filter()
+
+    def create_trained_filter(self, emails=None, max_tokens=50, vocabulary=None):
+        spam_filter = self.filter_class(max_tokens=max_tokens, maintenance_interval=None)
+        emails = self.train if emails is None else emails
+        tokens = [tokens for _, tokens in spam_filter._tokenize_emails((f, c) for f, c, _ in emails)]
+        corpus = TokenizedCorpus([f for f, _, _ in emails], tokens, {f: label for f, _, label in emails})
+        spam_filter._build_model(*spam_filter._count_tokens(corpus.hams(), corpus.spams()), vocabulary)
+        return spam_filter
+
+    def assertScoresEqual(self, first, second):
+        for _, contents, _ in self.feedback:
+            _, tokens = next(first._tokenize_emails([(None, contents)]))
+            self.assertAlmostEqual(first._score_tokens(tokens), second._score_tokens(tokens), places=9)
+
+    def test_learnOne_equalsRetrainingWithSameVocabulary(self):
+        for _, contents, label in self.feedback:
+            self.filter.learn_one(contents, label)
+
+        retrained = self.create_trained_filter(self.train + self.feedback,
+                                               vocabulary=self.filter.model['vocabulary'])
+        self.assertEqual(self.filter.model['ham_counts'], retrained.model['ham_counts'])
+        self.assertEqual(self.filter.model['spam_counts'], retrained.model['spam_counts'])
+        self.assertScoresEqual(self.filter, retrained)
+
+    def test_unlearnOne_revertsLearnOne(self):
+        original = pickle.loads(pickle.dumps(self.filter))
+        for _, contents, label in self.feedback:
+            self.filter.learn_one(contents, label)
+        for _, contents, label in reversed(self.feedback):
+            self.filter.unlearn_one(contents, label)
+
+        self.assertEqual(self.filter.model['ham_emails'], original.model['ham_emails'])
+        self.assertEqual(+self.filter.model['spam_counts'], +original.model['spam_counts'])
+        self.assertEqual(self.filter._outside_counts, original._outside_counts)
+        self.assertScoresEqual(self.filter, original)
+
+    def test_model_keepsOnlyVocabularyCounts(self):
+        vocabulary = self.filter.model['vocabulary']
+        for _, contents, label in self.feedback:
+            self.filter.learn_one(contents, label)
+
+        self.assertLessEqual(set(self.filter.model['ham_counts']), vocabulary)
+        self.assertLessEqual(set(self.filter.model['spam_counts']), vocabulary)
+        ham_counter, spam_counter, _, _ = self.filter._model_counts()
+        retrained = self.create_trained_filter(self.train + self.feedback)
+        self.assertEqual(ham_counter, retrained._model_counts()[0])
+        self.assertEqual(spam_counter, retrained._model_counts()[1])
+
+    def test_unlearnOne_unknownEmail_raisesValueErrorWithoutChanges(self):
+        _, contents, _ = self.feedback[0]
+        counts = Counter(self.filter.model['spam_counts'])
+        self.filter.learn_one(contents, HAM_TAG)
+        with self.assertRaises(ValueError):
+            self.filter.unlearn_one(contents + ' unseenword', HAM_TAG)
+        with self.assertRaises(ValueError):
+            self.filter.unlearn_one(contents, SPAM_TAG)
+        self.assertEqual(self.filter.model['spam_counts'], counts)
+
+    def test_learnOne_unknownLabel_raisesValueError(self):
+        with self.assertRaises(ValueError):
+            self.filter.learn_one(self.feedback[0][1], 'MAYBE')
+
+    def test_learnOne_probabilitiesEqualRetraining(self):
+        vocabulary = self.filter.model['vocabulary']
+        for _, contents, label in self.feedback:
+            self.filter.learn_one(contents, label)
+
+        retrained = self.create_trained_filter(self.train + self.feedback, vocabulary=vocabulary)
+        for learned, expected in zip(self.filter_class.token_probabilities(self.filter.model),
+                                     self.filter_class.token_probabilities(retrained.model)):
+            self.assertEqual(learned.keys(), expected.keys())
+            for w, prob in expected.items():
+                self.assertAlmostEqual(learned[w], prob)
+
+    def test_maintainVocabulary_equalsRetraining(self):
+        for _, contents, label in self.feedback:
+            self.filter.learn_one(contents, label)
+        self.filter.maintain_vocabulary()
+
+        retrained = self.create_trained_filter(self.train + self.feedback)
+        self.assertEqual(self.filter.model['vocabulary'], retrained.model['vocabulary'])
+        self.assertEqual(self.filter_class.token_probabilities(self.filter.model),
+                         self.filter_class.token_probabilities(retrained.model))
+        self.assertScoresEqual(self.filter, retrained)
+
+    def test_learnOne_startsBackgroundMaintenance(self):
+        self.filter.maintenance_interval = len(self.feedback)
+        for _, contents, label in self.feedback:
+            self.filter.learn_one(contents, label)
+
+        thread = self.filter._maintenance_thread
+        if thread is not None:
+            thread.join()
+        self.assertEqual(self.filter._updates_since_maintenance, 0)
+        retrained = self.create_trained_filter(self.train + self.feedback)
+        self.assertEqual(self.filter.model['vocabulary'], retrained.model['vocabulary'])
+
+    def test_learnOne_modelWithoutCounts_isPreparedFromProbabilities(self):
+        model = {k: v for k, v in self.filter.model.items()
+                 if k not in ('ham_counts', 'spam_counts', 'ham_emails', 'spam_emails', 'weights', 'norm')}
+        model['ham_probs'], model['spam_probs'] = self.filter_class.token_probabilities(self.filter.model)
+        spam_filter = self.filter_class(pretrained_model=model, maintenance_interval=None)
+        _, contents, label = self.feedback[0]
+        spam_filter.learn_one(contents, label)
+        self.assertIn('weights', spam_filter.model)
+        self.assertEqual(spam_filter.model['vocabulary'], model['vocabulary'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for pruning low-information tokens from models."""
+
+import math
+import os
+import pickle
+import shutil
+import unittest
+
+from filter import MyFilter
+from dataio.synthetic import SyntheticCorpusGenerator
+from dataio.tokenized import TokenizedCorpus
+from filters.pruning import agreement_rate, prune_model, prune_to_agreement, pruning_report, rank_tokens, \
+    restrict_model
+
+MODEL_DIR = 'models_for_testing_delete_me'
+
+
+def tokenized_corpus(seed, count):
+    spam_filter = MyFilter()
+    emails = list(SyntheticCorpusGenerator(seed=seed, pathological_rate=0).emails(count))
+    tokens = [tokens for _, tokens in spam_filter._tokenize_emails((f, c) for f, c, _ in emails)]
+    return TokenizedCorpus([f for f, _, _ in emails], tokens, {f: label for f, _, label in emails})
+
+
+class PruningTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.train = tokenized_corpus(seed=47, count=80)
+        cls.test = tokenized_corpus(seed=48, count=40)
+        cls.spam_filter = MyFilter(max_tokens=200)
+        cls.spam_filter.train_tokenized(cls.train)
+        cls.model = cls.spam_filter.model
+
+    def test_rankTokens_logratio_descendingAbsoluteLogRatio(self):
+        ranked = rank_tokens(self.model, 'logratio')
+        self.assertEqual(set(ranked), self.model['vocabulary'])
+        ham_probs, spam_probs = MyFilter.token_probabilities(self.model)
+        ratios = [abs(math.log(spam_probs[w]) - math.log(ham_probs[w])) for w in ranked]
+        for previous, current in zip(ratios, ratios[1:]):
+            self.assertGreaterEqual(previous + 1e-9, current)
+
+    def test_rankTokens_mi_rankingOfVocabulary(self):
+        self.assertEqual(sorted(rank_tokens(self.model, 'mi')), sorted(self.model['vocabulary']))
+
+    def test_rankTokens_unknownMethod_raisesValueError(self):
+        with self.assertRaises(ValueError):
+            rank_tokens(self.model, 'entropy')
+
+    def test_pruneModel_scoreLosesOnlyPrunedContributions(self):
+        pruned = prune_model(self.model, 50)
+        self.assertEqual(len(pruned['vocabulary']), 50)
+        self.assertNotIn('ham_counts', pruned)
+
+        tokens = self.test.tokens[0]
+        removed = sum(self.model['weights'][w] + self.model['norm']
+                      for w in tokens if w in self.model['vocabulary'] and w not in pruned['vocabulary'])
+        self.assertAlmostEqual(self.spam_filter._score_tokens(tokens, pruned),
+                               self.spam_filter._score_tokens(tokens, self.model) - removed)
+
+    def test_restrictModel_fullVocabulary_agreesFully(self):
+        full = restrict_model(self.model, self.model['vocabulary'])
+        self.assertEqual(agreement_rate(self.model, full, self.test.tokens), 1.0)
+
+    def test_pruneToAgreement_smallestModelReachingTarget(self):
+        pruned, agreement = prune_to_agreement(self.model, self.train.tokens, 0.95)
+        self.assertGreaterEqual(agreement, 0.95)
+        self.assertEqual(agreement, agreement_rate(self.model, pruned, self.train.tokens))
+
+        smaller = prune_model(self.model, len(pruned['vocabulary']) - 1)
+        self.assertLess(agreement_rate(self.model, smaller, self.train.tokens), 0.95)
+
+    def test_prunedModel_saveLoadAndLearn(self):
+        model_path = os.path.join(MODEL_DIR, 'pruned.pkl')
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        self.addCleanup(shutil.rmtree, MODEL_DIR, ignore_errors=True)
+        MyFilter(pretrained_model=prune_model(self.model, 50)).save_model(model_path)
+        with open(model_path, 'rb') as f:
+            spam_filter = MyFilter(pretrained_model=pickle.load(f))
+        self.assertEqual(len(spam_filter.model['vocabulary']), 50)
+
+        email = next(SyntheticCorpusGenerator(seed=49, pathological_rate=0).emails(1))
+        label = spam_filter.classify(email[1])
+        spam_filter.learn_one(email[1], email[2])
+        self.assertIn(spam_filter.classify(email[1]), (label, email[2]))
+
+    def test_pruningReport_rowsForFractionsAndAgreements(self):
+        results, pruned_models = pruning_report(self.train, self.test, max_tokens=200,
+                                                fractions=(0.5, 1.0), agreements=(0.9,))
+        self.assertEqual([r.get('fraction') for r in results[:2]], [1.0, 0.5])
+        self.assertEqual(results[0]['agreement'], 1.0)
+        self.assertEqual(results[2]['target_agreement'], 0.9)
+        self.assertEqual(len(pruned_models), 1)
+        self.assertLess(results[1]['model_bytes'], results[0]['model_bytes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the shared-tokenization evaluation of multiple filters."""
+
+import os
+import shutil
+import unittest
+
+from dataio.tokenized import TokenizedCorpus
+from filters.simplefilters import NaiveFilter, ParanoidFilter
+from metrics.qualifier import compute_quality_for_filters_shared
+from tests.test_readClassificationFromFile import save_classification_to_file
+from tests.test_corpus import create_corpus_dictionary, create_corpus_dir_from_dictionary
+from tests.test_trainingcorpus import create_classification_for
+
+CORPUS_DIR = 'corpus_for_testing_delete_me'
+TRUTH_FILENAME = '!truth.txt'
+SPAM_TAG = 'SPAM'
+
+
+class SharedEvaluationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.email_dict = create_corpus_dictionary()
+        create_corpus_dir_from_dictionary(self.email_dict, CORPUS_DIR)
+        self.truth = create_classification_for(self.email_dict.keys())
+        save_classification_to_file(self.truth, os.path.join(CORPUS_DIR, TRUTH_FILENAME))
+
+    def tearDown(self):
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+
+    def test_tokenizedCorpus_containsAllEmailsAndTruth(self):
+        corpus = TokenizedCorpus.from_directory(CORPUS_DIR)
+        self.assertEqual(sorted(corpus.filenames), sorted(self.email_dict))
+        self.assertEqual(corpus.truth(), self.truth)
+        n_spams = sum(1 for label in self.truth.values() if label == SPAM_TAG)
+        self.assertEqual(len(list(corpus.spams())), n_spams)
+
+    def test_sharedEvaluation_matchesConstantFilters_withoutPredictionFile(self):
+        from filter import MyFilter
+        filters = [NaiveFilter(), ParanoidFilter(), MyFilter(max_tokens=10), MyFilter(max_tokens=100)]
+        for max_workers in (1, 2):
+            quality = compute_quality_for_filters_shared(CORPUS_DIR, CORPUS_DIR, filters, max_workers)
+            self.assertEqual(sorted(quality), ['MyFilter', 'MyFilter_2', 'NaiveFilter', 'ParanoidFilter'])
+            n_spams = sum(1 for label in self.truth.values() if label == SPAM_TAG)
+            n_hams = len(self.truth) - n_spams
+            self.assertAlmostEqual(quality['NaiveFilter'], n_hams / (n_hams + n_spams))
+            self.assertAlmostEqual(quality['ParanoidFilter'], n_spams / (n_spams + 10 * n_hams))
+        self.assertEqual(sorted(os.listdir(CORPUS_DIR)), sorted(list(self.email_dict) + [TRUTH_FILENAME]))
+
+
+if __name__ == '__main__':
+    unittest.main()
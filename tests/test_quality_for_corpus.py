@@ -100,8 +100,45 @@ class ComputeQualityForCorpusTest(unittest.TestCase):
             q = self.compute_quality_for_corpus(CORPUS_DIR)
         # Assertions
         self.assertEqual(q, expected_q)
-        
-        
+
+
+class ComputeQualityForStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        from metrics.quality import compute_quality_for_stream
+        self.compute_quality_for_stream = compute_quality_for_stream
+
+    def test_1FP2FN_for10SpamsAnd20Hams(self):
+        # Prepare the SUT
+        truth_dict = create_classification(n_items=30, n_spams=10)
+        pred_dict = n_FP_n_FN(truth_dict)
+        # Excercise the SUT
+        q = self.compute_quality_for_stream(truth_dict, iter(pred_dict.items()))
+        # Assertions
+        self.assertEqual(q, (8 + 19) / (8 + 19 + 10*1 + 2))
+
+    def test_raisesKeyError_forMissingPrediction(self):
+        truth_dict = create_classification(n_items=30, n_spams=10)
+        pred_items = list(truth_dict.items())[:-1]
+        with self.assertRaises(KeyError):
+            self.compute_quality_for_stream(truth_dict, iter(pred_items))
+
+    def test_ignoresPrediction_withoutTruth_likePredictionDict(self):
+        from metrics.quality import compute_quality_for_predictions
+        truth_dict = create_classification(n_items=30, n_spams=10)
+        pred_dict = dict(n_FP_n_FN(truth_dict), unknown_email=SPAM_TAG)
+        q = self.compute_quality_for_stream(truth_dict, iter(pred_dict.items()))
+        self.assertEqual(q, compute_quality_for_predictions(truth_dict, pred_dict))
+        self.assertEqual(q, (8 + 19) / (8 + 19 + 10*1 + 2))
+
+    def test_raisesKeyError_forDuplicatedInsteadOfMissingPrediction(self):
+        truth_dict = create_classification(n_items=30, n_spams=10)
+        pred_items = list(truth_dict.items())
+        pred_items[-1] = pred_items[0]
+        with self.assertRaises(KeyError):
+            self.compute_quality_for_stream(truth_dict, iter(pred_items))
+
+
 def create_truth_and_prediction_file(truth_dict, pred_setter):
     """
     Create !truth.txt and !prediction.txt files in the dataio directory.
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for shadow scoring of several models in one pass."""
+
+import os
+import shutil
+import unittest
+
+from filter import MyFilter
+from dataio.corpus import Corpus
+from dataio.synthetic import SyntheticCorpusGenerator
+from filters.shadow import ShadowFilter
+from utils import read_classification_from_file
+
+CORPUS_DIR = 'corpus_for_testing_delete_me'
+TEST_DIR = 'test_corpus_for_testing_delete_me'
+PREDICTION_PATH = os.path.join(TEST_DIR, '!prediction.txt')
+SHADOW_PATH = os.path.join(TEST_DIR, '!shadow.txt')
+
+
+class ShadowFilterTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        SyntheticCorpusGenerator(seed=50, pathological_rate=0).write_corpus(CORPUS_DIR, 60)
+        SyntheticCorpusGenerator(seed=51, pathological_rate=0).write_corpus(TEST_DIR, 40)
+        cls.primary = MyFilter(max_tokens=200)
+        cls.primary.train(CORPUS_DIR)
+        cls.shadow = MyFilter(max_tokens=20)
+        cls.shadow.train(CORPUS_DIR)
+        # A low threshold makes the small model disagree on part of the ham
+        scores = sorted(score for _, score in cls.shadow_scores())
+        cls.shadow.set_threshold(scores[len(scores) // 4])
+        cls.same = MyFilter(max_tokens=200)
+        cls.same.train(CORPUS_DIR)
+
+    @classmethod
+    def shadow_scores(cls):
+        for filename in os.listdir(TEST_DIR):
+            if not filename.startswith('!'):
+                with open(os.path.join(TEST_DIR, filename), 'rb') as f:
+                    yield filename, cls.shadow.score(f.read())
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    def test_test_writesThePrimaryVerdicts(self):
+        self.primary.test(TEST_DIR)
+        expected = read_classification_from_file(PREDICTION_PATH)
+        ShadowFilter(self.primary, [self.shadow, self.same]).test(TEST_DIR)
+        self.assertEqual(read_classification_from_file(PREDICTION_PATH), expected)
+
+    def test_test_logsDisagreementsWithDeltas(self):
+        shadow_filter = ShadowFilter(self.primary, [self.shadow, self.same], ['small', 'retrained'])
+        shadow_filter.test(TEST_DIR)
+        small, retrained = shadow_filter.report['shadows']
+        self.assertEqual(shadow_filter.report['emails'], 40)
+        self.assertEqual((retrained['disagreements'], retrained['max_abs_delta'], retrained['agreement']), (0, 0.0, 1.0))
+
+        with open(SHADOW_PATH, encoding='utf-8') as f:
+            lines = [line.split() for line in f]
+        self.assertGreater(small['disagreements'], 0)
+        self.assertEqual(len(lines), small['disagreements'])
+        self.assertEqual(small['ham_to_spam'] + small['spam_to_ham'], small['disagreements'])
+
+        primary_labels = read_classification_from_file(PREDICTION_PATH)
+        for filename, name, primary_label, label, delta in lines:
+            self.assertEqual(name, 'small')
+            self.assertEqual(primary_labels[filename], primary_label)
+            self.assertNotEqual(label, primary_label)
+            self.assertEqual(float(delta), self.shadow.score(self.read(filename)) - self.primary.score(self.read(filename)))
+
+    def test_test_twice_reportsOneRun(self):
+        shadow_filter = ShadowFilter(self.primary, [self.shadow])
+        shadow_filter.test(TEST_DIR)
+        first = shadow_filter.report
+        shadow_filter.test(TEST_DIR)
+        self.assertEqual(shadow_filter.report, first)
+        self.assertEqual(shadow_filter.report['emails'], 40)
+        self.assertEqual(len(read_classification_from_file(PREDICTION_PATH)), 40)
+
+    def test_iterPredictions_scoresEqualTokenScores(self):
+        for filename, labels, scores in ShadowFilter(self.primary, [self.shadow])._iter_verdicts(
+                Corpus(TEST_DIR)):
+            self.assertAlmostEqual(scores[0], self.primary.score(self.read(filename)))
+            self.assertAlmostEqual(scores[1], self.shadow.score(self.read(filename)))
+
+    def read(self, filename):
+        with open(os.path.join(TEST_DIR, filename), 'rb') as f:
+            return f.read()
+
+    def test_iterPredictions_primaryLabels(self):
+        shadow_filter = ShadowFilter(self.primary, [self.shadow])
+        self.assertEqual(dict(shadow_filter.iter_predictions(TEST_DIR)), dict(self.primary.iter_predictions(TEST_DIR)))
+
+    def test_init_invalidNames_raisesValueError(self):
+        with self.assertRaises(ValueError):
+            ShadowFilter(self.primary, [self.shadow], ['two words'])
+        with self.assertRaises(ValueError):
+            ShadowFilter(self.primary, [self.shadow], [])
+
+    def test_test_untrainedShadow_raisesRuntimeError(self):
+        with self.assertRaises(RuntimeError):
+            ShadowFilter(self.primary, [MyFilter()]).test(TEST_DIR)
+
+    def test_train_trainsEveryFilterOnce(self):
+        first, second = MyFilter(max_tokens=200), MyFilter(max_tokens=20)
+        ShadowFilter(first, [second]).train(CORPUS_DIR)
+        self.assertEqual(first.model['weights'], self.primary.model['weights'])
+        self.assertEqual(second.model['weights'], self.shadow.model['weights'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for training from mergeable count shards."""
+
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import unittest
+
+from filter import MyFilter
+from dataio.synthetic import SyntheticCorpusGenerator
+from filters.shards import CountShard, count_shard, merge_shards, shard_of
+
+CORPUS_DIR = 'corpus_for_testing_delete_me'
+SHARDS_DIR = 'shards_for_testing_delete_me'
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CountShardTest(unittest.TestCase):
+
+    def setUp(self):
+        SyntheticCorpusGenerator(seed=44, pathological_rate=0).write_corpus(CORPUS_DIR, 60)
+        os.makedirs(SHARDS_DIR, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+        shutil.rmtree(SHARDS_DIR, ignore_errors=True)
+
+    def shard_path(self, name):
+        return os.path.join(SHARDS_DIR, name)
+
+    def test_countShard_slicesPartitionTheCorpus(self):
+        shards = [count_shard(CORPUS_DIR, i, 3) for i in range(3)]
+        whole = count_shard(CORPUS_DIR)
+        self.assertEqual(sum(s.ham_emails + s.spam_emails for s in shards), 60)
+
+        merged = CountShard()
+        for shard in shards:
+            merged.merge(shard)
+        self.assertEqual(merged.ham_counts, whole.ham_counts)
+        self.assertEqual(merged.spam_counts, whole.spam_counts)
+        self.assertEqual((merged.ham_emails, merged.spam_emails), (whole.ham_emails, whole.spam_emails))
+
+    def test_saveLoad_roundTrip(self):
+        shard = count_shard(CORPUS_DIR, 1, 2)
+        shard.save(self.shard_path('shard.json.gz'))
+        loaded = CountShard.load(self.shard_path('shard.json.gz'))
+        self.assertEqual(loaded.ham_counts, shard.ham_counts)
+        self.assertEqual(loaded.spam_counts, shard.spam_counts)
+        self.assertEqual(loaded.sources, shard.sources)
+
+    def test_load_notAShard_raisesValueError(self):
+        with open(self.shard_path('bogus'), 'w', encoding='utf-8') as f:
+            f.write('not a shard')
+        with self.assertRaises(ValueError):
+            CountShard.load(self.shard_path('bogus'))
+
+    def test_merge_sameSliceTwice_raisesValueError(self):
+        shard = count_shard(CORPUS_DIR, 0, 2)
+        with self.assertRaises(ValueError):
+            shard.merge(count_shard(CORPUS_DIR, 0, 2))
+
+    def test_merge_sameCorpusAtAnotherPath_raisesValueError(self):
+        shard = count_shard(CORPUS_DIR, 0, 2)
+        copy_dir = self.shard_path('mounted-elsewhere')
+        shutil.copytree(CORPUS_DIR, copy_dir)
+        with self.assertRaises(ValueError):
+            shard.merge(count_shard(copy_dir, 0, 2))
+        with self.assertRaises(ValueError):
+            shard.merge(count_shard(copy_dir, 1, 3))
+
+    def test_merge_otherCorpusAtTheSamePath_merges(self):
+        shard = count_shard(CORPUS_DIR, 0, 2)
+        shutil.rmtree(CORPUS_DIR)
+        SyntheticCorpusGenerator(seed=45, pathological_rate=0).write_corpus(CORPUS_DIR, 30)
+        other = count_shard(CORPUS_DIR, 0, 3)
+        self.assertEqual(len(shard.merge(other).sources), 2)
+
+    def test_countShard_explicitCorpusId(self):
+        shard = count_shard(CORPUS_DIR, 0, 2, corpus_id='spam-2024')
+        self.assertEqual(shard.sources, [['spam-2024', 0, 2]])
+        shard.merge(count_shard(CORPUS_DIR, 0, 2, corpus_id='spam-2025'))
+
+    def test_merge_differentPartitionOfSameCorpus_raisesValueError(self):
+        shard = count_shard(CORPUS_DIR, 0, 2)
+        with self.assertRaises(ValueError):
+            shard.merge(count_shard(CORPUS_DIR, 1, 3))
+        self.assertEqual(shard.sources, count_shard(CORPUS_DIR, 0, 2).sources)
+
+    def test_buildFilter_smallVocabulary_tiesMatchTrainingOnWholeCorpus(self):
+        max_tokens = 50
+        whole = count_shard(CORPUS_DIR)
+        for counts in (whole.ham_counts, whole.spam_counts):
+            frequencies = sorted(counts.values(), reverse=True)
+            # The cutoff falls inside a group of equally frequent tokens
+            self.assertEqual(frequencies[max_tokens - 1], frequencies[max_tokens])
+
+        spam_filter = MyFilter(max_tokens=max_tokens)
+        spam_filter.train(CORPUS_DIR)
+        shards = [count_shard(CORPUS_DIR, i, 4) for i in range(4)]
+        for order in (shards, shards[::-1]):
+            merged = CountShard()
+            for shard in order:
+                merged.merge(shard)
+            model = merged.build_filter(max_tokens).model
+            self.assertEqual(model['vocabulary'], spam_filter.model['vocabulary'])
+            self.assertEqual(model['weights'], spam_filter.model['weights'])
+
+    def test_shardOf_isStable(self):
+        self.assertEqual(shard_of('0001.abc', 7), shard_of('0001.abc', 7))
+        self.assertTrue(0 <= shard_of('0001.abc', 7) < 7)
+
+    def test_cli_nodesAndTreeMerge_matchTrainingOnWholeCorpus(self):
+        # Local processes stand in for training nodes
+        nodes = [subprocess.Popen([sys.executable, '-m', 'filters.shards', 'count', os.path.abspath(CORPUS_DIR),
+                                   os.path.abspath(self.shard_path(f'{i}.json.gz')), '--index', str(i), '--count', '4'],
+                                  cwd=REPO_DIR)
+                 for i in range(4)]
+        self.assertEqual([node.wait() for node in nodes], [0] * 4)
+
+        def merge(inputs, output, partial=True):
+            command = [sys.executable, '-m', 'filters.shards', 'merge',
+                       *(os.path.abspath(self.shard_path(name)) for name in inputs),
+                       '--output', os.path.abspath(self.shard_path(output)), '--max-tokens', '100000']
+            subprocess.run(command + (['--partial'] if partial else []), cwd=REPO_DIR, check=True)
+
+        merge(['0.json.gz', '1.json.gz'], '01.json.gz')
+        merge(['2.json.gz', '3.json.gz'], '23.json.gz')
+        merge(['01.json.gz', '23.json.gz'], 'model.pkl', partial=False)
+
+        with open(self.shard_path('model.pkl'), 'rb') as f:
+            model = pickle.load(f)
+        spam_filter = MyFilter(max_tokens=100000)
+        spam_filter.train(CORPUS_DIR)
+        self.assertEqual(model['weights'], spam_filter.model['weights'])
+        self.assertEqual(model['norm'], spam_filter.model['norm'])
+        self.assertEqual(model['prior_spam'], spam_filter.model['prior_spam'])
+
+    def test_buildFilter_singleClass_raisesValueError(self):
+        with self.assertRaises(ValueError):
+            CountShard({'a': 1}, {}, 1, 0).build_filter()
+
+    def test_mergeShards_loadsFiles(self):
+        for i in range(2):
+            count_shard(CORPUS_DIR, i, 2).save(self.shard_path(f'{i}.json.gz'))
+        merged = merge_shards([self.shard_path('0.json.gz'), self.shard_path('1.json.gz')])
+        self.assertEqual(merged.ham_emails + merged.spam_emails, 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
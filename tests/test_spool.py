@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the spool-directory watch mode."""
+
+import errno
+import os
+import shutil
+import time
+import unittest
+from collections import Counter
+from unittest import mock
+
+from filter import MyFilter
+from config.labels import HAM_TAG, SPAM_TAG
+from dataio.synthetic import SyntheticCorpusGenerator
+from dataio.tokenized import TokenizedCorpus
+from filters.spool import InotifyWatcher, PollingWatcher, SpoolClassifier
+from utils import read_classification_from_file
+
+SPOOL_DIR = 'spool_for_testing_delete_me'
+HAM_DIR = 'spool_ham_for_testing_delete_me'
+SPAM_DIR = 'spool_spam_for_testing_delete_me'
+PREDICTIONS_PATH = os.path.join(SPOOL_DIR, '!prediction.txt')
+
+
+def train_filter():
+    spam_filter = MyFilter(max_tokens=100)
+    emails = list(SyntheticCorpusGenerator(seed=46, pathological_rate=0).emails(60))
+    tokens = [tokens for _, tokens in spam_filter._tokenize_emails((f, c) for f, c, _ in emails)]
+    spam_filter.train_tokenized(TokenizedCorpus([f for f, _, _ in emails], tokens,
+                                                {f: label for f, _, label in emails}))
+    return spam_filter
+
+
+def inotify_available():
+    try:
+        InotifyWatcher('.').close()
+        return True
+    except OSError:
+        return False
+
+
+def flaky(function, error):
+    """Returns a function raising the error on its first call and calling `function` later."""
+    errors = [error]
+
+    def call(*args):
+        if errors:
+            raise errors.pop()
+        return function(*args)
+    return call
+
+
+class SpoolClassifierTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.spam_filter = train_filter()
+
+    def setUp(self):
+        for directory in (SPOOL_DIR, HAM_DIR, SPAM_DIR):
+            os.makedirs(directory, exist_ok=True)
+        self.emails = list(SyntheticCorpusGenerator(seed=47, pathological_rate=0).emails(6))
+
+    def tearDown(self):
+        for directory in (SPOOL_DIR, HAM_DIR, SPAM_DIR):
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def deliver(self, emails):
+        # Written under a hidden name and renamed, like a mail delivery agent
+        for filename, contents, _ in emails:
+            tmp_path = os.path.join(SPOOL_DIR, '.' + filename)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(contents)
+            os.replace(tmp_path, os.path.join(SPOOL_DIR, filename))
+
+    def expected(self, emails):
+        return {filename: self.spam_filter.classify(contents) for filename, contents, _ in emails}
+
+    def wait_for(self, spool, count, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while spool.processed < count and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(spool.processed, count)
+
+    def test_processBacklog_appendsPredictions(self):
+        self.deliver(self.emails)
+        spool = SpoolClassifier(SPOOL_DIR, self.spam_filter)
+        spool.scan()
+        self.assertEqual(spool.backlog, 6)
+
+        self.assertEqual(spool.process_backlog(max_files=2), 2)
+        self.assertEqual(spool.backlog, 4)
+        spool.process_backlog()
+        self.assertEqual(spool.backlog, 0)
+        self.assertEqual(read_classification_from_file(PREDICTIONS_PATH), self.expected(self.emails))
+
+        status = spool.status()
+        self.assertEqual(status['processed'], 6)
+        self.assertEqual(sum(status['latency_histogram_us'].values()), 6)
+        self.assertIsNotNone(status['last_latency_s'])
+
+    def test_scan_classifiesEachFileOnce(self):
+        self.deliver(self.emails[:3])
+        spool = SpoolClassifier(SPOOL_DIR, self.spam_filter)
+        spool.scan()
+        spool.process_backlog()
+        spool.scan()
+        spool.enqueue([self.emails[0][0]])
+        self.assertEqual(spool.backlog, 0)
+
+        # A restarted spool skips the files in the predictions file
+        self.deliver(self.emails[3:])
+        restarted = SpoolClassifier(SPOOL_DIR, self.spam_filter)
+        restarted.scan()
+        self.assertEqual(restarted.backlog, 3)
+        restarted.process_backlog()
+        with open(PREDICTIONS_PATH, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 6)
+
+    def test_folders_moveFilesByLabel(self):
+        self.deliver(self.emails)
+        spool = SpoolClassifier(SPOOL_DIR, self.spam_filter, ham_dir=HAM_DIR, spam_dir=SPAM_DIR)
+        spool.scan()
+        spool.process_backlog()
+
+        expected = self.expected(self.emails)
+        self.assertEqual(os.listdir(SPOOL_DIR), [])
+        self.assertEqual(sorted(os.listdir(SPAM_DIR)), sorted(f for f, label in expected.items() if label == SPAM_TAG))
+        self.assertEqual(sorted(os.listdir(HAM_DIR)), sorted(f for f, label in expected.items() if label == HAM_TAG))
+
+    def test_folders_onlyOneGiven_raisesValueError(self):
+        with self.assertRaises(ValueError):
+            SpoolClassifier(SPOOL_DIR, self.spam_filter, ham_dir=HAM_DIR)
+
+    def test_processBacklog_removedFile_countedAsMissing(self):
+        self.deliver(self.emails[:2])
+        spool = SpoolClassifier(SPOOL_DIR, self.spam_filter)
+        spool.scan()
+        os.remove(os.path.join(SPOOL_DIR, self.emails[0][0]))
+        self.assertEqual(spool.process_backlog(), 1)
+        self.assertEqual(spool.missing, 1)
+
+    def test_processBacklog_oSError_countedAndNextFileClassified(self):
+        self.deliver(self.emails[:2])
+        spool = SpoolClassifier(SPOOL_DIR, self.spam_filter, ham_dir=HAM_DIR, spam_dir=SPAM_DIR,
+                                retry_interval=0)
+        spool.scan()
+        with mock.patch('shutil.move', side_effect=flaky(shutil.move, PermissionError(errno.EACCES, 'denied'))):
+            self.assertEqual(spool.process_backlog(), 1)
+        status = spool.status()
+        self.assertEqual((status['processed'], status['errors'], status['missing']), (1, 1, 0))
+        self.assertIn('PermissionError', status['last_error'])
+        self.assertEqual((status['retry_pending'], os.listdir(SPOOL_DIR)), (1, [spool.last_error.split(':')[0]]))
+
+        # The file stays in the spool and is queued again once its retry is due
+        spool.retry_failed()
+        self.assertEqual(spool.process_backlog(), 1)
+        self.assertEqual((spool.status()['retry_pending'], os.listdir(SPOOL_DIR)), (0, []))
+
+    def test_processBacklog_classifyRaises_recordedAndRetried(self):
+        self.deliver(self.emails[:2])
+        bad_name = self.emails[0][0]
+        classify = self.spam_filter.classify
+        attempts = Counter()
+
+        def flaky_classify(raw_email):
+            if raw_email == self.emails[0][1].encode('utf-8'):
+                attempts[bad_name] += 1
+                raise ValueError('malformed email')
+            return classify(raw_email)
+
+        spool = SpoolClassifier(SPOOL_DIR, mock.Mock(classify=flaky_classify), retry_interval=3600)
+        spool.scan()
+        self.assertEqual(spool.process_backlog(), 1)
+        self.assertIn('ValueError: malformed email', spool.last_error)
+        # Not due yet
+        spool.retry_failed()
+        self.assertEqual((spool.backlog, attempts[bad_name]), (0, 1))
+
+    def test_run_transientError_retriedWhileWatching(self):
+        self.deliver(self.emails)
+        with mock.patch('shutil.move', side_effect=flaky(shutil.move, OSError(errno.EIO, 'transient'))):
+            with SpoolClassifier(SPOOL_DIR, self.spam_filter, ham_dir=HAM_DIR, spam_dir=SPAM_DIR,
+                                 polling=True, poll_interval=0.02, retry_interval=0.05) as spool:
+                self.wait_for(spool, 6)
+        self.assertEqual((spool.errors, os.listdir(SPOOL_DIR)), (1, []))
+        # Moved files left the spool and are not remembered
+        self.assertEqual(spool._done, set())
+
+    def test_folders_crossDeviceMove_copiesFile(self):
+        self.deliver(self.emails)
+        spool = SpoolClassifier(SPOOL_DIR, self.spam_filter, ham_dir=HAM_DIR, spam_dir=SPAM_DIR)
+        spool.scan()
+        with mock.patch('os.rename', side_effect=OSError(errno.EXDEV, 'cross-device link')):
+            spool.process_backlog()
+        self.assertEqual((spool.processed, spool.errors), (6, 0))
+        self.assertEqual(os.listdir(SPOOL_DIR), [])
+        self.assertEqual(len(os.listdir(HAM_DIR) + os.listdir(SPAM_DIR)), 6)
+
+    def test_run_lostEvents_scansSpool(self):
+        class LossyWatcher:
+            def poll(self, timeout):
+                # Never reports a name, so only a rescan can find new files
+                time.sleep(timeout)
+                return None
+
+            def close(self):
+                pass
+
+        spool = SpoolClassifier(SPOOL_DIR, self.spam_filter, poll_interval=0.01)
+        with mock.patch('filters.spool.make_watcher', return_value=LossyWatcher()):
+            with spool:
+                # Delivered after the initial scan, while the events are lost
+                self.deliver(self.emails)
+                self.wait_for(spool, 6)
+        self.assertEqual(read_classification_from_file(PREDICTIONS_PATH), self.expected(self.emails))
+
+    def test_run_polling_classifiesBacklogAndNewFiles(self):
+        self.deliver(self.emails[:3])
+        with SpoolClassifier(SPOOL_DIR, self.spam_filter, polling=True, poll_interval=0.05) as spool:
+            self.wait_for(spool, 3)
+            self.deliver(self.emails[3:])
+            self.wait_for(spool, 6)
+        self.assertEqual(read_classification_from_file(PREDICTIONS_PATH), self.expected(self.emails))
+
+    @unittest.skipUnless(inotify_available(), 'inotify is not available')
+    def test_run_inotify_classifiesBacklogAndNewFiles(self):
+        self.deliver(self.emails[:3])
+        with SpoolClassifier(SPOOL_DIR, self.spam_filter, poll_interval=0.05) as spool:
+            self.wait_for(spool, 3)
+            self.deliver(self.emails[3:])
+            self.wait_for(spool, 6)
+        self.assertEqual(read_classification_from_file(PREDICTIONS_PATH), self.expected(self.emails))
+
+
+class InotifyWatcherTest(unittest.TestCase):
+
+    def test_parseEvents_namesAndQueueOverflow(self):
+        def event(mask, name=b''):
+            name = name + b'\0' * (-len(name) % 16) if name else b''
+            return InotifyWatcher._EVENT.pack(1, mask, 0, len(name)) + name
+
+        created = event(InotifyWatcher.IN_MOVED_TO, b'0001.abc') + event(InotifyWatcher.IN_CLOSE_WRITE, b'0002')
+        self.assertEqual(InotifyWatcher._parse_events(created), (['0001.abc', '0002'], False))
+        overflow = event(InotifyWatcher.IN_Q_OVERFLOW)
+        self.assertEqual(InotifyWatcher._parse_events(created + overflow), (['0001.abc', '0002'], True))
+
+
+class PollingWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(SPOOL_DIR, ignore_errors=True)
+
+    def test_poll_reportsFileOnceStable(self):
+        with open(os.path.join(SPOOL_DIR, 'old'), 'w', encoding='utf-8') as f:
+            f.write('x')
+        watcher = PollingWatcher(SPOOL_DIR)
+        with open(os.path.join(SPOOL_DIR, 'new'), 'w', encoding='utf-8') as f:
+            f.write('x')
+        self.assertEqual(watcher.poll(0), [])
+        self.assertEqual(watcher.poll(0), ['new'])
+        self.assertEqual(watcher.poll(0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the synthetic corpus generator."""
+
+import os
+import shutil
+import unittest
+
+from dataio.synthetic import SyntheticCorpusGenerator
+from dataio.trainingcorpus import TrainingCorpus
+from text.extractor import EmailBodyExtractor
+from tests.test_readClassificationFromFile import replaced_open
+
+CORPUS_DIR = 'synthetic_corpus_delete_me'
+N_EMAILS = 60
+SPAM_TAG = 'SPAM'
+HAM_TAG = 'OK'
+
+
+class SyntheticCorpusGeneratorTest(unittest.TestCase):
+
+    def tearDown(self):
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+
+    def test_sameSeed_producesSameEmails(self):
+        first = list(SyntheticCorpusGenerator(seed=7).emails(20))
+        second = list(SyntheticCorpusGenerator(seed=7).emails(20))
+        self.assertEqual(first, second)
+
+    def test_differentSeed_producesDifferentEmails(self):
+        first = list(SyntheticCorpusGenerator(seed=7).emails(5))
+        second = list(SyntheticCorpusGenerator(seed=8).emails(5))
+        self.assertNotEqual(first, second)
+
+    def test_writeCorpus_createsReadableCorpusWithTruth(self):
+        generator = SyntheticCorpusGenerator(seed=1, pathological_rate=0.2, huge_size=64 * 1024)
+        generator.write_corpus(CORPUS_DIR, N_EMAILS)
+
+        with replaced_open():
+            corpus = TrainingCorpus(CORPUS_DIR)
+            emails = dict(corpus.emails())
+
+        self.assertEqual(len(emails), N_EMAILS)
+        self.assertEqual(len(os.listdir(CORPUS_DIR)), N_EMAILS + 1)
+        extractor = EmailBodyExtractor()
+        for filename, contents in emails.items():
+            self.assertIn(corpus.get_class(filename), (SPAM_TAG, HAM_TAG))
+            extractor.extract(contents)
+
+    def test_emails_include8bitNationalCharsetsAsBytes(self):
+        extractor = EmailBodyExtractor()
+        eight_bit = [contents for _, contents, _ in SyntheticCorpusGenerator(seed=3).emails(200)
+                     if isinstance(contents, bytes)]
+        self.assertTrue(eight_bit)
+        for contents in eight_bit:
+            with self.assertRaises(UnicodeDecodeError):
+                contents.decode('utf-8')
+            self.assertNotIn('\ufffd', extractor.extract(contents))
+
+
+if __name__ == '__main__':
+    unittest.main()
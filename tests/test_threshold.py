@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the decision threshold sweep."""
+
+import math
+import os
+import shutil
+import unittest
+from unittest import mock
+
+from config.labels import SPAM_TAG, HAM_TAG
+from dataio.tokenized import TokenizedCorpus
+from metrics.quality import quality_score
+from metrics.threshold import main, sweep_thresholds, tune_threshold
+from tests.test_readClassificationFromFile import save_classification_to_file
+from tests.test_corpus import create_corpus_dictionary, create_corpus_dir_from_dictionary
+from tests.test_trainingcorpus import create_classification_for
+from utils import read_scores_from_file
+
+CORPUS_DIR = 'corpus_for_testing_delete_me'
+TRUTH_FILENAME = '!truth.txt'
+
+
+def brute_force_quality(scores, truths, threshold):
+    counts = {"tp": 0, "tn": 0, "fp": 0, "fn": 0}
+    for score, truth in zip(scores, truths):
+        spam = score >= threshold
+        if truth == SPAM_TAG:
+            counts["tp" if spam else "fn"] += 1
+        else:
+            counts["fp" if spam else "tn"] += 1
+    return quality_score(**counts)
+
+
+class SweepThresholdsTest(unittest.TestCase):
+
+    def test_sweep_matchesBruteForceOnEveryCandidate(self):
+        scores = [-3.0, -1.0, -1.0, 0.5, 2.0, 2.0, 4.0]
+        truths = [HAM_TAG, HAM_TAG, SPAM_TAG, HAM_TAG, SPAM_TAG, HAM_TAG, SPAM_TAG]
+        result = sweep_thresholds(scores, truths, curve=True)
+
+        self.assertEqual(len(result['curve']), len(set(scores)) + 1)
+        for threshold, quality in result['curve']:
+            self.assertAlmostEqual(quality, brute_force_quality(scores, truths, threshold))
+        self.assertEqual(result['quality'], max(q for _, q in result['curve']))
+
+    def test_sweep_separableScores_perfectQuality(self):
+        result = sweep_thresholds([-2.0, -1.0, 3.0, 5.0], [HAM_TAG, HAM_TAG, SPAM_TAG, SPAM_TAG])
+        self.assertEqual(result['quality'], 1.0)
+        self.assertEqual(result['threshold'], 1.0)
+
+    def test_sweep_allHam_thresholdAboveAllScores(self):
+        result = sweep_thresholds([1.0, 2.0], [HAM_TAG, HAM_TAG])
+        self.assertEqual(result['threshold'], math.inf)
+
+    def test_sweep_noScores_raisesValueError(self):
+        with self.assertRaises(ValueError):
+            sweep_thresholds([], [])
+
+
+class MyFilterThresholdTest(unittest.TestCase):
+
+    def setUp(self):
+        email_dict = create_corpus_dictionary(30)
+        create_corpus_dir_from_dictionary(email_dict, CORPUS_DIR)
+        save_classification_to_file(create_classification_for(email_dict.keys()),
+                                    os.path.join(CORPUS_DIR, TRUTH_FILENAME))
+        self.corpus = TokenizedCorpus.from_directory(CORPUS_DIR)
+
+    def tearDown(self):
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+
+    def test_testWithScores_writesScoresConsistentWithPredictions(self):
+        from filter import MyFilter
+        spam_filter = MyFilter()
+        spam_filter.train_tokenized(self.corpus)
+        spam_filter.test(CORPUS_DIR, write_scores=True)
+
+        scores = read_scores_from_file(os.path.join(CORPUS_DIR, '!scores.txt'))
+        self.assertEqual(set(scores), set(self.corpus.filenames))
+        self.assertEqual(scores, spam_filter.score_tokenized(self.corpus))
+        for filename, score in scores.items():
+            self.assertEqual(spam_filter._predictions[filename], SPAM_TAG if score >= 0 else HAM_TAG)
+
+    def test_tuneThreshold_storesThresholdUsedForPredictions(self):
+        from filter import MyFilter
+        spam_filter = MyFilter()
+        spam_filter.train_tokenized(self.corpus)
+        result = tune_threshold(spam_filter, self.corpus)
+
+        self.assertEqual(spam_filter.model['threshold'], result['threshold'])
+        self.assertGreaterEqual(result['quality'], result['default_quality'])
+        predictions = spam_filter.predict_tokenized(self.corpus)
+        for filename, score in spam_filter.score_tokenized(self.corpus).items():
+            expected = SPAM_TAG if score >= result['threshold'] else HAM_TAG
+            self.assertEqual(predictions[filename], expected)
+
+    def test_main_withoutOutput_exitsWithoutSaving(self):
+        from filter import MyFilter
+        with mock.patch.object(MyFilter, 'save_model') as save_model, \
+                mock.patch('sys.stderr'), self.assertRaises(SystemExit):
+            main([CORPUS_DIR])
+        save_model.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the email tokenizer and the vocabulary-bound tokenizer."""
+
+import pickle
+import unittest
+
+from dataio.synthetic import SyntheticCorpusGenerator
+from text.extractor import EmailBodyExtractor
+from text.tokenizer import EmailTokenizer, VocabularyTokenizer
+
+
+class VocabularyTokenizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tokenizer = EmailTokenizer()
+
+    def assertIdsMatchTokenize(self, vocabulary_tokenizer, text):
+        expected = [vocabulary_tokenizer.token_ids[token] for token in self.tokenizer.tokenize(text)
+                    if token in vocabulary_tokenizer.token_ids]
+        self.assertEqual(list(vocabulary_tokenizer.iter_ids(text)), expected)
+
+    def test_iterIds_mapsAffixedWordsToTheirStems(self):
+        vocabulary_tokenizer = VocabularyTokenizer({'play', 'cover', 'number', 'ab'})
+        text = b'Playing replay UNCOVERED covers disco ab abs 42 the player plays'
+        self.assertIdsMatchTokenize(vocabulary_tokenizer, text)
+        self.assertEqual(len(list(vocabulary_tokenizer.iter_ids(text))), 7)
+
+    def test_iterIds_emptyText_yieldsNothing(self):
+        vocabulary_tokenizer = VocabularyTokenizer({'play'})
+        self.assertEqual(list(vocabulary_tokenizer.iter_ids(b'')), [])
+        self.assertEqual(list(vocabulary_tokenizer.iter_ids(None)), [])
+
+    def test_iterIds_matchesTokenizeOnGeneratedEmails(self):
+        extractor = EmailBodyExtractor()
+        generator = SyntheticCorpusGenerator(seed=5)
+        bodies = [extractor.extract(contents) for _, contents, _ in generator.emails(40)]
+        vocabulary = {token for body in bodies[:20] for token in self.tokenizer.tokenize(body)}
+        vocabulary_tokenizer = VocabularyTokenizer(vocabulary)
+        for body in bodies:
+            self.assertIdsMatchTokenize(vocabulary_tokenizer, body)
+
+    def test_idsWithOov_countsTokensOutsideTheVocabulary(self):
+        vocabulary_tokenizer = VocabularyTokenizer({'play', 'cover'})
+        text = 'Playing replay the a disco UNCOVERED dances'
+        ids, oov_tokens = vocabulary_tokenizer.ids_with_oov(text)
+        self.assertEqual(ids, list(vocabulary_tokenizer.iter_ids(text)))
+        self.assertEqual(oov_tokens, 2)
+        self.assertEqual(len(ids) + oov_tokens, len(self.tokenizer.tokenize(text)))
+        self.assertEqual(vocabulary_tokenizer.ids_with_oov(''), ([], 0))
+
+
+class UncachedTokenizer(EmailTokenizer):
+    """Tokenizer that filters and stems every word occurrence, as before the cache."""
+    MAX_CACHED_WORDS = 0
+
+
+class EmailTokenizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tokenizer = EmailTokenizer()
+        extractor = EmailBodyExtractor()
+        self.bodies = [extractor.extract(contents) for _, contents, _ in
+                       SyntheticCorpusGenerator(seed=48, pathological_rate=0).emails(30)]
+
+    def test_tokenize_stemsAndSkipsWords(self):
+        self.assertEqual(self.tokenizer.tokenize('The player plays a replay, UNCOVERED covers'),
+                         ['player', 'play', 'play', 'cover', 'cover'])
+
+    def test_tokenize_wordTokenCache_givesUncachedTokens(self):
+        uncached = UncachedTokenizer()
+        first = [self.tokenizer.tokenize(body) for body in self.bodies]
+        self.assertEqual([self.tokenizer.tokenize(body) for body in self.bodies], first)
+        self.assertEqual([uncached.tokenize(body) for body in self.bodies], first)
+        self.assertEqual(len(uncached._token_cache), 0)
+
+    def test_pickle_dropsTheWordTokenCache(self):
+        self.tokenizer.tokenize(self.bodies[0])
+        restored = pickle.loads(pickle.dumps(self.tokenizer))
+        self.assertEqual(len(restored._token_cache), 0)
+        self.assertEqual(restored.tokenize(self.bodies[0]), self.tokenizer.tokenize(self.bodies[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
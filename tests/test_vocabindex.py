@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the minimal perfect hash token index."""
+
+import pickle
+import unittest
+
+from filter import MyFilter
+from config.labels import HAM_TAG, SPAM_TAG
+from dataio.synthetic import SyntheticCorpusGenerator
+from dataio.tokenized import TokenizedCorpus
+from text.vocabindex import VocabularyIndex, CompactModel
+
+
+class VocabularyIndexTest(unittest.TestCase):
+
+    def test_get_mapsTokensToDenseIds(self):
+        tokens = ['token%d' % i for i in range(5000)] + ['ěščř', '']
+        index = VocabularyIndex(tokens)
+        self.assertEqual(len(index), len(tokens))
+        self.assertEqual(sorted(index.get(token) for token in tokens), list(range(len(tokens))))
+
+    def test_get_unknownToken_returnsNone(self):
+        index = VocabularyIndex(['token%d' % i for i in range(1000)])
+        self.assertTrue(all(index.get('other%d' % i) is None for i in range(1000)))
+        self.assertIn('token7', index)
+        self.assertNotIn('token1000', index)
+
+    def test_get_smallVocabularies(self):
+        self.assertIsNone(VocabularyIndex([]).get('a'))
+        index = VocabularyIndex(['a'])
+        self.assertEqual(index.get('a'), 0)
+        self.assertIsNone(index.get('b'))
+
+    def test_init_duplicateTokens_raisesValueError(self):
+        with self.assertRaises(ValueError):
+            VocabularyIndex(['a', 'b', 'a'])
+
+    def test_nbytes_isEightBytesPerToken(self):
+        index = VocabularyIndex(['token%d' % i for i in range(1000)])
+        self.assertEqual(index.nbytes, 8 * 1000)
+
+
+class CompactModelTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        emails = list(SyntheticCorpusGenerator(seed=41, pathological_rate=0).emails(60))
+        filenames = [filename for filename, _, _ in emails]
+        truth = {filename: label for filename, _, label in emails}
+        cls.filter = MyFilter()
+        cls.tokens = [tokens for _, tokens in cls.filter._tokenize_emails(
+            [(filename, contents) for filename, contents, _ in emails])]
+        cls.filter.train_tokenized(TokenizedCorpus(filenames, cls.tokens, truth))
+
+    def test_scoreTokens_matchesMyFilter(self):
+        compact = self.filter.compact_model()
+        for tokens in self.tokens:
+            self.assertAlmostEqual(compact.score_tokens(tokens), self.filter._score_tokens(tokens))
+
+    def test_classifyTokens_usesThreshold(self):
+        compact = self.filter.compact_model()
+        tokens = self.tokens[0]
+        compact.threshold = compact.score_tokens(tokens)
+        self.assertEqual(compact.classify_tokens(tokens), SPAM_TAG)
+        compact.threshold += 1.0
+        self.assertEqual(compact.classify_tokens(tokens), HAM_TAG)
+
+    def test_pickle_roundTrip_keepsScores(self):
+        compact = pickle.loads(pickle.dumps(self.filter.compact_model()))
+        tokens = self.tokens[1]
+        self.assertAlmostEqual(compact.score_tokens(tokens), self.filter._score_tokens(tokens))
+
+    def test_nbytes_isSixteenBytesPerToken(self):
+        compact = CompactModel(self.filter.model)
+        self.assertEqual(compact.nbytes, 16 * len(self.filter.model['weights']))
+
+    def test_compactModel_untrainedFilter_raisesRuntimeError(self):
+        with self.assertRaises(RuntimeError):
+            MyFilter().compact_model()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for the one-pass vocabulary-size sweep."""
+
+import os
+import shutil
+import unittest
+
+from dataio.tokenized import TokenizedCorpus
+from metrics.crossval import count_tokens
+from metrics.vocabsweep import nested_vocabularies, sweep_vocabulary_sizes
+from tests.test_readClassificationFromFile import save_classification_to_file
+from tests.test_corpus import create_corpus_dictionary, create_corpus_dir_from_dictionary
+from tests.test_trainingcorpus import create_classification_for
+
+CORPUS_DIR = 'corpus_for_testing_delete_me'
+TRUTH_FILENAME = '!truth.txt'
+SIZES = (5, 20, 50)
+
+
+class VocabularySweepTest(unittest.TestCase):
+
+    def setUp(self):
+        email_dict = create_corpus_dictionary(30)
+        create_corpus_dir_from_dictionary(email_dict, CORPUS_DIR)
+        save_classification_to_file(create_classification_for(email_dict.keys()),
+                                    os.path.join(CORPUS_DIR, TRUTH_FILENAME))
+        self.corpus = TokenizedCorpus.from_directory(CORPUS_DIR)
+
+    def tearDown(self):
+        shutil.rmtree(CORPUS_DIR, ignore_errors=True)
+
+    def test_nestedVocabularies_equalVocabulariesOfRetrainedFilters(self):
+        from filter import MyFilter
+        ham_counter, spam_counter, _, _ = count_tokens(self.corpus, range(len(self.corpus)))
+        for size, vocabulary in nested_vocabularies(ham_counter, spam_counter, SIZES):
+            spam_filter = MyFilter(max_tokens=size)
+            spam_filter.train_tokenized(self.corpus)
+            self.assertEqual(vocabulary, spam_filter.model['vocabulary'])
+
+    def test_sweep_reportsEverySizeInAscendingOrder(self):
+        results = sweep_vocabulary_sizes(self.corpus, self.corpus, reversed(SIZES))
+        self.assertEqual([r['max_tokens'] for r in results], list(SIZES))
+        sizes = [r['vocabulary_size'] for r in results]
+        self.assertEqual(sizes, sorted(sizes))
+        for r in results:
+            self.assertEqual(sum(r['confusion_matrix'].values()), len(self.corpus))
+
+
+if __name__ == '__main__':
+    unittest.main()
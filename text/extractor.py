@@ -1,4 +1,6 @@
-from email import message_from_string
+from email import message_from_bytes, message_from_string
+
+from text.htmltext import HTMLText
 
 
 class EmailBodyExtractor:
@@ -10,21 +12,29 @@ class EmailBodyExtractor:
 
     :ivar TEXT_CONTENT_TYPES: Tuple containing allowed content types for extraction,
         such as plain text or HTML.
+    :ivar TRANSFER_ENCODINGS: Tuple of the content transfer encodings decoded by the
+        email package.
+    :ivar UTF8_CHARSETS: Tuple of the declared charsets decoded as UTF-8, of which ASCII
+        is a subset.
     """
     TEXT_CONTENT_TYPES = ('text/plain', 'text/html')
+    TRANSFER_ENCODINGS = ('base64', 'quoted-printable', 'x-uuencode', 'uuencode', 'uue', 'x-uue')
+    UTF8_CHARSETS = ('utf-8', 'utf8', 'us-ascii', 'ascii')
 
     def extract(self, raw_email):
         """
         Extract the main content from a raw email, either from a multipart or single-part
         email message.
 
-        :param raw_email: The raw email content as a string.
-        :return: Decoded email content if the extraction is successful, None otherwise.
+        :param raw_email: The raw email content as a string or bytes.
+        :return: Decoded email content as a string if the extraction is successful, None otherwise.
+            The content of a `text/html` part is returned as `HTMLText`.
         """
         if not raw_email:
             return None
 
-        message = message_from_string(raw_email)
+        from_bytes = isinstance(raw_email, bytes)
+        message = message_from_bytes(raw_email) if from_bytes else message_from_string(raw_email)
 
         if message.is_multipart():
             for part in message.walk():
@@ -35,8 +45,49 @@ class EmailBodyExtractor:
                         content_type in self.TEXT_CONTENT_TYPES
                         and 'attachment' not in content_disposition.lower()
                 ):
-                    return part.get_payload(decode=True)
+                    return self._decode_part(part, from_bytes)
         else:
-            return message.get_payload(decode=True)
+            return self._decode_part(message, from_bytes)
 
         return None
+
+    def _decode_part(self, part, from_bytes):
+        """
+        Decode the content of a non-multipart message part to text exactly once.
+
+        Parts without a transfer encoding are already text when the message was parsed
+        from a string. When it was parsed from bytes, their raw bytes are decoded with
+        the declared charset, as are the bytes of transfer-encoded parts.
+
+        :param part: Message part.
+        :param from_bytes: True if the message was parsed from bytes.
+        :return: Decoded content as a string, `HTMLText` for a `text/html` part, or None if
+            the part has no content.
+        """
+        encoding = str(part.get('Content-Transfer-Encoding', '')).strip().lower()
+        if not from_bytes and encoding not in self.TRANSFER_ENCODINGS:
+            text = part.get_payload()
+            if not isinstance(text, str):
+                return None
+        else:
+            data = part.get_payload(decode=True)
+            if data is None:
+                return None
+            text = self.decode_bytes(data, part.get_content_charset())
+        return HTMLText(text) if part.get_content_type() == 'text/html' else text
+
+    def decode_bytes(self, data, charset=None):
+        """
+        Decode bytes with a declared charset, falling back to UTF-8 for missing and
+        unknown charsets. Undecodable bytes are replaced.
+
+        :param data: Bytes to decode.
+        :param charset: Lowercase name of the declared charset, or None.
+        :return: Decoded string.
+        """
+        if charset is None or charset in self.UTF8_CHARSETS:
+            return data.decode('utf-8', errors='replace')
+        try:
+            return data.decode(charset, errors='replace')
+        except LookupError:
+            return data.decode('utf-8', errors='replace')
@@ -0,0 +1,97 @@
+import re
+from html import unescape
+
+
+class HTMLText(str):
+    """
+    Text of a `text/html` email part, as returned by `EmailBodyExtractor.extract`. The
+    tokenizer strips the markup of such text with `HTMLTextStream` and leaves other
+    text, e.g. of `text/plain` parts, as it is.
+    """
+    __slots__ = ()
+
+
+class HTMLTextStream:
+    """
+    Streaming HTML-to-text converter.
+
+    Markup is fed in chunks of any size with `push`, which returns the text decoded so
+    far. Every tag and comment is replaced by a space and the contents of `script` and
+    `style` elements are dropped. Character references are resolved only after the
+    markup is removed, i.e. in text nodes, so escaped markup such as `&lt;b&gt;` stays
+    text. A construct or character reference cut by the end of a chunk is held back
+    until the next one, up to `MAX_PENDING` characters.
+
+    :ivar MARKUP_RE: A regular expression pattern matching comments, script and style
+        elements with their contents, and tags.
+    :ivar INCOMPLETE_RE: A regular expression pattern matching the start of markup that
+        is not closed yet.
+    :ivar MAX_PENDING: Maximum number of characters held back between chunks.
+    """
+    MARKUP_RE = re.compile(
+        r"<(?:!--.*?--\s*>|(script|style)\b[^>]*>.*?</\1\s*>|(?!script\b|style\b|!--)[a-z/!?][^>]*>)",
+        re.IGNORECASE | re.DOTALL)
+    INCOMPLETE_RE = re.compile(r"<(?:[a-z/!?]|\Z)", re.IGNORECASE)
+    UNCLOSED_RE = re.compile(r"<(?:!--|script\b|style\b)", re.IGNORECASE)
+    ENTITY_END_RE = re.compile(r"[\s;]")
+    MAX_PENDING = 1 << 18
+
+    def __init__(self):
+        self._pending = ""
+
+    def push(self, data):
+        """
+        Feeds a chunk of markup.
+
+        :param data: String chunk of the document.
+        :return: Text decoded from the markup fed so far, not returned before.
+        """
+        return self._convert(self._pending + data, final=False)
+
+    def finish(self):
+        """
+        Flushes the held back end of the document. Unclosed comments, scripts and styles
+        are dropped.
+
+        :return: Remaining text of the document.
+        """
+        return self._convert(self._pending, final=True)
+
+    def _convert(self, data, final):
+        """
+        :param data: Markup after the text returned so far.
+        :param final: True if no more markup follows.
+        :return: Text of the markup up to the held back part.
+        """
+        text = self.MARKUP_RE.sub(" ", data)
+
+        if final:
+            match = self.UNCLOSED_RE.search(text)
+            hold = len(text) if match is None else match.start()
+            self._pending = ""
+            return unescape(text[:hold])
+
+        match = self.INCOMPLETE_RE.search(text)
+        hold = len(text) if match is None else match.start()
+        amp = text.rfind("&", max(hold - 32, 0), hold)
+        if amp >= 0 and not self.ENTITY_END_RE.search(text, amp, hold):
+            # A character reference may continue in the next chunk
+            hold = amp
+        if len(text) - hold > self.MAX_PENDING:
+            hold = len(text)
+
+        self._pending = text[hold:]
+        return unescape(text[:hold])
+
+
+def iter_html_text(chunks):
+    """
+    Generator of the text of an HTML document given in chunks.
+
+    :param chunks: Iterable of string chunks of the document.
+    :return: String text chunks, possibly empty.
+    """
+    stream = HTMLTextStream()
+    for chunk in chunks:
+        yield stream.push(chunk)
+    yield stream.finish()
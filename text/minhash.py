@@ -0,0 +1,258 @@
+import zlib
+from collections import OrderedDict, namedtuple
+
+
+DuplicateMatch = namedtuple("DuplicateMatch", ["key", "label", "similarity"])
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures of token sets.
+
+    One-permutation hashing is used: every token is hashed once, the hash space
+    is split into `num_perm` bins and the minimum of each bin forms one signature
+    component. Empty bins are filled from the nearest non-empty bin to the right
+    (rotation densification), so the cost is linear in the number of tokens
+    instead of `num_perm` times the number of tokens.
+
+    :ivar num_perm: Number of signature components.
+    """
+    HASH_BITS = 64
+    HASH_MASK = (1 << 64) - 1
+    MIX = 0x9E3779B97F4A7C15
+
+    def __init__(self, num_perm=64, seed=0):
+        """
+        :param num_perm: Number of signature components (bins).
+        :param seed: Seed mixed into the token hash, signatures are only
+            comparable between hashers with the same seed and num_perm.
+        """
+        if num_perm <= 0:
+            raise ValueError(f"num_perm must be positive: {num_perm}")
+
+        self.num_perm = num_perm
+        self._seed = seed & 0xFFFFFFFF
+        self._bin_width = (1 << self.HASH_BITS) // num_perm + 1
+
+    def _hash(self, token):
+        """
+        Deterministic 64-bit hash of a token (independent of PYTHONHASHSEED).
+
+        CRC32 is spread over 64 bits by a multiplicative mix so that the high
+        bits used for bin selection are well distributed.
+        """
+        return ((zlib.crc32(token.encode("utf-8"), self._seed) + 1) * self.MIX) & self.HASH_MASK
+
+    def _slot(self, token):
+        """
+        :return: A tuple `(bin, value)` of the hash of a token.
+        """
+        return divmod(self._hash(token), self._bin_width)
+
+    def token_slots(self, tokens):
+        """
+        Hash tokens once, e.g. the vocabulary of a model, for `signature_of_slots`.
+
+        :param tokens: Iterable of string tokens.
+        :return: List of the `(bin, value)` tuples of the tokens, in their order.
+        """
+        return [self._slot(token) for token in tokens]
+
+    def signature(self, tokens):
+        """
+        Compute the signature of a collection of tokens.
+
+        :param tokens: Iterable of string tokens, duplicates are ignored.
+        :return: Tuple of `num_perm` integers, or None for an empty token set.
+        """
+        return self.signature_of_slots(map(self._slot, set(tokens)))
+
+    def signature_of_slots(self, slots):
+        """
+        Compute the signature of a token set given by the slots of its tokens, so that
+        precomputed slots spare hashing every token of every email.
+
+        :param slots: Iterable of `(bin, value)` tuples from `token_slots`.
+        :return: Tuple of `num_perm` integers, or None for an empty token set.
+        """
+        # Every value is below the bin width, which marks the empty bins
+        bin_width = self._bin_width
+        bins = [bin_width] * self.num_perm
+
+        for i, value in slots:
+            if value < bins[i]:
+                bins[i] = value
+
+        if all(value == bin_width for value in bins):
+            return None
+
+        # Rotation densification: borrow from the next non-empty bin, shifted by
+        # the distance so that borrowed values do not collide with real ones.
+        n = self.num_perm
+        original = list(bins)
+        for i in range(n):
+            if original[i] != bin_width:
+                continue
+            distance = 1
+            while original[(i + distance) % n] == bin_width:
+                distance += 1
+            bins[i] = original[(i + distance) % n] + distance * bin_width
+
+        return tuple(bins)
+
+    @staticmethod
+    def similarity(signature_a, signature_b):
+        """
+        Estimate the Jaccard similarity of two token sets from their signatures.
+
+        :return: Fraction of equal signature components.
+        """
+        equal = sum(1 for a, b in zip(signature_a, signature_b) if a == b)
+        return equal / len(signature_a)
+
+
+class NearDuplicateIndex:
+    """
+    Bounded index of previously classified emails for near-duplicate lookup.
+
+    Signatures are split into `bands` bands of `rows` components. Two emails
+    become candidates when at least one band is identical, which makes a query
+    cost proportional to the number of colliding entries instead of the index size.
+    Candidates are then verified by the estimated Jaccard similarity.
+
+    When the index holds `max_size` entries, the least recently added or matched
+    entry is evicted.
+
+    :ivar threshold: Minimal estimated similarity for a match.
+    :ivar max_size: Maximal number of indexed emails.
+    """
+
+    def __init__(self, bands=16, rows=4, threshold=0.8, max_size=10000, seed=0):
+        """
+        :param bands: Number of LSH bands.
+        :param rows: Number of signature components per band.
+        :param threshold: Minimal estimated Jaccard similarity to reuse a verdict.
+        :param max_size: Maximal number of entries held in the index.
+        :param seed: Seed of the underlying MinHasher.
+        """
+        if max_size <= 0:
+            raise ValueError(f"max_size must be positive: {max_size}")
+
+        self.bands = bands
+        self.rows = rows
+        self.threshold = threshold
+        self.max_size = max_size
+        self.hasher = MinHasher(bands * rows, seed)
+
+        self._entries = OrderedDict()
+        self._buckets = [dict() for _ in range(bands)]
+        self._next_key = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [signature[b * rows:(b + 1) * rows] for b in range(self.bands)]
+
+    def signature(self, tokens):
+        """
+        Compute the signature of the token set used by this index.
+        :param tokens: Iterable of string tokens.
+        :return: Signature tuple or None for an empty token set.
+        """
+        return self.hasher.signature(tokens)
+
+    def signature_of_slots(self, slots):
+        """
+        Compute the signature of a token set given by its token slots.
+        :param slots: Iterable of slots from `hasher.token_slots`.
+        :return: Signature tuple or None for an empty token set.
+        """
+        return self.hasher.signature_of_slots(slots)
+
+    def add_signature(self, signature, label, key=None):
+        """
+        Insert a classified email given by its signature.
+
+        :param signature: Signature computed by `signature()`.
+        :param label: Verdict to be reused for near-duplicates.
+        :param key: Optional identifier of the email (e.g. filename).
+        :return: The key of the inserted entry or None if the signature is None.
+        """
+        if signature is None:
+            return None
+
+        if key is None:
+            key = self._next_key
+            self._next_key += 1
+        elif key in self._entries:
+            self._remove(key)
+
+        band_keys = self._band_keys(signature)
+        for buckets, band_key in zip(self._buckets, band_keys):
+            buckets.setdefault(band_key, set()).add(key)
+        self._entries[key] = (signature, label, band_keys)
+
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+        return key
+
+    def add(self, tokens, label, key=None):
+        """
+        Insert a classified email given by its tokens.
+        :param tokens: Iterable of string tokens.
+        :param label: Verdict to be reused for near-duplicates.
+        :param key: Optional identifier of the email.
+        :return: The key of the inserted entry or None for an empty token set.
+        """
+        return self.add_signature(self.signature(tokens), label, key)
+
+    def _remove(self, key):
+        """
+        Remove an entry and its band buckets.
+        """
+        _, _, band_keys = self._entries.pop(key)
+        for buckets, band_key in zip(self._buckets, band_keys):
+            bucket = buckets[band_key]
+            bucket.discard(key)
+            if not bucket:
+                del buckets[band_key]
+
+    def query_signature(self, signature):
+        """
+        Find the most similar indexed email above the threshold.
+
+        :param signature: Signature computed by `signature()`.
+        :return: DuplicateMatch or None if no entry is similar enough.
+        """
+        if signature is None:
+            return None
+
+        candidates = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets.get(band_key)
+            if bucket:
+                candidates.update(bucket)
+
+        best = None
+        for key in candidates:
+            entry_signature, label, _ = self._entries[key]
+            similarity = MinHasher.similarity(signature, entry_signature)
+            if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                best = DuplicateMatch(key, label, similarity)
+
+        if best is not None:
+            # Matched entries are kept alive by moving them to the LRU tail
+            self._entries.move_to_end(best.key)
+
+        return best
+
+    def query(self, tokens):
+        """
+        Find the most similar indexed email above the threshold.
+        :param tokens: Iterable of string tokens.
+        :return: DuplicateMatch or None if no entry is similar enough.
+        """
+        return self.query_signature(self.signature(tokens))
@@ -1,6 +1,26 @@
-import quopri
+import codecs
 import re
-from html import unescape
+
+from text.htmltext import HTMLText, iter_html_text
+
+
+class _TokenCache(dict):
+    """
+    Maps words to their tokens, or to an empty string for skipped words. A word is
+    filtered and stemmed on its first lookup only, and every later occurrence returns
+    the same token object.
+    """
+
+    def __init__(self, tokenizer, max_size):
+        super().__init__()
+        self.tokenizer = tokenizer
+        self.max_size = max_size
+
+    def __missing__(self, word):
+        token = self.tokenizer._token(word)
+        if len(self) < self.max_size:
+            self[word] = token
+        return token
 
 
 class EmailTokenizer:
@@ -14,28 +34,54 @@ class EmailTokenizer:
     :ivar EMAIL_RE: A regular expression pattern for identifying email addresses in the text.
     :ivar NUMBER_RE: A regular expression pattern for recognizing numeric values in the text.
     :ivar CURRENCY_RE: A regular expression pattern for identifying currency symbols or names.
-    :ivar HTML_RE: A regular expression pattern for detecting HTML tags.
     :ivar NON_WORD_RE: A regular expression pattern for isolating non-word characters.
     :ivar SUFFIXES: A tuple of common suffixes considered for stemming words.
     :ivar PREFIXES: A tuple of common prefixes considered for stemming words.
     :ivar STOP_WORDS: A set of common stop words to be ignored during tokenization.
+    :ivar CHUNK_SIZE: Number of characters of text stripped of markup and normalized at once.
+    :ivar MAX_CACHED_WORDS: Maximum number of distinct words whose tokens are cached.
     """
     URL_RE = re.compile(r"(http|https)://[^\s]+", re.IGNORECASE)
     EMAIL_RE = re.compile(r"[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}", re.IGNORECASE)
     NUMBER_RE = re.compile(r"\b\d+(\.\d+)?\b")
     CURRENCY_RE = re.compile(r"(\$|€|eur|usd)", re.IGNORECASE)
-    HTML_RE = re.compile(r"<[^<>]+>")
     NON_WORD_RE = re.compile(r"[^a-z0-9]+")
 
     SUFFIXES = ("ing", "ed", "es", "s")
     PREFIXES = ("dis", "pre", "un", "re")
 
+    CHUNK_SIZE = 1 << 16
+    MAX_CACHED_WORDS = 1 << 17
+
     STOP_WORDS = {
         "the", "to", "and", "of", "in", "is", "for", "it", "on",
         "with", "this", "that", "from", "are", "be", "you", "your",
         "we", "will", "not", "can", "as", "by", "or", "if", "all",
     }
 
+    def __init__(self):
+        self._token_cache = _TokenCache(self, self.MAX_CACHED_WORDS)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_token_cache"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._token_cache = _TokenCache(self, self.MAX_CACHED_WORDS)
+
+    def _token(self, word):
+        """
+        Steps 8 and 9 of `tokenize` for one word.
+
+        :param word: Normalized word.
+        :return: The token of the word, or an empty string if the word is skipped.
+        """
+        if len(word) <= 1 or word in self.STOP_WORDS:
+            return ""
+        return self._stem(word) if len(word) > 4 else word
+
     def _stem(self, word):
         """
         Apply a simple rule-based stemming by removing common English prefixes and suffixes.
@@ -61,14 +107,14 @@ class EmailTokenizer:
 
         return word
 
-    def tokenize(self, decoded_text_bytes):
+    def tokenize(self, text):
         """
         Normalize and tokenize raw email text into a list of cleaned tokens.
 
         This method performs the following steps:
           1. Lowercases all text.
-          2. Decodes HTML entities.
-          3. Removes HTML tags.
+          2. Decodes HTML entities in text nodes of `HTMLText`.
+          3. Removes the HTML tags and the contents of scripts and styles of `HTMLText`.
           4. Normalizes URLs, email addresses, numbers, and currency symbols to placeholders.
           5. Removes non-word characters and punctuation.
           6. Normalizes whitespace.
@@ -76,26 +122,65 @@ class EmailTokenizer:
           8. Applies rule-based stemming to words longer than 4 characters.
           9. Ignores single-character tokens and stop words.
 
-        :param decoded_text_bytes: Raw email text (bytes).
+        :param text: Decoded email text as a string, or UTF-8 bytes.
         :return: List of normalized tokens.
         """
-        if not decoded_text_bytes:
+        if not text:
             return []
 
-        # Decode quoted-printable
-        decoded_bytes = quopri.decodestring(decoded_text_bytes)
+        # Step 8 & 9: stem long words, skip single-character tokens and stop words. Each
+        # distinct word is processed once, later occurrences cost one dictionary lookup.
+        return list(filter(None, map(self._token_cache.__getitem__, self._words(text))))
+
+    def _words(self, text):
+        """
+        Steps 1 to 7 of `tokenize`.
 
-        # Convert back to string safely
-        text = decoded_bytes.decode('utf-8', errors='replace')
+        The text is processed chunk by chunk, and `HTMLText` is stripped of markup
+        first. Each chunk is cut
+        after its last whitespace, and the remainder is carried over to the next chunk,
+        so no word or address is split and the working memory stays bounded by
+        `CHUNK_SIZE` for documents of any size.
 
-        # Step 1: lowercase
-        text = text.lower()
+        :param text: Decoded email text as a string, or UTF-8 bytes, not empty.
+        :return: Generator of normalized words before stemming and filtering.
+        """
+        size = self.CHUNK_SIZE
+        if isinstance(text, bytes):
+            # Convert to string safely, chunk by chunk
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            chunks = (decoder.decode(text[start:start + size], final=start + size >= len(text))
+                      for start in range(0, len(text), size))
+        else:
+            chunks = (text[start:start + size] for start in range(0, len(text), size))
+
+        if isinstance(text, HTMLText):
+            # Steps 2 & 3: decode HTML entities in text nodes and remove HTML tags
+            chunks = iter_html_text(chunks)
+
+        pending = ""
+        for chunk in chunks:
+            pending += chunk
+            if len(pending) <= size:
+                continue
+            cut = max(pending.rfind(" "), pending.rfind("\n"))
+            if cut <= 0 and len(pending) > 4 * size:
+                # A single word longer than several chunks, split it anyway
+                cut = len(pending)
+            if cut > 0:
+                yield from self._normalize(pending[:cut])
+                pending = pending[cut:]
+        yield from self._normalize(pending)
 
-        # Step 2: decode HTML entities
-        text = unescape(text)
+    def _normalize(self, text):
+        """
+        Steps 1 and 4 to 7 of `tokenize` on a chunk of text without markup.
 
-        # Step 3: remove HTML tags
-        text = self.HTML_RE.sub(" ", text)
+        :param text: String text.
+        :return: List of normalized words.
+        """
+        # Step 1: lowercase
+        text = text.lower()
 
         # Step 4: normalize URLs, emails, numbers, currencies
         text = self.URL_RE.sub(" httpaddr ", text)
@@ -106,17 +191,97 @@ class EmailTokenizer:
         # Step 5: remove non-word characters / punctuation
         text = self.NON_WORD_RE.sub(" ", text)
 
-        # Step 6: normalize whitespace
-        text = re.sub(r"\s+", " ", text).strip()
+        # Step 6 & 7: normalize whitespace and split into words
+        return text.split()
 
-        # Step 7: split into words
-        words = text.split(" ")
 
-        # Step 8 & 9: stem long words, skip single-character tokens and stop words
-        tokens = [
-            self._stem(word) if len(word) > 4 else word
-            for word in words
-            if len(word) > 1 and word not in self.STOP_WORDS
-        ]
+class VocabularyTokenizer(EmailTokenizer):
+    """
+    Tokenizer bound to a model vocabulary, producing integer token ids.
+
+    Every word that stems to a vocabulary token is precomputed once: a stem is obtained
+    by removing at most one suffix and then at most one prefix, so the words of a token
+    are among the prefix + token + suffix combinations. At tokenization time each word
+    costs one dictionary lookup, and words outside the vocabulary are neither stemmed
+    nor collected.
+
+    :ivar tokens: List of vocabulary tokens, indexed by their ids.
+    :ivar token_ids: Dictionary mapping vocabulary tokens to their ids.
+    """
+
+    def __init__(self, vocabulary):
+        """
+        :param vocabulary: Iterable of vocabulary tokens.
+        """
+        super().__init__()
+        self.tokens = sorted(vocabulary)
+        self.token_ids = {token: i for i, token in enumerate(self.tokens)}
+        self._word_ids = self._map_words()
+
+    def _map_words(self):
+        """
+        :return: Dictionary mapping every word that tokenizes to a vocabulary token to
+            the id of the token.
+        """
+        word_ids = dict()
+        for token, i in self.token_ids.items():
+            for prefix in ("",) + self.PREFIXES:
+                for suffix in ("",) + self.SUFFIXES:
+                    word = prefix + token + suffix
+                    if len(word) <= 1 or word in self.STOP_WORDS:
+                        continue
+                    if (self._stem(word) if len(word) > 4 else word) == token:
+                        word_ids[word] = i
+        return word_ids
+
+    def iter_ids(self, text):
+        """
+        Generator of the ids of the vocabulary tokens of raw email text, in the order
+        `tokenize` would produce them. Tokens outside the vocabulary are skipped.
+
+        :param text: Decoded email text as a string, or UTF-8 bytes.
+        :return: Integer token id for each in-vocabulary token.
+        """
+        if not text:
+            return
+        yield from self.iter_word_ids(self._words(text))
+
+    def iter_word_ids(self, words):
+        """
+        Generator of the ids of the vocabulary tokens of normalized words, e.g. words
+        produced once and mapped by the tokenizers of several models.
+
+        :param words: Iterable of normalized words, as produced by `_words`.
+        :return: Integer token id for each in-vocabulary token.
+        """
+        word_ids = self._word_ids
+        for word in words:
+            i = word_ids.get(word)
+            if i is not None:
+                yield i
+
+
+    def ids_with_oov(self, text):
+        """
+        Token ids of raw email text together with the number of tokens outside the
+        vocabulary, for instrumentation. A word missing from the precomputed words is
+        an out-of-vocabulary token unless `tokenize` would skip it, so the two counts
+        add up to the length of `tokenize(text)`.
+
+        :param text: Decoded email text as a string, or UTF-8 bytes.
+        :return: A tuple `(ids, oov_tokens)` with the list of token ids.
+        """
+        ids = []
+        oov_tokens = 0
+        if not text:
+            return ids, oov_tokens
 
-        return tokens
+        word_ids = self._word_ids
+        stop_words = self.STOP_WORDS
+        for word in self._words(text):
+            i = word_ids.get(word)
+            if i is not None:
+                ids.append(i)
+            elif len(word) > 1 and word not in stop_words:
+                oov_tokens += 1
+        return ids, oov_tokens
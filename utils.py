@@ -32,3 +32,34 @@ def write_classification_to_file(filepath, classifications):
     with open(filepath, 'w', encoding='utf-8') as f:
         for filename, classification in classifications.items():
             f.write(filename + ' ' + classification + '\n')
+
+
+def read_scores_from_file(filepath):
+    """
+    Read per-email scores from a file as a dictionary.
+    :param filepath: Path to the scores file.
+    :return: Dictionary with filenames and float scores.
+    """
+    scores = dict()
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                filename, score = line.split()
+                scores[filename] = float(score)
+            except ValueError:
+                # Skip empty and malformed lines
+                continue
+
+    return scores
+
+
+def write_scores_to_file(filepath, scores):
+    """
+    Write a dictionary of per-email scores to a file.
+    :param filepath: Path to the output file.
+    :param scores: Dictionary with filenames and float scores.
+    """
+    with open(filepath, 'w', encoding='utf-8') as f:
+        for filename, score in scores.items():
+            f.write(filename + ' ' + repr(score) + '\n')